@@ -1,9 +1,18 @@
+import atexit
 import builtins
 import glob
+import hashlib
+import json
+import mmap
 import os.path
 import re
+import struct
 import sys
 import sysconfig
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import lru_cache
 
 DEFAULT_INCLUDE_DIR = sysconfig.get_config_var("INCLUDEDIR")
@@ -165,28 +174,138 @@ def add_library_defines(library_name: str):
     return defines
 
 
-def extract_linked_libraries(library_name: str, prefix: str) -> tuple:
+def find_library_path(library_name: str, prefix: str) -> tuple:
     lib = ""
     for variant in ["lib", "lib64"]:
         library_path = f"{prefix}/{variant}/{library_name}"
         if os.path.exists(library_path):
             lib = variant
             break
+    return library_path, lib
+
+
+ELF_MAGIC = b"\x7fELF"
+ELF_PT_LOAD = 1
+ELF_PT_DYNAMIC = 2
+ELF_DT_NULL = 0
+ELF_DT_NEEDED = 1
+ELF_DT_STRTAB = 5
+ELF_DT_RPATH = 15
+ELF_DT_RUNPATH = 29
+
+
+def parse_elf_dynamic_section(elf) -> tuple:
+    # Read the ELF identification: class (32/64 bits) and data encoding (endianness)
+    is_64_bits = elf[4] == 2
+    endianness = "<" if elf[5] == 1 else ">"
+    if is_64_bits:
+        (program_header_offset,) = struct.unpack_from(endianness + "Q", elf, 0x20)
+        program_header_size, program_header_count = struct.unpack_from(endianness + "HH", elf, 0x36)
+        program_header_format = endianness + "IIQQQQQQ"
+        dynamic_entry_format = endianness + "qQ"
+    else:
+        (program_header_offset,) = struct.unpack_from(endianness + "I", elf, 0x1C)
+        program_header_size, program_header_count = struct.unpack_from(endianness + "HH", elf, 0x2A)
+        program_header_format = endianness + "IIIIIIII"
+        dynamic_entry_format = endianness + "iI"
+
+    # Collect the loadable segments and the dynamic section
+    loadable_segments = []
+    dynamic_section = None
+    for i in range(program_header_count):
+        fields = struct.unpack_from(
+            program_header_format, elf, program_header_offset + i * program_header_size
+        )
+        if is_64_bits:
+            segment_type, _, offset, virtual_address, _, file_size, _, _ = fields
+        else:
+            segment_type, offset, virtual_address, _, file_size, _, _, _ = fields
+        if segment_type == ELF_PT_LOAD:
+            loadable_segments.append((virtual_address, file_size, offset))
+        elif segment_type == ELF_PT_DYNAMIC:
+            dynamic_section = (offset, file_size)
+    if dynamic_section is None:
+        return [], []
+
+    # Dynamic entries refer to strings by their offset in the string table
+    string_table_address = None
+    needed = []
+    runpath = []
+    offset, size = dynamic_section
+    entry_size = struct.calcsize(dynamic_entry_format)
+    for entry_offset in range(offset, offset + size, entry_size):
+        tag, value = struct.unpack_from(dynamic_entry_format, elf, entry_offset)
+        if tag == ELF_DT_NULL:
+            break
+        if tag == ELF_DT_STRTAB:
+            string_table_address = value
+        elif tag == ELF_DT_NEEDED:
+            needed.append(value)
+        elif tag in (ELF_DT_RUNPATH, ELF_DT_RPATH):
+            runpath.append(value)
+    if string_table_address is None:
+        return [], []
+
+    # The string table is referred to by its virtual address, which we translate to a file offset
+    string_table_offset = None
+    for virtual_address, file_size, segment_offset in loadable_segments:
+        if virtual_address <= string_table_address < virtual_address + file_size:
+            string_table_offset = string_table_address - virtual_address + segment_offset
+            break
+    if string_table_offset is None:
+        return [], []
+
+    def read_string(string_offset: int) -> str:
+        start = string_table_offset + string_offset
+        return elf[start : elf.find(b"\x00", start)].decode("utf-8")
+
+    runpath_dirs = []
+    for entry in runpath:
+        runpath_dirs += [x for x in read_string(entry).split(":") if x]
+    return list(map(read_string, needed)), runpath_dirs
+
+
+@lru_cache(maxsize=None)
+def scan_linked_libraries(library_path: str) -> tuple:
+    # Memory-map the library, so only the pages containing the headers and
+    # the dynamic section are read, instead of the entire (possibly huge) file
+    with open(library_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as library:
+            if library[:4] == ELF_MAGIC:
+                needed, runpath_dirs = parse_elf_dynamic_section(library)
+                # $ORIGIN refers to the directory containing the library
+                library_dir = os.path.dirname(library_path)
+                runpath_dirs = [x.replace("$ORIGIN", library_dir) for x in runpath_dirs]
+            else:
+                # Other formats (e.g. Mach-O and PE) are scanned for library names
+                needed = re.findall(
+                    b"\x00(lib[^\\x00]*?\\.%b)(?![\\w.])" % LIBRARY_EXTENSION.encode("utf-8"),
+                    library,
+                )
+                needed = list(map(lambda x: x.decode("utf-8"), needed))
+                runpath_dirs = []
+    # Only keep unversioned library names (e.g. libns3-dev-core.so, not libc.so.6)
+    needed = list(
+        filter(lambda x: x.startswith("lib") and x.endswith("." + LIBRARY_EXTENSION), needed)
+    )
+    return needed, runpath_dirs
+
+
+def extract_linked_libraries(library_name: str, prefix: str) -> tuple:
+    library_path, lib = find_library_path(library_name, prefix)
     linked_libs = []
+    runpath_dirs = []
     # First discover which 3rd-party libraries are used by the current module
     try:
-        with open(os.path.abspath(library_path), "rb") as f:
-            linked_libs = re.findall(
-                b"\x00(lib[^\\x00]*?\\.%b)(?![\\w.])" % LIBRARY_EXTENSION.encode("utf-8"), f.read()
-            )
+        linked_libs, runpath_dirs = scan_linked_libraries(os.path.abspath(library_path))
     except Exception as e:
         print(f"Failed to extract libraries used by {library_path} with exception:{e}")
         exit(-1)
-    return library_path, lib, list(map(lambda x: x.decode("utf-8"), linked_libs))
+    return library_path, lib, linked_libs, runpath_dirs
 
 
 def extract_library_include_dirs(library_name: str, prefix: str) -> tuple:
-    library_path, lib, linked_libs = extract_linked_libraries(library_name, prefix)
+    library_path, lib, linked_libs, runpath_dirs = extract_linked_libraries(library_name, prefix)
 
     linked_libs_include_dirs = set()
     defines = add_library_defines(library_name)
@@ -197,8 +316,14 @@ def extract_library_include_dirs(library_name: str, prefix: str) -> tuple:
         if "libns3" in linked_library:
             continue
 
-        # Search for the absolute path of the library
-        linked_library_path = search_libraries(linked_library)
+        # Search for the absolute path of the library, starting from the runpath
+        linked_library_path = [
+            os.path.join(x, linked_library)
+            for x in runpath_dirs
+            if os.path.exists(os.path.join(x, linked_library))
+        ]
+        if not linked_library_path:
+            linked_library_path = search_libraries(linked_library)
 
         # Raise error in case the library can't be found
         if len(linked_library_path) == 0:
@@ -418,109 +543,380 @@ def find_ns3_from_search() -> (str, list, str):
     return prefix, libraries, version
 
 
-def load_modules():
-    lock_file = find_ns3_lock()
-    libraries_to_load = []
+# Map each ns-3 library to the ns-3 libraries it links to
+def extract_module_dependencies(libraries: list, prefix: str) -> dict:
+    module_dependencies = {}
+    libraries = list(map(lambda x: os.path.basename(x), libraries))
 
-    # Search for prefix to ns-3 build, modules and respective libraries plus version
-    ret = find_ns3_from_search() if not lock_file else find_ns3_from_lock_file(lock_file)
-
-    # Unpack returned values
-    prefix, libraries, version = ret
-    prefix = os.path.abspath(prefix)
+    # Scan libraries concurrently, since each scan mostly waits for the disk
+    with ThreadPoolExecutor() as executor:
+        scanned_libraries = list(
+            executor.map(lambda x: extract_linked_libraries(x, prefix)[2], libraries)
+        )
 
-    # Sort libraries according to their dependencies
-    def sort_to_dependencies(libraries: list, prefix: str) -> list:
-        module_dependencies = {}
-        libraries = list(map(lambda x: os.path.basename(x), libraries))
-        for ns3_library in libraries:
-            _, _, linked_libraries = extract_linked_libraries(ns3_library, prefix)
-            linked_libraries = list(
-                filter(lambda x: "libns3" in x and ns3_library not in x, linked_libraries)
-            )
-            linked_libraries = list(map(lambda x: os.path.basename(x), linked_libraries))
-            module_dependencies[os.path.basename(ns3_library)] = linked_libraries
-
-        def modules_that_can_be_loaded(module_dependencies, pending_modules, current_modules):
-            modules = []
-            for pending_module in pending_modules:
-                can_be_loaded = True
-                for dependency in module_dependencies[pending_module]:
-                    if dependency not in current_modules:
-                        can_be_loaded = False
-                        break
-                if not can_be_loaded:
-                    continue
-                modules.append(pending_module)
-            return modules
-
-        def dependency_order(
-            module_dependencies, pending_modules, current_modules, step_number=0, steps={}
+    for ns3_library, linked_libraries in zip(libraries, scanned_libraries):
+        linked_libraries = list(
+            filter(lambda x: "libns3" in x and ns3_library not in x, linked_libraries)
+        )
+        linked_libraries = list(map(lambda x: os.path.basename(x), linked_libraries))
+        module_dependencies[os.path.basename(ns3_library)] = linked_libraries
+    return module_dependencies
+
+
+# Sort libraries according to their dependencies
+def sort_to_dependencies(module_dependencies: dict) -> list:
+    module_dependencies = dict(module_dependencies)
+
+    def modules_that_can_be_loaded(module_dependencies, pending_modules, current_modules):
+        modules = []
+        for pending_module in pending_modules:
+            can_be_loaded = True
+            for dependency in module_dependencies[pending_module]:
+                if dependency not in current_modules:
+                    can_be_loaded = False
+                    break
+            if not can_be_loaded:
+                continue
+            modules.append(pending_module)
+        return modules
+
+    def dependency_order(
+        module_dependencies, pending_modules, current_modules, step_number=0, steps={}
+    ):
+        if len(pending_modules) == 0:
+            return steps
+        if step_number not in steps:
+            steps[step_number] = []
+        for module in modules_that_can_be_loaded(
+            module_dependencies, pending_modules, current_modules
         ):
-            if len(pending_modules) == 0:
-                return steps
-            if step_number not in steps:
-                steps[step_number] = []
-            for module in modules_that_can_be_loaded(
-                module_dependencies, pending_modules, current_modules
-            ):
-                steps[step_number].append(module)
-                pending_modules.remove(module)
-                current_modules.append(module)
-            return dependency_order(
-                module_dependencies, pending_modules, current_modules, step_number + 1, steps
-            )
+            steps[step_number].append(module)
+            pending_modules.remove(module)
+            current_modules.append(module)
+        return dependency_order(
+            module_dependencies, pending_modules, current_modules, step_number + 1, steps
+        )
 
-        sorted_libraries = []
-        for step in dependency_order(
-            module_dependencies, list(module_dependencies.keys()), [], 0
-        ).values():
-            sorted_libraries.extend(step)
-        return sorted_libraries
+    sorted_libraries = []
+    for step in dependency_order(
+        module_dependencies, list(module_dependencies.keys()), [], 0
+    ).values():
+        sorted_libraries.extend(step)
+    return sorted_libraries
+
+
+# Declarations at the namespace level of ns-3 headers are not indented,
+# which lets us find the names each module provides without parsing C++
+SYMBOL_DECLARATION_PATTERNS = (
+    # class Node, struct Foo, enum class Bar, namespace lrwpan (forward declarations excluded)
+    re.compile(
+        r"^(?:class|struct|union|enum(?:\s+class)?|namespace)\s+(?:[A-Z_]+_EXPORT\s+)?(\w+)"
+        r"\s*(?:final\b)?\s*(?=$|[:{])",
+        re.M,
+    ),
+    # typedef ... Name; and using Name = ...;
+    re.compile(r"^typedef\s[^;(]*?\b(\w+)\s*;", re.M),
+    re.compile(r"^using\s+(\w+)\s*=", re.M),
+)
+FUNCTION_DECLARATION_PATTERNS = (
+    # Function definitions, with the return type in the previous line
+    re.compile(r"^(\w+)\s*\(", re.M),
+    # Function declarations
+    re.compile(r"^(?:[\w:<>,]+[ \t*&]+)+(\w+)\s*\(", re.M),
+)
+# Names declared by the attribute helper macros
+ATTRIBUTE_MACRO_PATTERN = re.compile(r"^ATTRIBUTE_(\w+)\(([^)]*)\)", re.M)
+ATTRIBUTE_MACRO_SYMBOLS = {
+    "HELPER_HEADER": ["{}Value", "{}Checker", "Make{}Checker", "Make{}Accessor"],
+    "VALUE_DEFINE": ["{}Value"],
+    "VALUE_DEFINE_WITH_NAME": ["{}Value"],
+    "CHECKER_DEFINE": ["{}Checker", "Make{}Checker"],
+    "ACCESSOR_DEFINE": ["Make{}Accessor"],
+}
+# Enumerators of enums declared at the namespace level
+ENUM_BODY_PATTERN = re.compile(r"^enum\b[^{;]*\{([^}]*)\}", re.M)
+COMMENT_PATTERN = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+CXX_KEYWORDS = {"ns3", "operator", "void", "return", "sizeof", "decltype", "static_assert"}
 
-    libraries_to_load = sort_to_dependencies(libraries, prefix)
 
-    # Extract library base names
-    libraries_to_load = [os.path.basename(x) for x in libraries_to_load]
+def read_header(header_path: str) -> str:
+    try:
+        with open(header_path, "r", encoding="utf-8", errors="replace") as f:
+            contents = f.read()
+    except OSError:
+        return ""
+    # Headers in the build directory only include the actual header from the source directory
+    forwarded_header = re.fullmatch(r'\s*#include\s+"([^"]+)"\s*', contents)
+    if forwarded_header and os.path.isabs(forwarded_header.group(1)):
+        return read_header(forwarded_header.group(1))
+    return contents
+
+
+def extract_module_symbols(module: str, prefix: str) -> set:
+    module_header = read_header(os.path.join(prefix, "include", "ns3", f"{module}-module.h"))
+    headers = re.findall(r"#include\s+[<\"]ns3/([^>\"]+)[>\"]", module_header)
+
+    symbols = set()
+    for header in headers:
+        contents = read_header(os.path.join(prefix, "include", "ns3", header))
+        for pattern in SYMBOL_DECLARATION_PATTERNS:
+            symbols.update(pattern.findall(contents))
+        # Names in upper case followed by parentheses are macros
+        for pattern in FUNCTION_DECLARATION_PATTERNS:
+            symbols.update(filter(lambda x: not x.isupper(), pattern.findall(contents)))
+        for macro, arguments in ATTRIBUTE_MACRO_PATTERN.findall(contents):
+            name = arguments.split(",")[-1].strip()
+            symbols.update(x.format(name) for x in ATTRIBUTE_MACRO_SYMBOLS.get(macro, []))
+        for enum_body in ENUM_BODY_PATTERN.findall(contents):
+            for enumerator in COMMENT_PATTERN.sub("", enum_body).split(","):
+                symbols.update(re.findall(r"^\s*([A-Za-z_]\w*)", enumerator))
+
+    return symbols - CXX_KEYWORDS
+
+
+def build_symbol_index(modules: list, prefix: str) -> dict:
+    symbol_index = {}
+    for module in modules:
+        for symbol in extract_module_symbols(module, prefix):
+            symbol_index.setdefault(symbol, []).append(module)
+    return symbol_index
+
+
+# Bump whenever the layout of the cached data changes
+BINDINGS_CACHE_VERSION = 3
+
+
+def get_bindings_cache_path(selected_modules: list = None) -> str:
+    # The cache can be disabled with NS3_BINDINGS_CACHE=0
+    if os.getenv("NS3_BINDINGS_CACHE", "1").lower() in ["0", "off", "false", "no"]:
+        return ""
+
+    # Use NS3_BINDINGS_CACHE_DIR, then $XDG_CACHE_HOME/ns-3, then ~/.cache/ns-3
+    cache_dir = os.getenv("NS3_BINDINGS_CACHE_DIR", "")
+    if not cache_dir:
+        xdg_cache_home = os.getenv("XDG_CACHE_HOME", "")
+        if not xdg_cache_home:
+            xdg_cache_home = os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(xdg_cache_home, "ns-3")
+
+    # Each copy of the bindings (build directory, installation, pip wheel) gets its own cache
+    # and so does each selection of modules
+    bindings_id = os.path.abspath(__file__)
+    if selected_modules:
+        bindings_id += ":" + ",".join(sorted(selected_modules))
+    bindings_hash = hashlib.sha1(bindings_id.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"python-bindings-{bindings_hash}.json")
+
+
+def file_fingerprint(path: str) -> list:
+    stat = os.stat(path)
+    return [path, stat.st_mtime_ns, stat.st_size]
+
+
+def bindings_fingerprint(
+    lock_file: str, library_paths: list, selected_modules: list = None
+) -> dict:
+    # Libraries are identified by their path, modification time and size.
+    # Their directories are tracked too, to detect libraries being added or removed.
+    library_directories = sorted(set(map(os.path.dirname, library_paths)))
+    fingerprint = {
+        "version": BINDINGS_CACHE_VERSION,
+        "selected_modules": sorted(selected_modules) if selected_modules else None,
+        "lock_file": file_fingerprint(lock_file) if lock_file else None,
+        "libraries": [file_fingerprint(path) for path in sorted(library_paths)],
+        "directories": [file_fingerprint(path) for path in library_directories],
+    }
+    # Without a lock file, the libraries are found by searching the environment
+    if not lock_file:
+        fingerprint["environment"] = [
+            os.getenv("PATH", ""),
+            os.getenv("LD_LIBRARY_PATH", ""),
+            os.path.abspath(os.getcwd()),
+        ]
+    return fingerprint
+
+
+def load_cached_bindings_resolution(cache_path: str, lock_file: str, selected_modules: list = None):
+    if not cache_path or not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached_resolution = json.load(f)
+        fingerprint = cached_resolution["fingerprint"]
+        if fingerprint.get("version") != BINDINGS_CACHE_VERSION:
+            return None
+        library_paths = [entry[0] for entry in fingerprint["libraries"]]
+        # Any change (or missing file) to the libraries invalidates the cached resolution
+        if fingerprint != bindings_fingerprint(lock_file, library_paths, selected_modules):
+            return None
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        return None
+    return cached_resolution
 
-    # Sort modules based on libraries
-    modules = list(map(lambda x: filter_module_name(x), libraries_to_load))
 
-    # Try to import Cppyy and warn the user in case it is not found
+def store_cached_bindings_resolution(cache_path: str, resolution: dict) -> None:
+    if not cache_path:
+        return
+    # Write to a temporary file first, then atomically replace the cache,
+    # so concurrent interpreters never read a partially written file
     try:
-        import cppyy
-    except ModuleNotFoundError:
-        print("Cppyy is required by the ns-3 python bindings.")
-        print("You can install it with the following command: pip install cppyy")
-        exit(-1)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(resolution, f)
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        # Caching is an optimization, failing to write it is not an error
+        pass
+
+
+def current_rss() -> int:
+    # Resident set size in bytes, from /proc when available
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    # Otherwise fall back to the peak RSS (in kilobytes, except on macOS where it is in bytes)
+    try:
+        import resource
+    except ImportError:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
 
-    # Enable full logs for debugging
-    # cppyy.set_debug(True)
 
-    # Register Ptr<> as a smart pointer
-    import libcppyy
+class ImportProfiler:
+    """Records the wall time and RSS delta of each phase of importing the bindings
 
-    libcppyy.AddSmartPtrType("Ptr")
+    Enabled by NS3_PY_IMPORT_PROFILE. The report is emitted when the interpreter exits,
+    so modules loaded lazily are accounted for:
+    1/on/table prints a table to stderr, json prints JSON to stderr,
+    and any other value is the path of a JSON file to write.
+    """
 
-    # Import ns-3 libraries
-    for variant in ["lib", "lib64"]:
-        path_to_lib = f"{prefix}/{variant}"
-        if not os.path.exists(path_to_lib):
+    def __init__(self, output: str):
+        self.output = output
+        self.enabled = output.lower() not in ["", "0", "off", "false", "no"]
+        self.phases = []
+        self.start_time = time.perf_counter()
+        self.start_rss = current_rss() if self.enabled else 0
+        if self.enabled:
+            atexit.register(self.report)
+
+    @contextmanager
+    def phase(self, name: str, module: str = ""):
+        if not self.enabled:
+            yield
+            return
+        rss = current_rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append(
+                {
+                    "phase": name,
+                    "module": module,
+                    "time": time.perf_counter() - start,
+                    "rss_delta": current_rss() - rss,
+                }
+            )
+
+    def results(self) -> dict:
+        return {
+            "total_time": time.perf_counter() - self.start_time,
+            "total_rss_delta": current_rss() - self.start_rss,
+            "phases": sorted(self.phases, key=lambda x: x["time"], reverse=True),
+        }
+
+    def report(self) -> None:
+        results = self.results()
+        if self.output.lower() == "json":
+            json.dump(results, sys.stderr, indent=2)
+            print(file=sys.stderr)
+            return
+        if self.output.lower() not in ["1", "on", "true", "yes", "table"]:
+            with open(self.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            return
+
+        print("ns-3 Python bindings import profile", file=sys.stderr)
+        print(f"{'Phase':<28} {'Module':<24} {'Time (ms)':>10} {'RSS (MiB)':>10}", file=sys.stderr)
+        for phase in results["phases"]:
+            print(
+                f"{phase['phase']:<28} {phase['module']:<24} "
+                f"{phase['time'] * 1e3:>10.1f} {phase['rss_delta'] / 2**20:>10.1f}",
+                file=sys.stderr,
+            )
+        print(
+            f"{'total (until exit)':<28} {'':<24} {results['total_time'] * 1e3:>10.1f} "
+            f"{results['total_rss_delta'] / 2**20:>10.1f}",
+            file=sys.stderr,
+        )
+
+
+IMPORT_PROFILER = ImportProfiler(os.getenv("NS3_PY_IMPORT_PROFILE", ""))
+
+
+def get_selected_modules() -> list:
+    # Modules requested with NS3_PY_MODULES (e.g. "core,network,internet"), or None for all
+    selected_modules = re.split(r"[\s,;]+", os.getenv("NS3_PY_MODULES", "").strip())
+    selected_modules = list(filter(lambda x: x, selected_modules))
+    return selected_modules if selected_modules else None
+
+
+def filter_dependency_closure(module_dependencies: dict, modules: list) -> dict:
+    # Keep the libraries of the selected modules plus the libraries they depend on
+    module_libraries = {filter_module_name(x): x for x in module_dependencies}
+    pending_libraries = []
+    for module in modules:
+        if module not in module_libraries:
+            raise Exception(
+                f"Unknown ns-3 module '{module}'. Available modules: {', '.join(sorted(module_libraries))}"
+            )
+        pending_libraries.append(module_libraries[module])
+    closure = set()
+    while pending_libraries:
+        library = pending_libraries.pop()
+        if library in closure:
             continue
-        cppyy.add_library_path(path_to_lib)
-    del variant, path_to_lib
-    cppyy.add_include_path(f"{prefix}/include")
+        closure.add(library)
+        pending_libraries.extend(module_dependencies.get(library, []))
+    return {x: y for x, y in module_dependencies.items() if x in closure}
 
-    known_include_dirs = set()
-    # We then need to include all include directories for dependencies
-    for library in libraries_to_load:
-        linked_lib_include_dirs, defines = extract_library_include_dirs(library, prefix)
-        cppyy.cppexec(defines)
-        for linked_lib_include_dir in linked_lib_include_dirs:
-            if linked_lib_include_dir not in known_include_dirs:
-                known_include_dirs.add(linked_lib_include_dir)
-                if os.path.isdir(linked_lib_include_dir):
-                    cppyy.add_include_path(linked_lib_include_dir)
+
+def resolve_ns3_libraries(lock_file: str, selected_modules: list = None) -> dict:
+    # Search for prefix to ns-3 build, modules and respective libraries plus version
+    with IMPORT_PROFILER.phase("library search"):
+        ret = find_ns3_from_search() if not lock_file else find_ns3_from_lock_file(lock_file)
+
+    # Unpack returned values
+    prefix, libraries, version = ret
+    prefix = os.path.abspath(prefix)
+
+    with IMPORT_PROFILER.phase("dependency sort"):
+        module_dependencies = extract_module_dependencies(libraries, prefix)
+        if selected_modules:
+            module_dependencies = filter_dependency_closure(module_dependencies, selected_modules)
+        libraries_to_load = sort_to_dependencies(module_dependencies)
+
+    # Extract library base names
+    libraries_to_load = [os.path.basename(x) for x in libraries_to_load]
+
+    # Sort modules based on libraries
+    modules = list(map(lambda x: filter_module_name(x), libraries_to_load))
+
+    # Collect the include directories and defines required by the dependencies
+    include_dirs = []
+    defines = ""
+    with IMPORT_PROFILER.phase("include path discovery"):
+        for library in libraries_to_load:
+            linked_lib_include_dirs, library_defines = extract_library_include_dirs(library, prefix)
+            defines += library_defines
+            for linked_lib_include_dir in linked_lib_include_dirs:
+                if linked_lib_include_dir not in include_dirs:
+                    include_dirs.append(linked_lib_include_dir)
 
     # Get build type
     build_type = ""  # release
@@ -528,39 +924,338 @@ def load_modules():
         if type in libraries_to_load[-1]:
             build_type = type
 
-    # Load a module, then its module header
-    for library in libraries_to_load:
-        cppyy.load_library(library)
-        for module in modules:
-            library_name_from_module = (
-                f"{version}-{module}{'-' if len(build_type)>0 else ''}{build_type}."
-            )
-            if library_name_from_module in library:
-                cppyy.include(f"ns3/{module}-module.h")
-                break
+    library_paths = [find_library_path(library, prefix)[0] for library in libraries_to_load]
+    with IMPORT_PROFILER.phase("symbol index"):
+        symbols = build_symbol_index(modules, prefix)
+    return {
+        "fingerprint": bindings_fingerprint(lock_file, library_paths, selected_modules),
+        "prefix": prefix,
+        "version": version,
+        "libraries": libraries_to_load,
+        "modules": modules,
+        "dependencies": module_dependencies,
+        "symbols": symbols,
+        "include_dirs": include_dirs,
+        "defines": defines,
+        "build_type": build_type,
+    }
+
+
+def setup_core_bindings(cppyy) -> None:
+    # Set up a few tricks
+    # These are written in Python rather than with cppyy.cppdef,
+    # so that modules loaded from their dictionaries do not need their headers parsed
+    def LookupByNameFailSafe(name: str) -> tuple:
+        type_id = cppyy.gbl.ns3.TypeId()
+        ok = cppyy.gbl.ns3.TypeId.LookupByNameFailSafe(name, type_id)
+        return ok, type_id
+
+    setattr(cppyy.gbl.ns3, "LookupByNameFailSafe", LookupByNameFailSafe)
+
+    # Resolve unqualified names of C++ snippets and template arguments
+    # (e.g. ns.Ptr["Object"]) in the ns3 namespace
+    cppyy.cppdef("using namespace ns3;")
+
+
+def setup_time_bindings(cppyy) -> None:
+    # Python numeric protocol of ns.Time, implemented on its integer time steps.
+    # Comparisons, addition, subtraction, scaling and division are left to the C++
+    # operators, which cppyy maps with a single call. The others are either missing,
+    # or not value-based (the default hash is the object identity).
+    ns3 = cppyy.gbl.ns3
+    time_class = ns3.Time
+    time_step = ns3.TimeStep
+    native_add = time_class.__add__
+    native_sub = time_class.__sub__
+    native_mul = time_class.__mul__
+    native_truediv = time_class.__truediv__
+    native_comparisons = {
+        name: getattr(time_class, name)
+        for name in ("__eq__", "__ne__", "__lt__", "__le__", "__gt__", "__ge__")
+    }
+
+    def from_ticks(ticks: int):
+        # TimeStep() takes an uint64_t, which is stored back into the int64_t of Time,
+        # so negative time steps are passed as their two's complement
+        return time_step(ticks & 0xFFFFFFFFFFFFFFFF)
+
+    def native(operator):
+        # Operands without a C++ overload return NotImplemented, so Python tries
+        # their reflected operators
+        def call(a, b):
+            try:
+                return operator(a, b)
+            except TypeError:
+                return NotImplemented
+
+        return call
+
+    def floordiv(a, b):
+        if not isinstance(b, time_class):
+            return NotImplemented
+        return a.GetTimeStep() // b.GetTimeStep()
+
+    def mod(a, b):
+        if not isinstance(b, time_class):
+            return NotImplemented
+        return from_ticks(a.GetTimeStep() % b.GetTimeStep())
+
+    for name, operator in native_comparisons.items():
+        setattr(time_class, name, native(operator))
+    time_class.__add__ = native(native_add)
+    time_class.__sub__ = native(native_sub)
+    time_class.__mul__ = native(native_mul)
+    time_class.__rmul__ = native(native_mul)
+    # Time / Time is an int64x64_t, like in C++, and Time / number is a Time
+    time_class.__truediv__ = native(native_truediv)
+    time_class.__floordiv__ = floordiv
+    time_class.__mod__ = mod
+    time_class.__neg__ = lambda a: from_ticks(-a.GetTimeStep())
+    time_class.__pos__ = lambda a: a
+    time_class.__abs__ = lambda a: from_ticks(abs(a.GetTimeStep()))
+    # Equal times have the same time steps, hence the same hash
+    time_class.__hash__ = lambda a: hash(a.GetTimeStep())
+    # float() and int() both give seconds, int() truncated towards zero like int(float())
+    time_class.__float__ = lambda a: a.GetSeconds()
+    time_class.__int__ = lambda a: int(a.GetSeconds())
+
+    TimeArray.ns3 = ns3
+    ns3.TimeArray = TimeArray
+
+
+class TimeArray:
+    """Array of times, stored as the int64 time steps of the current resolution in a NumPy array.
+
+    Converts from and to ns.Time, or real numbers in a time unit, in bulk.
+    If the time resolution changes (see ns.Time.SetResolution()), the time steps are
+    rescaled the next time they are accessed, like ns.Time objects are by ns-3.
+    """
 
-    # We expose cppyy to consumers of this module as ns.cppyy
-    setattr(cppyy.gbl.ns3, "cppyy", cppyy)
+    # Set by setup_time_bindings()
+    ns3 = None
+
+    def __init__(self, ticks=()):
+        """ticks: time steps of the current time resolution"""
+        import numpy
+
+        self._ticks = numpy.array(ticks, dtype=numpy.int64).reshape(-1)
+        self._femtoseconds_per_tick = self._current_femtoseconds_per_tick()
+
+    @classmethod
+    def _current_femtoseconds_per_tick(cls) -> int:
+        return cls.ns3.TimeStep(1).ToInteger(cls.ns3.Time.FS)
+
+    @classmethod
+    def _ticks_per_unit(cls, unit) -> float:
+        # Conversions between integer numbers of ticks and units are exact
+        # (e.g. 1500 ms is exactly 1.5 s), unlike converting through a real factor
+        unit = cls.ns3.Time.S if unit is None else unit
+        ticks_per_unit = cls.ns3.Time.FromInteger(1, unit).GetTimeStep()
+        if ticks_per_unit >= 1:
+            return ticks_per_unit
+        # The unit is finer than the resolution
+        return 1 / cls.ns3.TimeStep(1).ToInteger(unit)
+
+    @property
+    def ticks(self):
+        """Time steps of the current time resolution, as a NumPy int64 array"""
+        import numpy
+
+        femtoseconds_per_tick = self._current_femtoseconds_per_tick()
+        if femtoseconds_per_tick != self._femtoseconds_per_tick:
+            old, new = self._femtoseconds_per_tick, femtoseconds_per_tick
+            if old % new == 0:
+                self._ticks = self._ticks * (old // new)
+            else:
+                self._ticks = numpy.rint(self._ticks * (old / new)).astype(numpy.int64)
+            self._femtoseconds_per_tick = femtoseconds_per_tick
+        return self._ticks
+
+    @classmethod
+    def from_times(cls, times):
+        """Build an array from a sequence of ns.Time"""
+        import numpy
+
+        return cls(numpy.fromiter((t.GetTimeStep() for t in times), dtype=numpy.int64))
+
+    @classmethod
+    def from_values(cls, values, unit=None):
+        """Build an array from real numbers in unit (e.g. ns.Time.MS), seconds by default,
+        rounded to the nearest time step"""
+        import numpy
+
+        values = numpy.asarray(values, dtype=numpy.float64)
+        return cls(numpy.rint(values * cls._ticks_per_unit(unit)))
+
+    def to_times(self) -> list:
+        """Convert to a list of ns.Time"""
+        from_ticks = self.ns3.TimeStep
+        return [from_ticks(ticks & 0xFFFFFFFFFFFFFFFF) for ticks in self.ticks.tolist()]
+
+    def to_values(self, unit=None):
+        """Convert to a NumPy float64 array of values in unit (e.g. ns.Time.MS), seconds by default"""
+        return self.ticks / self._ticks_per_unit(unit)
+
+    def _other_ticks(self, other):
+        if isinstance(other, TimeArray):
+            return other.ticks
+        if isinstance(other, self.ns3.Time):
+            return other.GetTimeStep()
+        return None
 
-    # Set up a few tricks
-    cppyy.cppdef(
+    def __len__(self) -> int:
+        return len(self._ticks)
+
+    def __iter__(self):
+        return iter(self.to_times())
+
+    def __getitem__(self, index):
+        ticks = self.ticks[index]
+        if ticks.ndim == 0:
+            return self.ns3.TimeStep(int(ticks) & 0xFFFFFFFFFFFFFFFF)
+        return TimeArray(ticks)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.ticks if dtype is None else self.ticks.astype(dtype)
+
+    def __repr__(self) -> str:
+        return f"TimeArray({self.to_values()!r} s)"
+
+    def __add__(self, other):
+        other_ticks = self._other_ticks(other)
+        if other_ticks is None:
+            return NotImplemented
+        return TimeArray(self.ticks + other_ticks)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        other_ticks = self._other_ticks(other)
+        if other_ticks is None:
+            return NotImplemented
+        return TimeArray(self.ticks - other_ticks)
+
+    def __rsub__(self, other):
+        other_ticks = self._other_ticks(other)
+        if other_ticks is None:
+            return NotImplemented
+        return TimeArray(other_ticks - self.ticks)
+
+    def __neg__(self):
+        return TimeArray(-self.ticks)
+
+    def __mul__(self, factor):
+        import numpy
+
+        factor = numpy.asarray(factor)
+        if factor.dtype.kind in "iu":
+            return TimeArray(self.ticks * factor)
+        if factor.dtype.kind == "f":
+            return TimeArray(numpy.rint(self.ticks * factor))
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        # TimeArray / Time(Array) gives real numbers, TimeArray / numbers gives times
+        import numpy
+
+        other_ticks = self._other_ticks(other)
+        if other_ticks is not None:
+            return self.ticks / other_ticks
+        divisor = numpy.asarray(other)
+        if divisor.dtype.kind not in "iuf":
+            return NotImplemented
+        return TimeArray(numpy.rint(self.ticks / divisor))
+
+    def _compare(self, other, operator):
+        other_ticks = self._other_ticks(other)
+        if other_ticks is None:
+            return NotImplemented
+        return operator(self.ticks, other_ticks)
+
+    def __eq__(self, other):
+        return self._compare(other, lambda a, b: a == b)
+
+    def __ne__(self, other):
+        return self._compare(other, lambda a, b: a != b)
+
+    def __lt__(self, other):
+        return self._compare(other, lambda a, b: a < b)
+
+    def __le__(self, other):
+        return self._compare(other, lambda a, b: a <= b)
+
+    def __gt__(self, other):
+        return self._compare(other, lambda a, b: a > b)
+
+    def __ge__(self, other):
+        return self._compare(other, lambda a, b: a >= b)
+
+    # Comparisons return arrays, like NumPy arrays
+    __hash__ = None
+
+
+def setup_simulator_bindings(cppyy) -> None:
+    # Schedule many Python callbacks with a single call into C++.
+    # Each event carries only its index, which is used to look up its payload in Python,
+    # so neither the callback nor the payloads are converted for every event.
+    def define_schedule_many() -> None:
+        if hasattr(cppyy.gbl, "ScheduleManyByIndex"):
+            return
+        cppyy.cppdef(
+            """
+            using namespace ns3;
+            void ScheduleManyByIndex(const int64_t* delays,
+                                     std::size_t n,
+                                     std::function<void(std::size_t)> callback)
+            {
+                auto dispatcher = std::make_shared<std::function<void(std::size_t)>>(callback);
+                for (std::size_t i = 0; i < n; i++)
+                {
+                    Simulator::Schedule(TimeStep(delays[i]), [dispatcher, i]() { (*dispatcher)(i); });
+                }
+            }
         """
-        using namespace ns3;
-        bool Time_ge(Time& a, Time& b){ return a >= b;}
-        bool Time_eq(Time& a, Time& b){ return a == b;}
-        bool Time_ne(Time& a, Time& b){ return a != b;}
-        bool Time_le(Time& a, Time& b){ return a <= b;}
-        bool Time_gt(Time& a, Time& b){ return a > b;}
-        bool Time_lt(Time& a, Time& b){ return a < b;}
-    """
-    )
-    cppyy.gbl.ns3.Time.__ge__ = cppyy.gbl.Time_ge
-    cppyy.gbl.ns3.Time.__eq__ = cppyy.gbl.Time_eq
-    cppyy.gbl.ns3.Time.__ne__ = cppyy.gbl.Time_ne
-    cppyy.gbl.ns3.Time.__le__ = cppyy.gbl.Time_le
-    cppyy.gbl.ns3.Time.__gt__ = cppyy.gbl.Time_gt
-    cppyy.gbl.ns3.Time.__lt__ = cppyy.gbl.Time_lt
+        )
 
+    def ScheduleMany(times, callback, args=None) -> None:
+        """Schedule callback(args[i]) (or callback() if args is None) after each delay of times
+
+        times: delays relative to the current simulation time, either a sequence of ns.Time
+        or an array-like of floating point seconds (e.g. a NumPy array).
+        """
+        import numpy
+
+        if len(times) and isinstance(times[0], cppyy.gbl.ns3.Time):
+            delays = numpy.fromiter((x.GetTimeStep() for x in times), dtype=numpy.int64)
+        else:
+            # Convert seconds to ticks of the current time resolution
+            ticks_per_second = cppyy.gbl.ns3.Seconds(1).GetTimeStep()
+            delays = numpy.rint(numpy.asarray(times, dtype=numpy.float64) * ticks_per_second)
+        delays = numpy.ascontiguousarray(delays, dtype=numpy.int64)
+        if numpy.any(delays < 0):
+            raise ValueError("ScheduleMany requires non-negative delays")
+        if args is not None and len(args) != len(delays):
+            raise ValueError(f"Expected {len(delays)} payloads, got {len(args)}")
+
+        if args is None:
+
+            def dispatch(i):
+                callback()
+
+        else:
+
+            def dispatch(i):
+                callback(args[i])
+
+        define_schedule_many()
+        cppyy.gbl.ScheduleManyByIndex(delays, len(delays), dispatch)
+
+    cppyy.gbl.ns3.Simulator.ScheduleMany = staticmethod(ScheduleMany)
+
+
+def setup_network_bindings(cppyy) -> None:
     # Node::~Node isn't supposed to destroy the object,
     # since it gets destroyed at the end of the simulation
     # we need to hold the reference until it gets destroyed by C++
@@ -574,20 +1269,388 @@ def load_modules():
 
     cppyy.gbl.ns3.Node.__del__ = Node_del
 
-    cppyy.cppdef(
+
+# Layout of PacketTraceRecord (see packet-trace-buffer.h)
+PACKET_TRACE_RECORD_FIELDS = [
+    ("time", "<i8"),
+    ("node", "<u4"),
+    ("size", "<u4"),
+    ("uid", "<u8"),
+    ("values", "<f8", (4,)),
+]
+
+
+def setup_trace_buffer_bindings(cppyy) -> None:
+    # Trace events are buffered in C++ by PacketTraceBuffer and delivered to Python
+    # in batches, as NumPy structured arrays, instead of one Python call per event.
+    # Python functions are converted to std::function by cppyy, but not to ns3::Callback.
+    def define_make_flush_callback() -> None:
+        if hasattr(cppyy.gbl, "MakePacketTraceFlushCallback"):
+            return
+        cppyy.cppdef(
+            """
+            using namespace ns3;
+            Callback<void, std::size_t>
+            MakePacketTraceFlushCallback(std::function<void(std::size_t)> callback)
+            {
+                return Callback<void, std::size_t>(callback);
+            }
         """
-        using namespace ns3;
-        std::tuple<bool, TypeId> LookupByNameFailSafe(std::string name)
-        {
-            TypeId id;
-            bool ok = TypeId::LookupByNameFailSafe(name, &id);
-            return std::make_tuple(ok, id);
-        }
-    """
+        )
+
+    def ConnectTraceBuffer(path, callback, capacity=4096, interval=None, arguments=()):
+        """Connect the trace sources of path to callback(records), called with batches of
+        records. The trace source signature is void (Ptr<const Packet>, *arguments), where
+        arguments are C++ type names, e.g. ("double",). Returns the PacketTraceBuffer,
+        whose Flush() delivers the remaining records, and Dispose() disconnects it."""
+        import numpy
+
+        dtype = numpy.dtype(PACKET_TRACE_RECORD_FIELDS)
+        ns3 = cppyy.gbl.ns3
+        buffer = ns3.CreateObject[ns3.PacketTraceBuffer]()
+        buffer.SetAttribute("Capacity", ns3.UintegerValue(capacity))
+        if interval is not None:
+            buffer.SetAttribute("FlushInterval", ns3.TimeValue(interval))
+
+        def flushed(n_records):
+            records = numpy.empty(n_records, dtype=dtype)
+            buffer.CopyRecords(records)
+            callback(records)
+
+        define_make_flush_callback()
+        buffer.SetFlushCallback(cppyy.gbl.MakePacketTraceFlushCallback(flushed))
+        if arguments:
+            buffer.ConnectWithValues[tuple(arguments)](path)
+        else:
+            buffer.Connect(path)
+        return buffer
+
+    cppyy.gbl.ns3.ConnectTraceBuffer = ConnectTraceBuffer
+
+
+def setup_mobility_bindings(cppyy) -> None:
+    # Bulk access to the positions and velocities of nodes, as NumPy arrays of shape (N, 3)
+    # filled in place by MobilityHelper, instead of one call per node.
+    # Nodes default to every node in NodeList. NumPy is only imported when these are used.
+    def get_nodes(nodes):
+        return cppyy.gbl.ns3.NodeContainer.GetGlobal() if nodes is None else nodes
+
+    def get_node_vectors(getter, nodes):
+        import numpy
+
+        nodes = get_nodes(nodes)
+        vectors = numpy.empty((nodes.GetN(), 3), dtype=numpy.float64)
+        getter(nodes, vectors.reshape(-1))
+        return vectors
+
+    def set_node_vectors(setter, vectors, nodes):
+        import numpy
+
+        nodes = get_nodes(nodes)
+        # Only copied if the array is not already a contiguous array of doubles
+        vectors = numpy.ascontiguousarray(vectors, dtype=numpy.float64)
+        if vectors.shape != (nodes.GetN(), 3):
+            raise ValueError(f"Expected an array of shape ({nodes.GetN()}, 3), got {vectors.shape}")
+        setter(nodes, vectors.reshape(-1))
+
+    def GetNodePositions(nodes=None):
+        return get_node_vectors(cppyy.gbl.ns3.MobilityHelper.GetPositions, nodes)
+
+    def GetNodeVelocities(nodes=None):
+        return get_node_vectors(cppyy.gbl.ns3.MobilityHelper.GetVelocities, nodes)
+
+    def SetNodePositions(positions, nodes=None) -> None:
+        set_node_vectors(cppyy.gbl.ns3.MobilityHelper.SetPositions, positions, nodes)
+
+    def SetNodeVelocities(velocities, nodes=None) -> None:
+        set_node_vectors(cppyy.gbl.ns3.MobilityHelper.SetVelocities, velocities, nodes)
+
+    for function in [GetNodePositions, GetNodeVelocities, SetNodePositions, SetNodeVelocities]:
+        setattr(cppyy.gbl.ns3, function.__name__, function)
+
+
+# Functions called right after a module is loaded
+MODULE_POST_LOAD_HOOKS = {
+    "core": [setup_core_bindings, setup_time_bindings, setup_simulator_bindings],
+    "network": [setup_network_bindings, setup_trace_buffer_bindings],
+    "mobility": [setup_mobility_bindings],
+}
+
+# Names defined in Python by the post-load hooks of each module
+MODULE_PYTHON_SYMBOLS = {
+    "core": ["LookupByNameFailSafe", "TimeArray"],
+    "network": ["ConnectTraceBuffer"],
+    "mobility": ["GetNodePositions", "GetNodeVelocities", "SetNodePositions", "SetNodeVelocities"],
+}
+
+
+def dictionaries_enabled() -> bool:
+    # Precompiled dictionaries can be ignored with NS3_BINDINGS_DICTIONARIES=0
+    return os.getenv("NS3_BINDINGS_DICTIONARIES", "1").lower() not in ["0", "off", "false", "no"]
+
+
+def find_module_dictionary(library_path: str, module_header: str) -> str:
+    # Dictionaries are built by the python-dictionaries CMake target, next to the libraries
+    # e.g. lib/python-dictionaries/libns3-dev-core-default-dictionary.so
+    library_dir, library = os.path.split(library_path)
+    library_stem, library_extension = os.path.splitext(library)
+    dictionary = os.path.join(
+        library_dir, "python-dictionaries", f"{library_stem}-dictionary{library_extension}"
     )
-    setattr(cppyy.gbl.ns3, "LookupByNameFailSafe", cppyy.gbl.LookupByNameFailSafe)
+    dictionary_pcm = os.path.splitext(dictionary)[0] + "_rdict.pcm"
+    try:
+        newest_source = max(os.stat(library_path).st_mtime_ns, os.stat(module_header).st_mtime_ns)
+        oldest_dictionary = min(
+            os.stat(dictionary).st_mtime_ns, os.stat(dictionary_pcm).st_mtime_ns
+        )
+    except OSError:
+        # Missing dictionary
+        return ""
+    # Dictionaries older than the module were not rebuilt and may not match it
+    if oldest_dictionary < newest_source:
+        return ""
+    return dictionary
+
+
+class ModuleLoader:
+    """Loads ns-3 modules (shared library and module header) on demand"""
+
+    def __init__(self, cppyy, resolution: dict):
+        self.cppyy = cppyy
+        # Modules and respective libraries, sorted according to their dependencies
+        self.libraries = dict(zip(resolution["modules"], resolution["libraries"]))
+        library_modules = dict(zip(resolution["libraries"], resolution["modules"]))
+        self.dependencies = {}
+        for library, linked_libraries in resolution["dependencies"].items():
+            if library not in library_modules:
+                continue
+            self.dependencies[library_modules[library]] = [
+                library_modules[x] for x in linked_libraries if x in library_modules
+            ]
+        self.symbols = dict(resolution["symbols"])
+        for module, names in MODULE_PYTHON_SYMBOLS.items():
+            if module not in self.libraries:
+                continue
+            for name in names:
+                self.symbols[name] = self.symbols.get(name, []) + [module]
+        self.prefix = resolution["prefix"]
+        self.use_dictionaries = dictionaries_enabled()
+        self.loaded_modules = set()
+
+    def dependency_closure(self, modules: list) -> list:
+        pending_modules = list(modules)
+        closure = set()
+        while pending_modules:
+            module = pending_modules.pop()
+            if module in closure:
+                continue
+            if module not in self.libraries:
+                raise Exception(
+                    f"Unknown ns-3 module '{module}'. Available modules: {', '.join(self.libraries)}"
+                )
+            closure.add(module)
+            pending_modules.extend(self.dependencies.get(module, []))
+        # Keep the dependency order
+        return [module for module in self.libraries if module in closure]
+
+    def load(self, modules: list) -> None:
+        for module in self.dependency_closure(modules):
+            if module in self.loaded_modules:
+                continue
+            # Mark the module as loaded first, since post-load hooks can trigger new loads
+            self.loaded_modules.add(module)
+            try:
+                with IMPORT_PROFILER.phase("load_library", module):
+                    self.cppyy.load_library(self.libraries[module])
+                self.load_declarations(module)
+            except Exception:
+                self.loaded_modules.discard(module)
+                raise
+            for hook in MODULE_POST_LOAD_HOOKS.get(module, []):
+                with IMPORT_PROFILER.phase(hook.__name__, module):
+                    hook(self.cppyy)
+
+    def restrict(self, modules: list) -> None:
+        # Forget about modules outside the dependency closure (except those already loaded)
+        closure = set(self.dependency_closure(modules)) | self.loaded_modules
+        self.libraries = {x: y for x, y in self.libraries.items() if x in closure}
+        self.dependencies = {x: y for x, y in self.dependencies.items() if x in closure}
+        symbols = {}
+        for name, name_modules in self.symbols.items():
+            name_modules = [x for x in name_modules if x in closure]
+            if name_modules:
+                symbols[name] = name_modules
+        self.symbols = symbols
+
+    def load_declarations(self, module: str) -> None:
+        # Prefer the precompiled dictionary, falling back to parsing the module header
+        module_header = f"ns3/{module}-module.h"
+        if self.use_dictionaries:
+            library_path = find_library_path(self.libraries[module], self.prefix)[0]
+            dictionary = find_module_dictionary(
+                library_path, os.path.join(self.prefix, "include", module_header)
+            )
+            if dictionary:
+                try:
+                    with IMPORT_PROFILER.phase("load_reflection_info", module):
+                        self.cppyy.load_reflection_info(dictionary)
+                    return
+                except RuntimeError:
+                    # e.g. a dictionary built by an incompatible version of cppyy
+                    pass
+        with IMPORT_PROFILER.phase("include", module):
+            self.cppyy.include(module_header)
+
+    def load_for_code(self, code: str) -> None:
+        # Load the modules providing the names used by a C++ code snippet
+        modules = set()
+        for token in set(re.findall(r"[A-Za-z_]\w*", code)):
+            modules.update(self.symbols.get(token, []))
+        self.load([module for module in self.libraries if module in modules])
+
+    def lookup(self, name: str):
+        try:
+            return getattr(self.cppyy.gbl.ns3, name)
+        except AttributeError:
+            return None
+
+    def find(self, name: str):
+        # Load the modules known to provide the name. Names missing from the symbol index
+        # can still have been defined by C++ snippets, but typos and hasattr() probes must
+        # not load every module.
+        self.load(self.symbols.get(name, []))
+        value = self.lookup(name)
+        if value is None:
+            raise AttributeError(f"ns-3 has no attribute '{name}'")
+        return value
+
+
+class CppyyProxy:
+    """cppyy as exposed by ns.cppyy, whose cppdef() and cppexec() load the ns-3 modules
+    the C++ snippet refers to first. The cppyy module itself is left untouched."""
+
+    def __init__(self, loader: ModuleLoader):
+        self._loader = loader
+
+    def __getattr__(self, name: str):
+        return getattr(self._loader.cppyy, name)
+
+    def __dir__(self) -> list:
+        return dir(self._loader.cppyy)
+
+    def cppdef(self, code: str, *args, **kwargs):
+        self._loader.load_for_code(code)
+        return self._loader.cppyy.cppdef(code, *args, **kwargs)
+
+    def cppexec(self, code: str, *args, **kwargs):
+        self._loader.load_for_code(code)
+        return self._loader.cppyy.cppexec(code, *args, **kwargs)
+
+
+class LazyNamespace:
+    """The ns-3 namespace, loading each module the first time one of its names is accessed"""
+
+    def __init__(self, loader: ModuleLoader):
+        self.__dict__["_loader"] = loader
+        # We expose cppyy to consumers of this module as ns.cppyy
+        self.__dict__["cppyy"] = CppyyProxy(loader)
+
+    def __getattr__(self, name: str):
+        # Do not load modules when Python probes for special attributes
+        if name.startswith("__") and name.endswith("__"):
+            raise AttributeError(name)
+        value = self._loader.find(name)
+        # Cache the value to skip __getattr__ on the next access
+        self.__dict__[name] = value
+        return value
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._loader.cppyy.gbl.ns3, name, value)
+        self.__dict__[name] = value
+
+    def __dir__(self) -> list:
+        return sorted(set(self._loader.symbols.keys()) | set(self.__dict__.keys()) - {"_loader"})
+
+    def __repr__(self) -> str:
+        loaded_modules = [x for x in self._loader.libraries if x in self._loader.loaded_modules]
+        return f"<ns-3 namespace (loaded modules: {', '.join(loaded_modules)})>"
+
+    def preload(self, modules=None) -> None:
+        """Eagerly load the given modules (and their dependencies), or all of them if None"""
+        if modules is None:
+            modules = list(self._loader.libraries.keys())
+        elif isinstance(modules, str):
+            modules = [modules]
+        self._loader.load(modules)
+
+    def load(self, modules=None) -> None:
+        """Restrict the namespace to the given modules (and their dependencies), then load them"""
+        if isinstance(modules, str):
+            modules = [modules]
+        if modules is not None:
+            self._loader.restrict(modules)
+        self.preload(modules)
+
+    def cppdef(self, code: str, *args, **kwargs):
+        """Like cppyy.cppdef(), after loading the modules providing the names used by code"""
+        return self.cppyy.cppdef(code, *args, **kwargs)
+
+    def cppexec(self, code: str, *args, **kwargs):
+        """Like cppyy.cppexec(), after loading the modules providing the names used by code"""
+        return self.cppyy.cppexec(code, *args, **kwargs)
+
+
+def load_modules():
+    lock_file = find_ns3_lock()
+
+    # Only the selected modules and their dependencies are resolved
+    selected_modules = get_selected_modules()
+
+    # Reuse the libraries resolved by a previous run if none of them changed
+    cache_path = get_bindings_cache_path(selected_modules)
+    with IMPORT_PROFILER.phase("cache lookup"):
+        resolution = load_cached_bindings_resolution(cache_path, lock_file, selected_modules)
+    if resolution is None:
+        resolution = resolve_ns3_libraries(lock_file, selected_modules)
+        store_cached_bindings_resolution(cache_path, resolution)
+
+    prefix = resolution["prefix"]
+
+    # Try to import Cppyy and warn the user in case it is not found
+    try:
+        with IMPORT_PROFILER.phase("import cppyy"):
+            import cppyy
+    except ModuleNotFoundError:
+        print("Cppyy is required by the ns-3 python bindings.")
+        print("You can install it with the following command: pip install cppyy")
+        exit(-1)
+
+    # Enable full logs for debugging
+    # cppyy.set_debug(True)
+
+    # Register Ptr<> as a smart pointer
+    import libcppyy
+
+    libcppyy.AddSmartPtrType("Ptr")
 
-    return cppyy.gbl.ns3
+    # Import ns-3 libraries
+    for variant in ["lib", "lib64"]:
+        path_to_lib = f"{prefix}/{variant}"
+        if not os.path.exists(path_to_lib):
+            continue
+        cppyy.add_library_path(path_to_lib)
+    del variant, path_to_lib
+    cppyy.add_include_path(f"{prefix}/include")
+
+    # We then need to include all include directories for dependencies
+    with IMPORT_PROFILER.phase("include paths setup"):
+        cppyy.cppexec(resolution["defines"])
+        for linked_lib_include_dir in resolution["include_dirs"]:
+            if os.path.isdir(linked_lib_include_dir):
+                cppyy.add_include_path(linked_lib_include_dir)
+
+    # Modules are only loaded when one of their names is accessed
+    return LazyNamespace(ModuleLoader(cppyy, resolution))
 
 
 # Load all modules and make them available via a built-in
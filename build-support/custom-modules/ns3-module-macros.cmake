@@ -243,6 +243,11 @@ function(build_lib)
   # Write a module header that includes all headers from that module
   write_module_header("${BLIB_LIBNAME}" "${BLIB_HEADER_FILES}")
 
+  # Precompile the module headers for the python bindings
+  if(${ENABLE_PYTHON_DICTIONARIES})
+    build_lib_python_dictionary("${BLIB_LIBNAME}" "${BLIB_HEADER_FILES}")
+  endif()
+
   # Check if headers actually exist to prevent copying errors during
   # installation (includes the module header created above)
   build_lib_check_headers(${BLIB_LIBNAME})
@@ -0,0 +1,148 @@
+# Precompiled dictionaries let cppyy load the reflection information of each
+# module, instead of parsing the module headers every time the bindings are
+# imported. They are generated with rootcling, shipped by cppyy-cling.
+set(ENABLE_PYTHON_DICTIONARIES OFF)
+set(ENABLE_PYTHON_DICTIONARIES_REASON)
+
+# The ROOT headers required by the generated dictionaries are shipped with the
+# cppyy backend
+execute_process(
+  COMMAND
+    ${Python3_EXECUTABLE} -c
+    "import os; import cppyy_backend; print(os.path.abspath(os.path.dirname(cppyy_backend.__file__)))"
+  OUTPUT_VARIABLE CPPYY_BACKEND_DIR
+  RESULT_VARIABLE return_code
+  ERROR_QUIET
+)
+string(STRIP "${CPPYY_BACKEND_DIR}" CPPYY_BACKEND_DIR)
+
+# The cppyy backend installs a rootcling script along with the Python scripts,
+# which sets up the library path and C++ flags of the rootcling binary it ships
+execute_process(
+  COMMAND ${Python3_EXECUTABLE} -c
+          "import sysconfig; print(sysconfig.get_path('scripts'))"
+  OUTPUT_VARIABLE PYTHON_SCRIPTS_DIR
+  ERROR_QUIET
+)
+string(STRIP "${PYTHON_SCRIPTS_DIR}" PYTHON_SCRIPTS_DIR)
+
+mark_as_advanced(ROOTCLING)
+find_program(ROOTCLING rootcling HINTS ${PYTHON_SCRIPTS_DIR})
+
+if(NOT (${return_code} EQUAL 0))
+  set(ENABLE_PYTHON_DICTIONARIES_REASON "missing cppyy_backend")
+elseif("${ROOTCLING}" STREQUAL "ROOTCLING-NOTFOUND")
+  set(ENABLE_PYTHON_DICTIONARIES_REASON "missing rootcling")
+else()
+  set(ENABLE_PYTHON_DICTIONARIES ON)
+  set(CMAKE_PYTHON_DICTIONARY_OUTPUT_DIRECTORY
+      ${CMAKE_LIBRARY_OUTPUT_DIRECTORY}/python-dictionaries
+  )
+  make_directory(${CMAKE_PYTHON_DICTIONARY_OUTPUT_DIRECTORY})
+
+  # Build all dictionaries with ./ns3 build python-dictionaries
+  add_custom_target(python-dictionaries)
+
+  # The limits.h of rootcling does not reach the POSIX limits of glibc, which
+  # are required by the <semaphore> of libstdc++, so they are included first
+  set(PYTHON_DICTIONARY_PRELUDE
+      ${CMAKE_BINARY_DIR}/python-dictionary-prelude.h
+  )
+  file(
+    WRITE ${PYTHON_DICTIONARY_PRELUDE}
+    "#if __has_include(<bits/posix1_lim.h>)\n#include <bits/posix1_lim.h>\n#endif\n"
+  )
+endif()
+unset(return_code)
+
+if(NOT ${ENABLE_PYTHON_DICTIONARIES})
+  message(
+    ${HIGHLIGHTED_STATUS}
+    "Bindings: precompiled dictionaries disabled (${ENABLE_PYTHON_DICTIONARIES_REASON}). Module headers will be parsed at runtime."
+  )
+endif()
+
+# This function generates and builds the precompiled dictionary of a module
+#
+# Arguments: libname = module name (e.g. core, wifi) header_files =
+# "cmake;list;of;public;.h;files;"
+function(build_lib_python_dictionary libname header_files)
+  # The dictionary is named after the module library, so the bindings can find
+  # it, e.g. lib/python-dictionaries/libns3-dev-core-default-dictionary.so
+  set(dictionary_name ns${NS3_VER}-${libname}${build_profile_suffix}-dictionary)
+  set(dictionary_library
+      ${CMAKE_PYTHON_DICTIONARY_OUTPUT_DIRECTORY}/${CMAKE_SHARED_LIBRARY_PREFIX}${dictionary_name}${CMAKE_SHARED_LIBRARY_SUFFIX}
+  )
+  set(dictionary_source ${CMAKE_CURRENT_BINARY_DIR}/${dictionary_name}.cxx)
+  set(dictionary_pcm
+      ${CMAKE_PYTHON_DICTIONARY_OUTPUT_DIRECTORY}/${CMAKE_SHARED_LIBRARY_PREFIX}${dictionary_name}_rdict.pcm
+  )
+
+  # Select everything declared in the public headers of the module
+  set(absolute_header_files)
+  set(linkdef_contents
+      "#ifdef __CLING__\n#pragma link off all globals;\n#pragma link off all classes;\n#pragma link off all functions;\n#pragma link C++ nestedclasses;\n"
+  )
+  foreach(header ${header_files})
+    get_filename_component(
+      header ${header} ABSOLUTE BASE_DIR ${CMAKE_CURRENT_SOURCE_DIR}
+    )
+    list(APPEND absolute_header_files ${header})
+    string(APPEND linkdef_contents "#pragma link C++ defined_in \"${header}\";\n")
+  endforeach()
+  string(APPEND linkdef_contents "#endif\n")
+
+  # Only rewrite the LinkDef when it changes, to preserve its timestamp
+  set(linkdef ${CMAKE_CURRENT_BINARY_DIR}/${libname}-linkdef.h)
+  set(old_linkdef_contents)
+  if(EXISTS ${linkdef})
+    file(READ ${linkdef} old_linkdef_contents)
+  endif()
+  if(NOT ("${linkdef_contents}" STREQUAL "${old_linkdef_contents}"))
+    file(WRITE ${linkdef} "${linkdef_contents}")
+  endif()
+
+  # Use the same include directories and definitions exported to users
+  set(include_dirs
+      "$<TARGET_PROPERTY:${libname},INCLUDE_DIRECTORIES>"
+  )
+  set(definitions
+      "$<TARGET_PROPERTY:${libname},INTERFACE_COMPILE_DEFINITIONS>"
+  )
+  # cppyy only needs the reflection information: the I/O streamers of ROOT
+  # files are skipped, since rootcling crashes building some of them
+  add_custom_command(
+    OUTPUT ${dictionary_source} ${dictionary_pcm}
+    COMMAND
+      ${ROOTCLING} --interpreteronly -f ${dictionary_source} -s ${dictionary_library}
+      "$<$<BOOL:${include_dirs}>:-I$<JOIN:${include_dirs},;-I>>"
+      "$<$<BOOL:${definitions}>:-D$<JOIN:${definitions},;-D>>"
+      ${PYTHON_DICTIONARY_PRELUDE} ns3/${libname}-module.h ${linkdef}
+    DEPENDS ${libname} ${CMAKE_HEADER_OUTPUT_DIRECTORY}/${libname}-module.h
+            ${absolute_header_files} ${linkdef}
+    COMMENT "Generating the python dictionary of ${libname}"
+    COMMAND_EXPAND_LISTS VERBATIM
+  )
+
+  # Compile the generated dictionary into a shared library loaded by cppyy
+  add_library(${libname}-dictionary SHARED ${dictionary_source})
+  target_link_libraries(${libname}-dictionary PRIVATE ${libname})
+  target_include_directories(
+    ${libname}-dictionary PRIVATE ${CPPYY_BACKEND_DIR}/include
+  )
+  # Generated code is not expected to follow our warning policy
+  target_compile_options(${libname}-dictionary PRIVATE -w)
+  set_target_properties(
+    ${libname}-dictionary
+    PROPERTIES OUTPUT_NAME ${dictionary_name}
+               LIBRARY_OUTPUT_DIRECTORY ${CMAKE_PYTHON_DICTIONARY_OUTPUT_DIRECTORY}
+  )
+  add_dependencies(python-dictionaries ${libname}-dictionary)
+
+  install(TARGETS ${libname}-dictionary
+          LIBRARY DESTINATION ${CMAKE_INSTALL_LIBDIR}/python-dictionaries
+  )
+  install(FILES ${dictionary_pcm}
+          DESTINATION ${CMAKE_INSTALL_LIBDIR}/python-dictionaries
+  )
+endfunction()
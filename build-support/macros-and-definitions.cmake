@@ -675,6 +675,7 @@ macro(process_options)
   endif()
 
   set(ENABLE_PYTHON_BINDINGS OFF)
+  set(ENABLE_PYTHON_DICTIONARIES OFF)
   if(${NS3_PYTHON_BINDINGS})
     if(NOT ${Python3_FOUND})
       message(
@@ -709,6 +710,11 @@ macro(process_options)
         bindings/python/ns__init__.py ${destination_dir}/__init__.py COPYONLY
       )
 
+      # Precompile the module headers into dictionaries loaded by the bindings
+      if(${ENABLE_PYTHON_BINDINGS})
+        include(ns3-python-dictionaries)
+      endif()
+
       # And create an install target for the bindings
       if(NOT NS3_BINDINGS_INSTALL_DIR)
         # If the installation directory for the python bindings is not set,
@@ -0,0 +1,72 @@
+/*
+ * SPDX-License-Identifier: GPL-2.0-only
+ */
+
+#include "stats-simulator-impl.h"
+
+#include "log.h"
+#include "string.h"
+
+#include <fstream>
+#include <iomanip>
+#include <limits>
+
+/**
+ * @file
+ * @ingroup simulator
+ * ns3::StatsSimulatorImpl implementation.
+ */
+
+namespace ns3
+{
+
+NS_LOG_COMPONENT_DEFINE("StatsSimulatorImpl");
+
+NS_OBJECT_ENSURE_REGISTERED(StatsSimulatorImpl);
+
+TypeId
+StatsSimulatorImpl::GetTypeId()
+{
+    static TypeId tid =
+        TypeId("ns3::StatsSimulatorImpl")
+            .SetParent<DefaultSimulatorImpl>()
+            .SetGroupName("Core")
+            .AddConstructor<StatsSimulatorImpl>()
+            .AddAttribute("StatsFile",
+                          "The file where the number of events executed and the simulation "
+                          "time are written, in JSON, at the end of each run. Nothing is "
+                          "written if empty.",
+                          StringValue(""),
+                          MakeStringAccessor(&StatsSimulatorImpl::m_statsFile),
+                          MakeStringChecker());
+    return tid;
+}
+
+StatsSimulatorImpl::StatsSimulatorImpl()
+{
+    NS_LOG_FUNCTION(this);
+}
+
+StatsSimulatorImpl::~StatsSimulatorImpl()
+{
+    NS_LOG_FUNCTION(this);
+}
+
+void
+StatsSimulatorImpl::Run()
+{
+    NS_LOG_FUNCTION(this);
+    DefaultSimulatorImpl::Run();
+    if (m_statsFile.empty())
+    {
+        return;
+    }
+
+    std::ofstream os(m_statsFile, std::ofstream::out | std::ofstream::trunc);
+    // Write the simulation time without rounding it
+    os << std::setprecision(std::numeric_limits<double>::max_digits10);
+    os << "{\"events\": " << GetEventCount() << ", \"simulation_time\": " << Now().GetSeconds()
+       << "}" << std::endl;
+}
+
+} // namespace ns3
@@ -0,0 +1,55 @@
+/*
+ * SPDX-License-Identifier: GPL-2.0-only
+ */
+
+#ifndef STATS_SIMULATOR_IMPL_H
+#define STATS_SIMULATOR_IMPL_H
+
+#include "default-simulator-impl.h"
+
+#include <string>
+
+/**
+ * @file
+ * @ingroup simulator
+ * ns3::StatsSimulatorImpl declaration.
+ */
+
+namespace ns3
+{
+
+/**
+ * @ingroup simulator
+ *
+ * The default single process simulator implementation, which also writes
+ * the number of events executed and the simulation time, in JSON, to the
+ * file named by the @c StatsFile attribute at the end of each Run().
+ *
+ * It is selected with the @c SimulatorImplementationType global value,
+ * e.g. by the profilers of the ns3 script, through the @c NS_GLOBAL_VALUE
+ * and @c NS_ATTRIBUTE_DEFAULT environment variables.
+ */
+class StatsSimulatorImpl : public DefaultSimulatorImpl
+{
+  public:
+    /**
+     *  Register this type.
+     *  @return The object TypeId.
+     */
+    static TypeId GetTypeId();
+
+    /** Constructor. */
+    StatsSimulatorImpl();
+    /** Destructor. */
+    ~StatsSimulatorImpl() override;
+
+    // Inherited
+    void Run() override;
+
+  private:
+    std::string m_statsFile; //!< File where the statistics are written
+};
+
+} // namespace ns3
+
+#endif /* STATS_SIMULATOR_IMPL_H */
@@ -15,12 +15,24 @@
 #include "singleton.h"
 #include "system-path.h"
 
+#include <cerrno>
 #include <cmath>
+#include <cstdlib>
 #include <cstring>
+#include <iomanip>
+#include <iostream>
 #include <list>
 #include <map>
+#include <set>
+#include <sstream>
 #include <vector>
 
+#ifndef __WIN32__
+#include <dlfcn.h>
+#include <sys/wait.h>
+#include <unistd.h>
+#endif
+
 /**
  * @file
  * @ingroup testing
@@ -164,6 +176,50 @@ class TestRunnerImpl : public Singleton<TestRunnerImpl>
     int Run(int argc, char* argv[]);
 
   private:
+    /**
+     * Line written on the standard output and error streams by the server
+     * mode once a test suite has been run.
+     *
+     * On the standard output, the line is followed by a space and by the
+     * exit status of the test suite (0 if it passed, 1 if it failed), or by
+     * the negative signal number if it crashed.
+     */
+    static constexpr const char* SERVER_DONE = "ns3-test-runner-server-done";
+
+    /**
+     * Run the test suites named on the standard input, until its end.
+     *
+     * Each line holds the name of a test suite, optionally followed by a tab
+     * and the name of the file receiving its report (by default, the report
+     * is written on the standard output). Once the test suite has been run,
+     * the SERVER_DONE line is written on the standard output and error streams.
+     *
+     * Each test suite runs in a process forked from the server, so that it
+     * starts from the same state as in a new test-runner process, without
+     * loading the libraries and registering the TypeIds again. This saves the
+     * start-up of a process per test suite, e.g. for test.py.
+     *
+     * @param [in] testType Restrict to tests of this type.
+     * @param [in] maximumTestDuration Restrict to tests shorter than this.
+     * @param [in] xml Generate XML reports if \c true.
+     * @returns Success status
+     */
+    int RunServer(TestSuite::Type testType, TestCase::Duration maximumTestDuration, bool xml);
+    /**
+     * Run a test suite requested to the server.
+     *
+     * @param [in] testName The name of the test suite.
+     * @param [in] out The file receiving the report, or the standard output if empty.
+     * @param [in] testType Restrict to tests of this type.
+     * @param [in] maximumTestDuration Restrict to tests shorter than this.
+     * @param [in] xml Generate XML report if \c true.
+     * @returns Success status
+     */
+    int RunServerTest(std::string testName,
+                      std::string out,
+                      TestSuite::Type testType,
+                      TestCase::Duration maximumTestDuration,
+                      bool xml);
     /**
      * Check if this is the root of the source tree.
      * @param [in] path The path to test.
@@ -190,6 +246,14 @@ class TestRunnerImpl : public Singleton<TestRunnerImpl>
      * @returns The sanitized string.
      */
     std::string ReplaceXmlSpecialCharacters(std::string xml) const;
+    /**
+     * Escape the quotes, backslashes and control characters of a string,
+     * so that it can be written into a JSON string.
+     *
+     * @param [in] str The raw string.
+     * @returns The escaped string.
+     */
+    std::string ReplaceJsonSpecialCharacters(std::string str) const;
     /**
      * Print the test report.
      *
@@ -205,10 +269,25 @@ class TestRunnerImpl : public Singleton<TestRunnerImpl>
      * @param [in] begin Iterator to the first TestCase to print.
      * @param [in] end Iterator to the end of the list.
      * @param [in] printTestType Prepend the test type label if \c true.
+     * @param [in] printTestLibrary Append a tab and the path of the library
+     *             defining the test suite if \c true.
      */
     void PrintTestNameList(std::list<TestCase*>::const_iterator begin,
                            std::list<TestCase*>::const_iterator end,
-                           bool printTestType) const;
+                           bool printTestType,
+                           bool printTestLibrary) const;
+    /**
+     * Print the manifest of all requested test suites, in JSON.
+     *
+     * For each test suite, the manifest holds its name, its type, the
+     * durations of its test cases, the library defining it and the data
+     * directories of the suite and of its test cases.
+     *
+     * @param [in] begin Iterator to the first TestCase to print.
+     * @param [in] end Iterator to the end of the list.
+     */
+    void PrintTestManifest(std::list<TestCase*>::const_iterator begin,
+                           std::list<TestCase*>::const_iterator end) const;
     /** Print the list of test types. */
     void PrintTestTypeList() const;
     /**
@@ -637,6 +716,30 @@ TestRunnerImpl::ReplaceXmlSpecialCharacters(std::string xml) const
     return result;
 }
 
+std::string
+TestRunnerImpl::ReplaceJsonSpecialCharacters(std::string str) const
+{
+    NS_LOG_FUNCTION(this << str);
+    std::ostringstream result;
+    for (char character : str)
+    {
+        if (character == '"' || character == '\\')
+        {
+            result << '\\' << character;
+        }
+        else if (static_cast<unsigned char>(character) < 0x20)
+        {
+            result << "\\u" << std::hex << std::setw(4) << std::setfill('0')
+                   << static_cast<int>(character) << std::dec;
+        }
+        else
+        {
+            result << character;
+        }
+    }
+    return result.str();
+}
+
 /** Helper to indent output a specified number of steps. */
 struct Indent
 {
@@ -757,6 +860,12 @@ TestRunnerImpl::PrintHelp(const char* program_name) const
         << "  --list                 : an alias for --print-test-name-list" << std::endl
         << "  --print-test-types     : print the type of tests along with their names" << std::endl
         << "  --print-test-type-list : print the list of types of tests available" << std::endl
+        << "  --print-test-libraries : print the library defining each test along with its"
+        << std::endl
+        << "                           name" << std::endl
+        << "  --print-test-manifest  : print the name, type, test case durations, library"
+        << std::endl
+        << "                           and data directories of the tests, in JSON" << std::endl
         << "  --print-temp-dir       : print name of temporary directory before running "
         << std::endl
         << "                           the tests" << std::endl
@@ -767,6 +876,11 @@ TestRunnerImpl::PrintHelp(const char* program_name) const
         << "  --assert-on-failure    : when a test fails, crash immediately (useful" << std::endl
         << "                           when running under a debugger" << std::endl
         << "  --stop-on-failure      : when a test fails, stop immediately" << std::endl
+        << "  --server               : run the tests named on standard input, one per line,"
+        << std::endl
+        << "                           each optionally followed by a tab and the file " << std::endl
+        << "                           receiving its result, until the end of the input"
+        << std::endl
         << "  --fullness=FULLNESS    : choose the duration of tests to run: QUICK, " << std::endl
         << "                           EXTENSIVE, or TAKES_FOREVER, where EXTENSIVE " << std::endl
         << "                           includes QUICK and TAKES_FOREVER includes " << std::endl
@@ -785,9 +899,10 @@ TestRunnerImpl::PrintHelp(const char* program_name) const
 void
 TestRunnerImpl::PrintTestNameList(std::list<TestCase*>::const_iterator begin,
                                   std::list<TestCase*>::const_iterator end,
-                                  bool printTestType) const
+                                  bool printTestType,
+                                  bool printTestLibrary) const
 {
-    NS_LOG_FUNCTION(this << &begin << &end << printTestType);
+    NS_LOG_FUNCTION(this << &begin << &end << printTestType << printTestLibrary);
     std::map<TestSuite::Type, std::string> label;
 
     label[TestSuite::Type::ALL] = "all                  ";
@@ -804,8 +919,91 @@ TestRunnerImpl::PrintTestNameList(std::list<TestCase*>::const_iterator begin,
         {
             std::cout << label[test->GetTestType()];
         }
-        std::cout << test->GetName() << std::endl;
+        std::cout << test->GetName();
+#ifndef __WIN32__
+        // The test suites are static objects of the library defining them
+        Dl_info info;
+        if (printTestLibrary && dladdr(test, &info) != 0 && info.dli_fname != nullptr)
+        {
+            std::cout << "\t" << info.dli_fname;
+        }
+#endif
+        std::cout << std::endl;
+    }
+}
+
+void
+TestRunnerImpl::PrintTestManifest(std::list<TestCase*>::const_iterator begin,
+                                  std::list<TestCase*>::const_iterator end) const
+{
+    NS_LOG_FUNCTION(this << &begin << &end);
+    // The names of the types are the ones of the --test-type option
+    std::map<TestSuite::Type, std::string> type;
+    type[TestSuite::Type::ALL] = "all";
+    type[TestSuite::Type::UNIT] = "unit";
+    type[TestSuite::Type::SYSTEM] = "system";
+    type[TestSuite::Type::EXAMPLE] = "example";
+    type[TestSuite::Type::PERFORMANCE] = "performance";
+
+    std::map<TestCase::Duration, std::string> duration;
+    duration[TestCase::Duration::QUICK] = "QUICK";
+    duration[TestCase::Duration::EXTENSIVE] = "EXTENSIVE";
+    duration[TestCase::Duration::TAKES_FOREVER] = "TAKES_FOREVER";
+
+    std::cout << "{" << std::endl << "  \"suites\": [";
+    for (auto i = begin; i != end; ++i)
+    {
+        auto test = dynamic_cast<TestSuite*>(*i);
+        NS_ASSERT(test != nullptr);
+
+        std::set<TestCase::Duration> durations;
+        for (auto testCase : test->m_children)
+        {
+            durations.insert(testCase->m_duration);
+        }
+
+        std::string library;
+#ifndef __WIN32__
+        Dl_info info;
+        if (dladdr(test, &info) != 0 && info.dli_fname != nullptr)
+        {
+            library = info.dli_fname;
+        }
+#endif
+
+        // The data directories of the suite and of all of its test cases
+        std::set<std::string> dataDirs;
+        std::list<TestCase*> testCases{test};
+        while (!testCases.empty())
+        {
+            auto testCase = testCases.front();
+            testCases.pop_front();
+            if (!testCase->m_dataDir.empty())
+            {
+                dataDirs.insert(testCase->m_dataDir);
+            }
+            testCases.insert(testCases.end(),
+                             testCase->m_children.begin(),
+                             testCase->m_children.end());
+        }
+
+        std::cout << (i == begin ? "" : ",") << std::endl
+                  << "    {\"name\": \"" << ReplaceJsonSpecialCharacters(test->GetName())
+                  << "\", \"type\": \"" << type[test->GetTestType()] << "\", \"durations\": [";
+        for (auto j = durations.begin(); j != durations.end(); ++j)
+        {
+            std::cout << (j == durations.begin() ? "" : ", ") << "\"" << duration[*j] << "\"";
+        }
+        std::cout << "], \"library\": \"" << ReplaceJsonSpecialCharacters(library)
+                  << "\", \"data_dirs\": [";
+        for (auto j = dataDirs.begin(); j != dataDirs.end(); ++j)
+        {
+            std::cout << (j == dataDirs.begin() ? "" : ", ") << "\""
+                      << ReplaceJsonSpecialCharacters(*j) << "\"";
+        }
+        std::cout << "]}";
     }
+    std::cout << std::endl << "  ]" << std::endl << "}" << std::endl;
 }
 
 void
@@ -888,6 +1086,9 @@ TestRunnerImpl::Run(int argc, char* argv[])
     bool printTestTypeList = false;
     bool printTestNameList = false;
     bool printTestTypeAndName = false;
+    bool printTestLibrary = false;
+    bool printTestManifest = false;
+    bool server = false;
     TestCase::Duration maximumTestDuration = TestCase::Duration::QUICK;
     char* progname = argv[0];
 
@@ -926,10 +1127,22 @@ TestRunnerImpl::Run(int argc, char* argv[])
         {
             printTestTypeAndName = true;
         }
+        else if (arg == "--print-test-libraries")
+        {
+            printTestLibrary = true;
+        }
+        else if (arg == "--print-test-manifest")
+        {
+            printTestManifest = true;
+        }
         else if (arg == "--print-test-type-list")
         {
             printTestTypeList = true;
         }
+        else if (arg == "--server")
+        {
+            server = true;
+        }
         else if (arg == "--append")
         {
             append = true;
@@ -1015,8 +1228,6 @@ TestRunnerImpl::Run(int argc, char* argv[])
         return 1;
     }
 
-    std::list<TestCase*> tests = FilterTests(testName, testType, maximumTestDuration);
-
     if (m_tempDir.empty())
     {
         m_tempDir = SystemPath::MakeTemporaryDirectoryName();
@@ -1025,9 +1236,25 @@ TestRunnerImpl::Run(int argc, char* argv[])
     {
         std::cout << m_tempDir << std::endl;
     }
+    if (server)
+    {
+        return RunServer(testType, maximumTestDuration, xml);
+    }
+
+    if (printTestManifest)
+    {
+        // Keep the test cases of any duration, to list their durations
+        std::list<TestCase*> tests =
+            FilterTests(testName, testType, TestCase::Duration::TAKES_FOREVER);
+        PrintTestManifest(tests.begin(), tests.end());
+        return 0;
+    }
+
+    std::list<TestCase*> tests = FilterTests(testName, testType, maximumTestDuration);
+
     if (printTestNameList)
     {
-        PrintTestNameList(tests.begin(), tests.end(), printTestTypeAndName);
+        PrintTestNameList(tests.begin(), tests.end(), printTestTypeAndName, printTestLibrary);
         return 0;
     }
     if (printTestTypeList)
@@ -1119,6 +1346,88 @@ TestRunnerImpl::Run(int argc, char* argv[])
     return failed ? 1 : 0;
 }
 
+int
+TestRunnerImpl::RunServer(TestSuite::Type testType,
+                          TestCase::Duration maximumTestDuration,
+                          bool xml)
+{
+    NS_LOG_FUNCTION(this << testType << xml);
+#ifdef __WIN32__
+    std::cerr << "Error:  --server is not supported on Windows" << std::endl;
+    return 1;
+#else
+    std::string line;
+    while (std::getline(std::cin, line))
+    {
+        std::string testName = line;
+        std::string out = "";
+        std::string::size_type tab = line.find('\t');
+        if (tab != std::string::npos)
+        {
+            testName = line.substr(0, tab);
+            out = line.substr(tab + 1);
+        }
+        if (testName.empty())
+        {
+            continue;
+        }
+
+        // Do not let the child process write the buffered output again
+        std::cout.flush();
+        std::cerr.flush();
+
+        pid_t pid = fork();
+        NS_ABORT_MSG_IF(pid < 0, "Could not fork the test-runner: " << std::strerror(errno));
+        if (pid == 0)
+        {
+            std::exit(RunServerTest(testName, out, testType, maximumTestDuration, xml));
+        }
+
+        // Report crashes with the negative signal number
+        int waitStatus = 0;
+        waitpid(pid, &waitStatus, 0);
+        int status = WIFEXITED(waitStatus) ? WEXITSTATUS(waitStatus) : -WTERMSIG(waitStatus);
+
+        std::cerr << std::endl << SERVER_DONE << std::endl;
+        std::cout << std::endl << SERVER_DONE << " " << status << std::endl;
+    }
+    return 0;
+#endif
+}
+
+int
+TestRunnerImpl::RunServerTest(std::string testName,
+                              std::string out,
+                              TestSuite::Type testType,
+                              TestCase::Duration maximumTestDuration,
+                              bool xml)
+{
+    NS_LOG_FUNCTION(this << testName << out << testType << xml);
+    std::list<TestCase*> tests = FilterTests(testName, testType, maximumTestDuration);
+    if (tests.empty())
+    {
+        std::cerr << "Error:  no tests match the requested string" << std::endl;
+        return 1;
+    }
+
+    std::ofstream ofs;
+    std::ostream* os = &std::cout;
+    if (!out.empty())
+    {
+        ofs.open(out, std::ios_base::out | std::ios_base::trunc);
+        os = &ofs;
+    }
+    bool failed = false;
+    for (auto i = tests.begin(); i != tests.end(); ++i)
+    {
+        TestCase* test = *i;
+        test->Run(this);
+        PrintReport(test, os, xml, 0);
+        failed = failed || test->IsFailed();
+    }
+    return failed ? 1 : 0;
+}
+
 int
 TestRunner::Run(int argc, char* argv[])
 {
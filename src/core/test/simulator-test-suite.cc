@@ -11,8 +11,13 @@
 #include "ns3/map-scheduler.h"
 #include "ns3/priority-queue-scheduler.h"
 #include "ns3/simulator.h"
+#include "ns3/stats-simulator-impl.h"
+#include "ns3/string.h"
 #include "ns3/test.h"
 
+#include <fstream>
+#include <sstream>
+
 using namespace ns3;
 
 /**
@@ -651,6 +656,50 @@ SimulatorTemplateTestCase::DoRun()
     Simulator::Destroy();
 }
 
+/**
+ * @ingroup simulator-tests
+ *
+ * @brief Check that StatsSimulatorImpl writes the number of events executed
+ * and the simulation time at the end of the run.
+ */
+class SimulatorStatsTestCase : public TestCase
+{
+  public:
+    SimulatorStatsTestCase();
+
+  private:
+    void DoRun() override;
+};
+
+SimulatorStatsTestCase::SimulatorStatsTestCase()
+    : TestCase("Check the statistics written by StatsSimulatorImpl")
+{
+}
+
+void
+SimulatorStatsTestCase::DoRun()
+{
+    std::string statsFile = CreateTempDirFilename("simulator-stats.json");
+    Ptr<StatsSimulatorImpl> impl = CreateObject<StatsSimulatorImpl>();
+    impl->SetAttribute("StatsFile", StringValue(statsFile));
+    Simulator::SetImplementation(impl);
+
+    // The last event is late enough for the time to need more than 6 significant digits
+    Simulator::Schedule(Seconds(1), []() {});
+    Simulator::Schedule(Seconds(2), []() {});
+    Simulator::Schedule(Seconds(1234567.5), []() {});
+    Simulator::Run();
+
+    std::ifstream is(statsFile);
+    std::stringstream stats;
+    stats << is.rdbuf();
+    NS_TEST_EXPECT_MSG_EQ(stats.str(),
+                          "{\"events\": 3, \"simulation_time\": 1234567.5}\n",
+                          "Unexpected statistics");
+
+    Simulator::Destroy();
+}
+
 /**
  * @ingroup simulator-tests
  *
@@ -674,6 +723,7 @@ class SimulatorTestSuite : public TestSuite
         AddTestCase(new SimulatorEventsTestCase(factory), TestCase::Duration::QUICK);
         factory.SetTypeId(PriorityQueueScheduler::GetTypeId());
         AddTestCase(new SimulatorEventsTestCase(factory), TestCase::Duration::QUICK);
+        AddTestCase(new SimulatorStatsTestCase, TestCase::Duration::QUICK);
     }
 };
 
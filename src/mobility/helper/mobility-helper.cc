@@ -7,7 +7,9 @@
  */
 #include "mobility-helper.h"
 
+#include "ns3/abort.h"
 #include "ns3/config.h"
+#include "ns3/constant-velocity-mobility-model.h"
 #include "ns3/hierarchical-mobility-model.h"
 #include "ns3/log.h"
 #include "ns3/mobility-model.h"
@@ -18,6 +20,7 @@
 #include "ns3/string.h"
 
 #include <iostream>
+#include <limits>
 
 namespace ns3
 {
@@ -238,4 +241,68 @@ MobilityHelper::GetDistanceSquaredBetween(Ptr<Node> n1, Ptr<Node> n2)
     return distSq;
 }
 
+void
+MobilityHelper::GetPositions(const NodeContainer& nodes, double* buffer)
+{
+    NS_LOG_FUNCTION(nodes.GetN() << buffer);
+    for (auto i = nodes.Begin(); i != nodes.End(); ++i, buffer += 3)
+    {
+        Ptr<MobilityModel> mobility = (*i)->GetObject<MobilityModel>();
+        if (!mobility)
+        {
+            buffer[0] = buffer[1] = buffer[2] = std::numeric_limits<double>::quiet_NaN();
+            continue;
+        }
+        Vector position = mobility->GetPosition();
+        buffer[0] = position.x;
+        buffer[1] = position.y;
+        buffer[2] = position.z;
+    }
+}
+
+void
+MobilityHelper::GetVelocities(const NodeContainer& nodes, double* buffer)
+{
+    NS_LOG_FUNCTION(nodes.GetN() << buffer);
+    for (auto i = nodes.Begin(); i != nodes.End(); ++i, buffer += 3)
+    {
+        Ptr<MobilityModel> mobility = (*i)->GetObject<MobilityModel>();
+        if (!mobility)
+        {
+            buffer[0] = buffer[1] = buffer[2] = std::numeric_limits<double>::quiet_NaN();
+            continue;
+        }
+        Vector velocity = mobility->GetVelocity();
+        buffer[0] = velocity.x;
+        buffer[1] = velocity.y;
+        buffer[2] = velocity.z;
+    }
+}
+
+void
+MobilityHelper::SetPositions(const NodeContainer& nodes, const double* buffer)
+{
+    NS_LOG_FUNCTION(nodes.GetN() << buffer);
+    for (auto i = nodes.Begin(); i != nodes.End(); ++i, buffer += 3)
+    {
+        Ptr<MobilityModel> mobility = (*i)->GetObject<MobilityModel>();
+        NS_ABORT_MSG_IF(!mobility, "Node " << (*i)->GetId() << " has no MobilityModel");
+        mobility->SetPosition(Vector(buffer[0], buffer[1], buffer[2]));
+    }
+}
+
+void
+MobilityHelper::SetVelocities(const NodeContainer& nodes, const double* buffer)
+{
+    NS_LOG_FUNCTION(nodes.GetN() << buffer);
+    for (auto i = nodes.Begin(); i != nodes.End(); ++i, buffer += 3)
+    {
+        Ptr<ConstantVelocityMobilityModel> mobility =
+            (*i)->GetObject<ConstantVelocityMobilityModel>();
+        NS_ABORT_MSG_IF(!mobility,
+                        "Node " << (*i)->GetId() << " has no ConstantVelocityMobilityModel");
+        mobility->SetVelocity(Vector(buffer[0], buffer[1], buffer[2]));
+    }
+}
+
 } // namespace ns3
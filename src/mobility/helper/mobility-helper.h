@@ -218,6 +218,50 @@ class MobilityHelper
      */
     static double GetDistanceSquaredBetween(Ptr<Node> n1, Ptr<Node> n2);
 
+    /**
+     * Copy the positions of a set of nodes into a contiguous buffer.
+     *
+     * The buffer is filled in row-major order with the x, y and z coordinates
+     * of each node, in the order of the container. Nodes that do not have a
+     * MobilityModel aggregated are filled with NaN.
+     *
+     * This is meant for bulk access (e.g. from the Python bindings, which pass
+     * the memory of a NumPy array), avoiding one call per node.
+     *
+     * @param nodes the nodes to read the positions from
+     * @param buffer a buffer of at least 3 * nodes.GetN() doubles
+     */
+    static void GetPositions(const NodeContainer& nodes, double* buffer);
+    /**
+     * Copy the velocities of a set of nodes into a contiguous buffer.
+     *
+     * The layout is the same as in GetPositions().
+     *
+     * @param nodes the nodes to read the velocities from
+     * @param buffer a buffer of at least 3 * nodes.GetN() doubles
+     */
+    static void GetVelocities(const NodeContainer& nodes, double* buffer);
+    /**
+     * Set the positions of a set of nodes from a contiguous buffer.
+     *
+     * The layout is the same as in GetPositions(). Every node must have
+     * a MobilityModel aggregated, e.g. ConstantPositionMobilityModel.
+     *
+     * @param nodes the nodes to set the positions of
+     * @param buffer a buffer of at least 3 * nodes.GetN() doubles
+     */
+    static void SetPositions(const NodeContainer& nodes, const double* buffer);
+    /**
+     * Set the velocities of a set of nodes from a contiguous buffer.
+     *
+     * The layout is the same as in GetPositions(). Every node must have
+     * a ConstantVelocityMobilityModel aggregated.
+     *
+     * @param nodes the nodes to set the velocities of
+     * @param buffer a buffer of at least 3 * nodes.GetN() doubles
+     */
+    static void SetVelocities(const NodeContainer& nodes, const double* buffer);
+
   private:
     /**
      * Output course change events from mobility model to output stream
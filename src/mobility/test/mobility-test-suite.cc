@@ -20,6 +20,9 @@
 #include "ns3/vector.h"
 #include "ns3/waypoint-mobility-model.h"
 
+#include <cmath>
+#include <vector>
+
 using namespace ns3;
 
 /**
@@ -461,6 +464,65 @@ WaypointMobilityModelViaHelper::DoRun()
     Simulator::Destroy();
 }
 
+/**
+ * @ingroup mobility-test
+ *
+ * @brief Test the bulk position and velocity accessors of MobilityHelper
+ */
+class MobilityHelperBulkAccess : public TestCase
+{
+  public:
+    MobilityHelperBulkAccess();
+
+  private:
+    void DoRun() override;
+};
+
+MobilityHelperBulkAccess::MobilityHelperBulkAccess()
+    : TestCase("Test bulk access to positions and velocities using MobilityHelper")
+{
+}
+
+void
+MobilityHelperBulkAccess::DoRun()
+{
+    NodeContainer c;
+    c.Create(3);
+    MobilityHelper mobility;
+    mobility.SetMobilityModel("ns3::ConstantVelocityMobilityModel");
+    mobility.Install(NodeContainer(c.Get(0), c.Get(1)));
+
+    // Set the positions and velocities of the nodes with a mobility model
+    NodeContainer mobileNodes(c.Get(0), c.Get(1));
+    std::vector<double> positions{1.0, 2.0, 3.0, 4.0, 5.0, 6.0};
+    std::vector<double> velocities{1.0, 0.0, 0.0, 0.0, -2.0, 0.5};
+    MobilityHelper::SetPositions(mobileNodes, positions.data());
+    MobilityHelper::SetVelocities(mobileNodes, velocities.data());
+
+    Vector position = c.Get(1)->GetObject<MobilityModel>()->GetPosition();
+    NS_TEST_EXPECT_MSG_EQ(position, Vector(4.0, 5.0, 6.0), "Position not set");
+
+    // The node without a mobility model is filled with NaN
+    std::vector<double> buffer(9);
+    MobilityHelper::GetPositions(c, buffer.data());
+    for (std::size_t i = 0; i < positions.size(); i++)
+    {
+        NS_TEST_EXPECT_MSG_EQ_TOL(buffer[i], positions[i], 0.001, "Position not equal");
+    }
+    for (std::size_t i = positions.size(); i < buffer.size(); i++)
+    {
+        NS_TEST_EXPECT_MSG_EQ(std::isnan(buffer[i]), true, "Node without mobility is not NaN");
+    }
+
+    MobilityHelper::GetVelocities(c, buffer.data());
+    for (std::size_t i = 0; i < velocities.size(); i++)
+    {
+        NS_TEST_EXPECT_MSG_EQ_TOL(buffer[i], velocities[i], 0.001, "Velocity not equal");
+    }
+
+    Simulator::Destroy();
+}
+
 /**
  * @ingroup mobility-test
  *
@@ -479,6 +541,7 @@ MobilityTestSuite::MobilityTestSuite()
     AddTestCase(new WaypointLazyNotifyTrue, TestCase::Duration::QUICK);
     AddTestCase(new WaypointInitialPositionIsWaypoint, TestCase::Duration::QUICK);
     AddTestCase(new WaypointMobilityModelViaHelper, TestCase::Duration::QUICK);
+    AddTestCase(new MobilityHelperBulkAccess, TestCase::Duration::QUICK);
 }
 
 /**
@@ -0,0 +1,155 @@
+/*
+ * SPDX-License-Identifier: GPL-2.0-only
+ */
+
+#include "ns3/double.h"
+#include "ns3/error-model.h"
+#include "ns3/node-container.h"
+#include "ns3/packet-trace-buffer.h"
+#include "ns3/packet.h"
+#include "ns3/pointer.h"
+#include "ns3/simple-net-device-helper.h"
+#include "ns3/simple-net-device.h"
+#include "ns3/simulator.h"
+#include "ns3/string.h"
+#include "ns3/test.h"
+#include "ns3/uinteger.h"
+
+#include <cmath>
+#include <vector>
+
+using namespace ns3;
+
+/**
+ * @ingroup network-test
+ * @ingroup tests
+ *
+ * PacketTraceBuffer unit tests: records are delivered in batches,
+ * when the buffer is full or after the flush interval, until the trace
+ * sources are disconnected.
+ */
+class PacketTraceBufferTestCase : public TestCase
+{
+  public:
+    PacketTraceBufferTestCase();
+
+  private:
+    void DoRun() override;
+    /**
+     * Flush callback
+     * @param nRecords the number of buffered records
+     */
+    void Flushed(std::size_t nRecords);
+
+    Ptr<PacketTraceBuffer> m_buffer;          //!< The buffer under test
+    std::vector<std::size_t> m_batchSizes;    //!< Size of each delivered batch
+    std::vector<Time> m_flushTimes;           //!< Time of each delivered batch
+    std::vector<PacketTraceRecord> m_records; //!< Every delivered record
+};
+
+PacketTraceBufferTestCase::PacketTraceBufferTestCase()
+    : TestCase("Check the batches delivered by PacketTraceBuffer")
+{
+}
+
+void
+PacketTraceBufferTestCase::Flushed(std::size_t nRecords)
+{
+    m_batchSizes.push_back(nRecords);
+    m_flushTimes.push_back(Simulator::Now());
+    std::vector<PacketTraceRecord> records(nRecords);
+    m_buffer->CopyRecords(records.data());
+    m_records.insert(m_records.end(), records.begin(), records.end());
+}
+
+void
+PacketTraceBufferTestCase::DoRun()
+{
+    NodeContainer nodes(2);
+    SimpleNetDeviceHelper helper;
+    NetDeviceContainer devices = helper.Install(nodes);
+
+    // Drop every packet received by the second node, to fire its PhyRxDrop trace
+    Ptr<RateErrorModel> errorModel = CreateObject<RateErrorModel>();
+    errorModel->SetAttribute("ErrorRate", DoubleValue(1.0));
+    errorModel->SetAttribute("ErrorUnit", StringValue("ERROR_UNIT_PACKET"));
+    devices.Get(1)->SetAttribute("ReceiveErrorModel", PointerValue(errorModel));
+
+    m_buffer = CreateObject<PacketTraceBuffer>();
+    m_buffer->SetAttribute("Capacity", UintegerValue(4));
+    m_buffer->SetAttribute("FlushInterval", TimeValue(Seconds(5)));
+    m_buffer->SetFlushCallback(MakeCallback(&PacketTraceBufferTestCase::Flushed, this));
+    std::string path = "/NodeList/*/DeviceList/*/$ns3::SimpleNetDevice/PhyRxDrop";
+    m_buffer->Connect(path);
+
+    // 6 packets at 1 s intervals, followed by a packet 10 s later
+    std::vector<Time>
+        times{Seconds(1), Seconds(2), Seconds(3), Seconds(4), Seconds(5), Seconds(6), Seconds(16)};
+    for (std::size_t i = 0; i < times.size(); i++)
+    {
+        Simulator::Schedule(times[i], [&devices, i]() {
+            devices.Get(0)->Send(Create<Packet>(100 + i), devices.Get(1)->GetAddress(), 0);
+        });
+    }
+    Simulator::Run();
+
+    // The buffer is full after 4 packets, and the other packets are delivered 5 s after the
+    // oldest buffered one, without waiting for another packet
+    NS_TEST_ASSERT_MSG_EQ(m_batchSizes.size(), 3, "Unexpected number of flushes");
+    NS_TEST_EXPECT_MSG_EQ(m_batchSizes[0], 4, "The first flush should happen on capacity");
+    NS_TEST_EXPECT_MSG_EQ(m_flushTimes[0], Seconds(4), "Wrong time of the first flush");
+    NS_TEST_EXPECT_MSG_EQ(m_batchSizes[1], 2, "The second flush should happen on time");
+    NS_TEST_EXPECT_MSG_EQ(m_flushTimes[1], Seconds(10), "Wrong time of the second flush");
+    NS_TEST_EXPECT_MSG_EQ(m_batchSizes[2], 1, "The third flush should happen on time");
+    NS_TEST_EXPECT_MSG_EQ(m_flushTimes[2], Seconds(21), "Wrong time of the third flush");
+    NS_TEST_EXPECT_MSG_EQ(m_buffer->GetNBufferedRecords(), 0, "The buffer should be empty");
+    NS_TEST_EXPECT_MSG_EQ(m_buffer->GetNRecords(), times.size(), "Unexpected number of records");
+
+    NS_TEST_ASSERT_MSG_EQ(m_records.size(), times.size(), "Unexpected number of records");
+    for (std::size_t i = 0; i < times.size(); i++)
+    {
+        NS_TEST_EXPECT_MSG_EQ(m_records[i].time, times[i].GetTimeStep(), "Wrong time");
+        NS_TEST_EXPECT_MSG_EQ(m_records[i].node, nodes.Get(1)->GetId(), "Wrong node");
+        NS_TEST_EXPECT_MSG_EQ(m_records[i].size, 100 + i, "Wrong packet size");
+        NS_TEST_EXPECT_MSG_EQ(std::isnan(m_records[i].values[0]), true, "Unexpected value");
+    }
+
+    // Records of trace sources with arithmetic arguments keep their values
+    m_buffer->Record("/NodeList/7/DeviceList/0", Create<Packet>(10), {1.5, -2, 3, 4});
+    m_buffer->Flush();
+    NS_TEST_EXPECT_MSG_EQ(m_records.back().node, 7, "Wrong node");
+    NS_TEST_EXPECT_MSG_EQ(m_records.back().values[1], -2, "Wrong value");
+
+    // Packets are no longer recorded once the trace sources are disconnected
+    m_buffer->Disconnect(path);
+    Simulator::Schedule(Seconds(1), [&devices]() {
+        devices.Get(0)->Send(Create<Packet>(100), devices.Get(1)->GetAddress(), 0);
+    });
+    Simulator::Run();
+    NS_TEST_EXPECT_MSG_EQ(m_buffer->GetNRecords(), times.size() + 1, "Unexpected record");
+
+    m_buffer->Dispose();
+    m_buffer = nullptr;
+    Simulator::Destroy();
+}
+
+/**
+ * @ingroup network-test
+ * @ingroup tests
+ *
+ * PacketTraceBuffer TestSuite
+ */
+class PacketTraceBufferTestSuite : public TestSuite
+{
+  public:
+    PacketTraceBufferTestSuite();
+};
+
+PacketTraceBufferTestSuite::PacketTraceBufferTestSuite()
+    : TestSuite("packet-trace-buffer", Type::UNIT)
+{
+    AddTestCase(new PacketTraceBufferTestCase, TestCase::Duration::QUICK);
+}
+
+static PacketTraceBufferTestSuite
+    g_packetTraceBufferTestSuite; //!< Static variable for test initialization
@@ -0,0 +1,184 @@
+/*
+ * SPDX-License-Identifier: GPL-2.0-only
+ */
+
+#include "packet-trace-buffer.h"
+
+#include "ns3/log.h"
+#include "ns3/simulator.h"
+#include "ns3/uinteger.h"
+
+#include <algorithm>
+#include <cstdlib>
+#include <cstring>
+
+namespace ns3
+{
+
+NS_LOG_COMPONENT_DEFINE("PacketTraceBuffer");
+
+NS_OBJECT_ENSURE_REGISTERED(PacketTraceBuffer);
+
+TypeId
+PacketTraceBuffer::GetTypeId()
+{
+    static TypeId tid =
+        TypeId("ns3::PacketTraceBuffer")
+            .SetParent<Object>()
+            .SetGroupName("Network")
+            .AddConstructor<PacketTraceBuffer>()
+            .AddAttribute("Capacity",
+                          "The number of buffered records that triggers a flush.",
+                          UintegerValue(4096),
+                          MakeUintegerAccessor(&PacketTraceBuffer::m_capacity),
+                          MakeUintegerChecker<uint32_t>(1))
+            .AddAttribute("FlushInterval",
+                          "The simulation time after the oldest buffered record that triggers "
+                          "a flush. Zero disables time-based flushes.",
+                          TimeValue(Time(0)),
+                          MakeTimeAccessor(&PacketTraceBuffer::m_flushInterval),
+                          MakeTimeChecker());
+    return tid;
+}
+
+PacketTraceBuffer::PacketTraceBuffer()
+    : m_capacity(4096),
+      m_flushInterval(0),
+      m_nRecords(0)
+{
+    NS_LOG_FUNCTION(this);
+}
+
+PacketTraceBuffer::~PacketTraceBuffer()
+{
+    NS_LOG_FUNCTION(this);
+}
+
+void
+PacketTraceBuffer::DoDispose()
+{
+    NS_LOG_FUNCTION(this);
+    Flush();
+    for (const auto& [path, sink] : m_sinks)
+    {
+        Config::Disconnect(path, sink);
+    }
+    m_sinks.clear();
+    m_flushCallback = MakeNullCallback<void, std::size_t>();
+    Object::DoDispose();
+}
+
+void
+PacketTraceBuffer::SetFlushCallback(FlushCallback callback)
+{
+    NS_LOG_FUNCTION(this);
+    m_flushCallback = callback;
+}
+
+void
+PacketTraceBuffer::Connect(std::string path)
+{
+    NS_LOG_FUNCTION(this << path);
+    ConnectWithValues<>(path);
+}
+
+void
+PacketTraceBuffer::Disconnect(std::string path)
+{
+    NS_LOG_FUNCTION(this << path);
+    auto it = m_sinks.begin();
+    while (it != m_sinks.end())
+    {
+        if (it->first == path)
+        {
+            Config::Disconnect(it->first, it->second);
+            it = m_sinks.erase(it);
+        }
+        else
+        {
+            ++it;
+        }
+    }
+}
+
+void
+PacketTraceBuffer::Record(const std::string& context,
+                          Ptr<const Packet> packet,
+                          const std::array<double, N_VALUES>& values)
+{
+    NS_LOG_FUNCTION(this << context << packet);
+
+    PacketTraceRecord record;
+    record.time = Simulator::Now().GetTimeStep();
+    record.node = std::numeric_limits<uint32_t>::max();
+    record.size = packet->GetSize();
+    record.uid = packet->GetUid();
+    std::copy(values.begin(), values.end(), record.values);
+
+    // Contexts of Config paths look like /NodeList/<id>/...
+    const std::string prefix = "/NodeList/";
+    if (context.compare(0, prefix.size(), prefix) == 0)
+    {
+        record.node = std::strtoul(context.c_str() + prefix.size(), nullptr, 10);
+    }
+
+    if (m_records.capacity() < m_capacity)
+    {
+        m_records.reserve(m_capacity);
+    }
+    m_records.push_back(record);
+    m_nRecords++;
+
+    if (m_records.size() >= m_capacity)
+    {
+        Flush();
+    }
+    else if (m_flushInterval.IsStrictlyPositive() && !m_flushEvent.IsPending())
+    {
+        // Deliver the records even if no other event is recorded
+        m_flushEvent = Simulator::Schedule(m_flushInterval, &PacketTraceBuffer::Flush, this);
+    }
+}
+
+void
+PacketTraceBuffer::Flush()
+{
+    NS_LOG_FUNCTION(this << m_records.size());
+    m_flushEvent.Cancel();
+    if (m_records.empty())
+    {
+        return;
+    }
+    if (!m_flushCallback.IsNull())
+    {
+        m_flushCallback(m_records.size());
+    }
+    m_records.clear();
+}
+
+std::size_t
+PacketTraceBuffer::GetNBufferedRecords() const
+{
+    return m_records.size();
+}
+
+uint64_t
+PacketTraceBuffer::GetNRecords() const
+{
+    return m_nRecords;
+}
+
+void
+PacketTraceBuffer::CopyRecords(void* destination) const
+{
+    NS_LOG_FUNCTION(this << destination);
+    std::memcpy(destination, m_records.data(), m_records.size() * sizeof(PacketTraceRecord));
+}
+
+const std::vector<PacketTraceRecord>&
+PacketTraceBuffer::GetRecords() const
+{
+    return m_records;
+}
+
+} // namespace ns3
@@ -0,0 +1,232 @@
+/*
+ * SPDX-License-Identifier: GPL-2.0-only
+ */
+
+#ifndef PACKET_TRACE_BUFFER_H
+#define PACKET_TRACE_BUFFER_H
+
+#include "ns3/callback.h"
+#include "ns3/config.h"
+#include "ns3/event-id.h"
+#include "ns3/nstime.h"
+#include "ns3/object.h"
+#include "ns3/packet.h"
+
+#include <array>
+#include <cstdint>
+#include <limits>
+#include <string>
+#include <type_traits>
+#include <utility>
+#include <vector>
+
+namespace ns3
+{
+
+/**
+ * @ingroup network
+ *
+ * A packet trace event recorded by PacketTraceBuffer.
+ *
+ * The layout is fixed (56 bytes, no padding), so that batches of records
+ * can be copied as-is into arrays of other languages (e.g. NumPy structured
+ * arrays in the Python bindings).
+ */
+struct PacketTraceRecord
+{
+    int64_t time;     //!< Simulation time of the event, in time steps (Time::GetTimeStep)
+    uint32_t node;    //!< Node id parsed from the trace context, or UINT32_MAX if absent
+    uint32_t size;    //!< Packet size, in bytes
+    uint64_t uid;     //!< Packet uid
+    double values[4]; //!< First arithmetic arguments of the trace source, or NaN
+};
+
+static_assert(sizeof(PacketTraceRecord) == 56, "PacketTraceRecord must not have padding");
+
+/**
+ * @ingroup network
+ *
+ * Records the packets reported by trace sources into a buffer, which is
+ * delivered in batches rather than once per event.
+ *
+ * Trace sources with a signature starting with Ptr<const Packet> are
+ * connected by their Config path. For each event, the simulation time,
+ * the node id (parsed from the "/NodeList/<id>/" trace context), the packet
+ * size and uid, plus the first (up to four) arithmetic arguments following
+ * the packet are recorded.
+ *
+ * When the buffer holds "Capacity" records, or "FlushInterval" after the
+ * oldest buffered record, the flush callback is invoked with the number of
+ * buffered records. The callback can read them with CopyRecords(). The buffer
+ * is then cleared. Flush() delivers the remaining records, e.g. at the end of
+ * the simulation.
+ *
+ * The trace sinks refer to the buffer, so the trace sources must be
+ * disconnected, with Disconnect() or by disposing of the buffer, before the
+ * buffer is destroyed.
+ */
+class PacketTraceBuffer : public Object
+{
+  public:
+    /**
+     * @brief Get the type ID.
+     * @return the object TypeId
+     */
+    static TypeId GetTypeId();
+    PacketTraceBuffer();
+    ~PacketTraceBuffer() override;
+
+    /// Number of arithmetic trace arguments recorded per event
+    static constexpr std::size_t N_VALUES = 4;
+
+    /**
+     * Callback invoked when the buffer is flushed, with the number of buffered records.
+     */
+    using FlushCallback = Callback<void, std::size_t>;
+
+    /**
+     * @param callback the callback invoked when the buffer is flushed
+     */
+    void SetFlushCallback(FlushCallback callback);
+
+    /**
+     * Connect to trace sources with signature void (Ptr<const Packet>).
+     *
+     * @param path the Config path of the trace sources
+     */
+    void Connect(std::string path);
+
+    /**
+     * Connect to trace sources with signature void (Ptr<const Packet>, Ts...),
+     * recording the first arithmetic arguments.
+     *
+     * @tparam Ts the types of the trace source arguments following the packet
+     * @param path the Config path of the trace sources
+     */
+    template <typename... Ts>
+    void ConnectWithValues(std::string path);
+
+    /**
+     * Disconnect the trace sources connected with Connect() or ConnectWithValues().
+     *
+     * @param path the Config path given to Connect() or ConnectWithValues()
+     */
+    void Disconnect(std::string path);
+
+    /**
+     * Record a packet event.
+     *
+     * @param context the trace context
+     * @param packet the packet
+     * @param values the arithmetic values to record along the packet
+     */
+    void Record(const std::string& context,
+                Ptr<const Packet> packet,
+                const std::array<double, N_VALUES>& values);
+
+    /**
+     * Deliver the buffered records to the flush callback and clear the buffer.
+     */
+    void Flush();
+
+    /**
+     * @return the number of buffered records
+     */
+    std::size_t GetNBufferedRecords() const;
+
+    /**
+     * @return the number of records since the creation of the buffer
+     */
+    uint64_t GetNRecords() const;
+
+    /**
+     * Copy the buffered records into contiguous memory.
+     *
+     * @param destination memory for at least GetNBufferedRecords() records
+     */
+    void CopyRecords(void* destination) const;
+
+    /**
+     * @return the buffered records
+     */
+    const std::vector<PacketTraceRecord>& GetRecords() const;
+
+  protected:
+    void DoDispose() override;
+
+  private:
+    /**
+     * Trace sink of the trace sources connected by ConnectWithValues().
+     *
+     * @tparam Ts the types of the trace source arguments following the packet
+     * @param context the trace context
+     * @param packet the packet
+     * @param args the trace source arguments following the packet
+     */
+    template <typename... Ts>
+    void TraceSink(std::string context, Ptr<const Packet> packet, Ts... args);
+
+    /**
+     * @tparam T the type of a trace source argument
+     * @param value the value of the argument
+     * @return the value as a double, or NaN if it is not arithmetic
+     */
+    template <typename T>
+    static double ToValue(const T& value);
+
+    std::vector<PacketTraceRecord> m_records; //!< Buffered records
+    uint32_t m_capacity;                      //!< Number of records that triggers a flush
+    Time m_flushInterval;                     //!< Delay of a flush after the oldest record
+    EventId m_flushEvent;                     //!< Flush scheduled after the oldest record
+    uint64_t m_nRecords;                      //!< Number of records since creation
+    FlushCallback m_flushCallback;            //!< Callback invoked on flushes
+
+    /// Config paths connected by ConnectWithValues() and their trace sinks
+    std::vector<std::pair<std::string, CallbackBase>> m_sinks;
+};
+
+/***************************************************************
+ *  Implementation of the templates declared above.
+ ***************************************************************/
+
+template <typename T>
+double
+PacketTraceBuffer::ToValue(const T& value)
+{
+    if constexpr (std::is_arithmetic_v<T>)
+    {
+        return static_cast<double>(value);
+    }
+    else if constexpr (std::is_enum_v<T>)
+    {
+        return static_cast<double>(static_cast<std::underlying_type_t<T>>(value));
+    }
+    else
+    {
+        return std::numeric_limits<double>::quiet_NaN();
+    }
+}
+
+template <typename... Ts>
+void
+PacketTraceBuffer::ConnectWithValues(std::string path)
+{
+    auto sink = MakeCallback(&PacketTraceBuffer::TraceSink<Ts...>, this);
+    Config::Connect(path, sink);
+    m_sinks.emplace_back(path, sink);
+}
+
+template <typename... Ts>
+void
+PacketTraceBuffer::TraceSink(std::string context, Ptr<const Packet> packet, Ts... args)
+{
+    std::array<double, N_VALUES> values;
+    values.fill(std::numeric_limits<double>::quiet_NaN());
+    std::size_t i = 0;
+    ((i < N_VALUES ? (void)(values[i++] = ToValue(args)) : (void)0), ...);
+    Record(context, packet, values);
+}
+
+} // namespace ns3
+
+#endif /* PACKET_TRACE_BUFFER_H */
@@ -5,20 +5,33 @@
 # SPDX-License-Identifier: GPL-2.0-only
 #
 import argparse
+import asyncio
+import collections
 import fnmatch
+import glob
+import hashlib
+import heapq
+import json
+import math
+import mmap
 import os
-import queue
 import re
+import shlex
 import shutil
 import signal
+import sqlite3
+import statistics
 import subprocess
 import sys
-import threading
 import time
 import xml.etree.ElementTree as ET
+import zlib
 
 from utils import get_list_from_file
 
+if sys.platform != "win32":
+    import resource
+
 # Global variable
 args = None
 
@@ -133,6 +146,9 @@ core_valgrind_skip_tests = [
 # This function adds any C++ examples or Python examples that are to be run
 # to the lists in example_tests and python_tests, respectively.
 #
+# The lists of examples are read from the test manifest, which has the
+# contents of the examples-to-run files.
+#
 def parse_examples_to_run_file(
     examples_to_run_path,
     cpp_executable_dir,
@@ -140,17 +156,12 @@ def parse_examples_to_run_file(
     example_tests,
     example_names_original,
     python_tests,
+    test_manifest,
 ):
-    # Look for the examples-to-run file exists.
-    if not os.path.exists(examples_to_run_path):
-        # Also tests for contribs OUTSIDE the ns-3-dev directory
-        possible_external_contrib_path = examples_to_run_path.replace(
-            "contrib", f"{os.path.dirname(os.path.dirname(__file__))}/ns-3-external-contrib"
-        )
-        if os.path.exists(possible_external_contrib_path):
-            examples_to_run_path = possible_external_contrib_path
-        else:
-            return
+    # Look for the lists of the examples-to-run file, if it exists.
+    examples_to_run = test_manifest["examples"].get(examples_to_run_path)
+    if examples_to_run is None:
+        return
 
     # Each tuple in the C++ list of examples to run contains
     #
@@ -168,7 +179,7 @@ def parse_examples_to_run_file(
     #
     #     ("tcp-nsc-lfn", "NSC_ENABLED == True", "NSC_ENABLED == False", "QUICK"),
     #
-    cpp_examples = get_list_from_file(examples_to_run_path, "cpp_examples")
+    cpp_examples = examples_to_run["cpp_examples"]
     for cpp_example in cpp_examples:
         # Old example specification did not include
         # 'fullness', so for compatibility,
@@ -241,7 +252,7 @@ def parse_examples_to_run_file(
     #
     #     ("brite-generic-example.py", "ENABLE_BRITE == True", "QUICK"),
     #
-    python_examples = get_list_from_file(examples_to_run_path, "python_examples")
+    python_examples = examples_to_run["python_examples"]
     # Old example specification did not include
     # 'fullness', so for compatibility,
     # allow 2 components, & set the 'fullness' to QUICK
@@ -288,6 +299,145 @@ def parse_examples_to_run_file(
             python_tests.append((example_path, do_run, fullness))
 
 
+#
+# This function returns the examples-to-run files of the example directories
+# and of the enabled modules, whether they exist or not.
+#
+def get_examples_to_run_paths():
+    paths = []
+    for directory in EXAMPLE_DIRECTORIES:
+        paths.append(os.path.join("examples", directory, "examples-to-run.py"))
+    for module in NS3_ENABLED_MODULES:
+        # Remove the "ns3-" from the module name.
+        module = module[len("ns3-") :]
+        paths.append(os.path.join("src", module, "test", "examples-to-run.py"))
+    for module in NS3_ENABLED_CONTRIBUTED_MODULES:
+        module = module[len("ns3-") :]
+        paths.append(os.path.join("contrib", module, "test", "examples-to-run.py"))
+    return paths
+
+
+#
+# This function returns the path of an examples-to-run file, or None if it
+# does not exist.
+#
+def find_examples_to_run_file(examples_to_run_path):
+    if os.path.exists(examples_to_run_path):
+        return examples_to_run_path
+    # Also tests for contribs OUTSIDE the ns-3-dev directory
+    possible_external_contrib_path = examples_to_run_path.replace(
+        "contrib", f"{os.path.dirname(os.path.dirname(__file__))}/ns-3-external-contrib"
+    )
+    if os.path.exists(possible_external_contrib_path):
+        return possible_external_contrib_path
+    return None
+
+
+def get_file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+#
+# This function writes a JSON file through a temporary file, so that
+# interrupted or concurrent runs never read or leave a truncated file.
+#
+def write_json_file(path, data):
+    tmp_file_name = "%s.%d" % (path, os.getpid())
+    with open(tmp_file_name, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_file_name, path)
+
+
+#
+# The test manifest lists the test suites of the test-runner, with their type,
+# the durations of their test cases and their library, and the lists of the
+# examples-to-run files.  It is written in the build directory after the
+# test-runner is built, so that test.py neither starts the test-runner nor
+# evaluates the examples-to-run files to find the tests.
+#
+# The manifest records the modification times of the files it was made from,
+# and it is made again if any of them changed since, e.g. after editing an
+# examples-to-run file or rebuilding a test library.
+#
+def load_test_manifest(test_runner_name):
+    manifest_path = os.path.join(NS3_BUILDDIR, TEST_MANIFEST_NAME)
+    test_runner_path = os.path.join(NS3_BUILDDIR, "utils", test_runner_name)
+    examples_to_run_paths = get_examples_to_run_paths()
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            test_manifest = json.load(f)
+        if (
+            test_manifest["test_runner"] == test_runner_path
+            and sorted(test_manifest["examples_to_run_files"]) == sorted(examples_to_run_paths)
+            and all(get_file_mtime(x) == y for x, y in test_manifest["files"].items())
+        ):
+            return test_manifest
+    except (FileNotFoundError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+    return make_test_manifest(manifest_path, test_runner_path, examples_to_run_paths)
+
+
+def make_test_manifest(manifest_path, test_runner_path, examples_to_run_paths):
+    test_manifest = {
+        "test_runner": test_runner_path,
+        "examples_to_run_files": examples_to_run_paths,
+        "files": {},
+        "suites": [],
+        "examples": {},
+    }
+    files = test_manifest["files"]
+
+    if ENABLE_TESTS:
+        files[test_runner_path] = get_file_mtime(test_runner_path)
+        # A failure is usually a sign that ns-3 crashed or exited uncleanly,
+        # which is reported where the suites are needed
+        try:
+            proc = subprocess.run(
+                [test_runner_path, "--print-test-manifest"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            suites = json.loads(proc.stdout)["suites"] if proc.returncode == 0 else None
+        except (OSError, ValueError, KeyError):
+            suites = None
+        if suites is None:
+            print("test.py warning:  test-runner failed to list the test suites", file=sys.stderr)
+        test_manifest["suites"] = suites
+        for suite in test_manifest["suites"] or []:
+            if suite["library"]:
+                files[suite["library"]] = get_file_mtime(suite["library"])
+
+    for examples_to_run_path in examples_to_run_paths:
+        files[examples_to_run_path] = get_file_mtime(examples_to_run_path)
+        path = find_examples_to_run_file(examples_to_run_path)
+        if path is None:
+            continue
+        files[path] = get_file_mtime(path)
+        test_manifest["examples"][examples_to_run_path] = {
+            "cpp_examples": get_list_from_file(path, "cpp_examples"),
+            "python_examples": get_list_from_file(path, "python_examples"),
+        }
+
+    if test_manifest["suites"] is not None:
+        write_json_file(manifest_path, test_manifest)
+    return test_manifest
+
+
+#
+# This function returns the names of the test suites of the manifest, of the
+# given --constrain type if any.  The "core" type has the suites of all types.
+#
+def get_test_suite_names(test_manifest, test_type=""):
+    return [
+        suite["name"]
+        for suite in test_manifest["suites"] or []
+        if test_type in ("", "core") or suite["type"] == test_type
+    ]
+
+
 #
 # The test suites are going to want to output status.  They are running
 # concurrently.  This means that unless we are careful, the output of
@@ -302,6 +452,40 @@ def parse_examples_to_run_file(
 #
 TMP_OUTPUT_DIR = "testpy-output"
 
+#
+# The durations of the test suites and examples in previous runs are kept
+# in the output directory, so that the longest jobs can be started first.
+#
+JOB_DURATIONS_FILE = os.path.join(TMP_OUTPUT_DIR, "job-durations.json")
+
+#
+# The keys of the test suites and examples that passed in previous runs are
+# kept in the output directory, so that jobs whose program, ns-3 libraries and
+# arguments did not change since can be reported without running them again.
+#
+RESULT_CACHE_FILE = os.path.join(TMP_OUTPUT_DIR, "result-cache.json")
+
+#
+# The test suites and the examples are listed in a manifest in the build
+# directory (see load_test_manifest).
+#
+TEST_MANIFEST_NAME = "test-manifest.json"
+
+#
+# The run times of the performance test suites and of the benchmark programs
+# are kept in a SQLite database by default, keyed by commit and build profile,
+# so that --perf runs can be compared with previous ones.  A slowdown is only
+# reported if it is significant at this level.
+#
+PERF_HISTORY_FILE = os.path.join(TMP_OUTPUT_DIR, "perf-history.sqlite")
+PERF_SIGNIFICANCE_LEVEL = 0.05
+
+#
+# The arguments of the utils/bench-* programs in --perf runs.  The programs
+# which are not listed run without arguments.
+#
+BENCHMARK_ARGUMENTS = {"bench-packets": "--n=10000"}
+
 
 def read_test(test):
     result = test.find("Result").text
@@ -430,7 +614,7 @@ def translate_to_html(results_file, html_file):
             #
             # Then go on to the next test suite.  Valgrind and skipped errors look the same.
             #
-            if result in ["CRASH", "SKIP", "VALGR"]:
+            if result in ["CRASH", "SKIP", "TIMEOUT", "VALGR"]:
                 f.write("<tr>\n")
                 if result == "SKIP":
                     f.write('<td style="color:#ff6600">%s</td>\n' % result)
@@ -630,21 +814,6 @@ def translate_to_html(results_file, html_file):
     print("done.")
 
 
-#
-# Python Control-C handling is broken in the presence of multiple threads.
-# Signals get delivered to the runnable/running thread by default and if
-# it is blocked, the signal is simply ignored.  So we hook sigint and set
-# a global variable telling the system to shut down gracefully.
-#
-thread_exit = False
-
-
-def sigint_hook(signal, frame):
-    global thread_exit
-    thread_exit = True
-    return 0
-
-
 #
 # In general, the build process itself naturally takes care of figuring out
 # which tests are built into the test runner.  For example, if ns3 configure
@@ -855,12 +1024,71 @@ VALGRIND_SUPPRESSIONS_FILE = ".ns3.supp"
 # VALGRIND_SUPPRESSIONS_FILE = None
 
 # When the TEST_LOGS environment variable is set to 1 or true,
-# NS_LOG is set to NS_LOG=*, and stdout/stderr
-# from tests are discarded to prevent running out of memory.
+# NS_LOG is set to NS_LOG=*.  The logs end up in the output files
+# of the jobs, like the rest of their output.
 TEST_LOGS = bool(os.getenv("TEST_LOGS", False))
 
+#
+# The standard output and error of the test suites and examples are written to
+# files, rather than kept in memory.  At most this many bytes of the end of
+# each file are read back to show the output of the failed jobs.
+#
+JOB_OUTPUT_TAIL_SIZE = 64 * 1024
+
 
-def run_job_synchronously(shell_command, directory, valgrind, is_python, build_path=""):
+def decode_stream_results(stream_results: bytes, stream_name: str, cmd: str) -> str:
+    try:
+        stream_results = stream_results.decode()
+    except UnicodeDecodeError:
+
+        def decode(byte_array: bytes):
+            try:
+                byte_array.decode()
+            except UnicodeDecodeError:
+                return byte_array
+
+        # Find lines where the decoding error happened
+        non_utf8_lines = list(map(lambda line: decode(line), stream_results.splitlines()))
+        non_utf8_lines = list(filter(lambda line: line is not None, non_utf8_lines))
+        print(f"Non-decodable characters found in {stream_name} output of {cmd}: {non_utf8_lines}")
+
+        # Continue decoding on errors
+        stream_results = stream_results.decode(errors="backslashreplace")
+    return stream_results
+
+
+#
+# This function returns the end of an output file of a job, without reading
+# more than JOB_OUTPUT_TAIL_SIZE bytes of it.
+#
+def read_job_output_tail(file_name, stream_name):
+    try:
+        with open(file_name, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - JOB_OUTPUT_TAIL_SIZE))
+            tail = f.read()
+    except OSError:
+        return ""
+    header = ""
+    if size > len(tail):
+        # Start at the beginning of a line
+        tail = tail[tail.find(b"\n") + 1 :]
+        header = "[... %d bytes omitted, see %s]\n" % (size - len(tail), file_name)
+    return header + decode_stream_results(tail, stream_name, file_name)
+
+
+#
+# This function returns the XML element with the sizes of the standard output
+# and error of a job, in bytes.
+#
+def get_job_output_xml(job):
+    return '  <Output stdout="%d" stderr="%d"/>\n' % (job.stdout_size, job.stderr_size)
+
+
+#
+# Get the command line running a job, possibly under valgrind.
+#
+def get_job_command(shell_command, valgrind, is_python, build_path=""):
     if VALGRIND_SUPPRESSIONS_FILE is not None:
         suppressions_path = os.path.join(NS3_BASEDIR, VALGRIND_SUPPRESSIONS_FILE)
 
@@ -886,6 +1114,12 @@ def run_job_synchronously(shell_command, directory, valgrind, is_python, build_p
     else:
         cmd = path_cmd
 
+    return cmd
+
+
+def run_job_synchronously(shell_command, directory, valgrind, is_python, build_path=""):
+    cmd = get_job_command(shell_command, valgrind, is_python, build_path)
+
     if args.verbose:
         print("Synchronously execute %s" % cmd)
 
@@ -905,30 +1139,8 @@ def run_job_synchronously(shell_command, directory, valgrind, is_python, build_p
 
     retval = proc.returncode
 
-    def decode_stream_results(stream_results: bytes, stream_name: str) -> str:
-        try:
-            stream_results = stream_results.decode()
-        except UnicodeDecodeError:
-
-            def decode(byte_array: bytes):
-                try:
-                    byte_array.decode()
-                except UnicodeDecodeError:
-                    return byte_array
-
-            # Find lines where the decoding error happened
-            non_utf8_lines = list(map(lambda line: decode(line), stream_results.splitlines()))
-            non_utf8_lines = list(filter(lambda line: line is not None, non_utf8_lines))
-            print(
-                f"Non-decodable characters found in {stream_name} output of {cmd}: {non_utf8_lines}"
-            )
-
-            # Continue decoding on errors
-            stream_results = stream_results.decode(errors="backslashreplace")
-        return stream_results
-
-    stdout_results = decode_stream_results(stdout_results, "stdout")
-    stderr_results = decode_stream_results(stderr_results, "stderr")
+    stdout_results = decode_stream_results(stdout_results, "stdout", cmd)
+    stderr_results = decode_stream_results(stderr_results, "stderr", cmd)
 
     if args.verbose:
         print("Return code = ", retval)
@@ -937,13 +1149,91 @@ def run_job_synchronously(shell_command, directory, valgrind, is_python, build_p
     return (retval, stdout_results, stderr_results, elapsed_time)
 
 
+#
+# Limit the resources of the processes started for the jobs.  This runs in
+# the child process, before the program of the job is executed.
+#
+def limit_job_resources():
+    if args.memory_limit:
+        limit = args.memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+#
+# Start a process for a job.  Except on Windows, the command is executed
+# without a shell, in a process group of its own, so that the process and all
+# of its children can be killed when the job times out or is interrupted.
+#
+async def start_job_process(command, directory, **kwargs):
+    if sys.platform == "win32":
+        if not isinstance(command, str):
+            command = subprocess.list2cmdline(command)
+        return await asyncio.create_subprocess_shell(command, cwd=directory, **kwargs)
+    if isinstance(command, str):
+        command = shlex.split(command)
+    return await asyncio.create_subprocess_exec(
+        *command,
+        cwd=directory,
+        start_new_session=True,
+        preexec_fn=limit_job_resources,
+        **kwargs,
+    )
+
+
+def kill_job_process(proc):
+    try:
+        if sys.platform == "win32":
+            proc.kill()
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+#
+# The asynchronous version of run_job_synchronously, which kills the job if
+# it runs for longer than timeout seconds.  The standard output and error of
+# the job are written to output_file_name with the ".stdout" and ".stderr"
+# suffixes.  The return value is the return code, the elapsed time and whether
+# the job timed out.
+#
+async def run_job_asynchronously(
+    shell_command, directory, valgrind, is_python, output_file_name, build_path="", timeout=None
+):
+    cmd = get_job_command(shell_command, valgrind, is_python, build_path)
+
+    if args.verbose:
+        print("Execute %s" % cmd)
+
+    start_time = time.time()
+    with open(output_file_name + ".stdout", "wb") as stdout, open(
+        output_file_name + ".stderr", "wb"
+    ) as stderr:
+        proc = await start_job_process(cmd, directory, stdout=stdout, stderr=stderr)
+    timed_out = False
+    try:
+        await asyncio.wait_for(proc.wait(), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+    finally:
+        # Also kill the processes left in the process group of the job
+        kill_job_process(proc)
+    retval = await proc.wait()
+
+    elapsed_time = time.time() - start_time
+
+    if args.verbose:
+        print("Return code = ", retval)
+
+    return (retval, elapsed_time, timed_out)
+
+
 #
 # This class defines a unit of testing work.  It will typically refer to
 # a test suite to run using the test-runner, or an example to run directly.
 #
 class Job:
     def __init__(self):
-        self.is_break = False
         self.is_skip = False
         self.skip_reason = ""
         self.is_example = False
@@ -956,18 +1246,17 @@ class Job:
         self.tmp_file_name = ""
         self.returncode = False
         self.elapsed_time = 0
+        self.expected_duration = 0
+        self.is_cached = False
+        self.cache_key = None
+        self.is_timeout = False
         self.build_path = ""
+        self.output_file_name = ""
+        self.stdout_size = 0
+        self.stderr_size = 0
 
     #
-    # A job is either a standard job or a special job indicating that a worker
-    # thread should exist.  This special job is indicated by setting is_break
-    # to true.
-    #
-    def set_is_break(self, is_break):
-        self.is_break = is_break
-
-    #
-    # If a job is to be skipped, we actually run it through the worker threads
+    # If a job is to be skipped, we actually run it through the job executor
     # to keep the PASS, FAIL, CRASH and SKIP processing all in one place.
     #
     def set_is_skip(self, is_skip):
@@ -1060,6 +1349,21 @@ class Job:
     def set_tmp_file_name(self, tmp_file_name):
         self.tmp_file_name = tmp_file_name
 
+    #
+    # The standard output and error of the job are written to files named
+    # after this one, with the ".stdout" and ".stderr" suffixes.  Only the
+    # output of the jobs which did not pass is kept after the run, unless the
+    # temporary files are retained.
+    #
+    def set_output_file_name(self, output_file_name):
+        self.output_file_name = output_file_name
+
+    def get_stdout_file_name(self):
+        return self.output_file_name + ".stdout"
+
+    def get_stderr_file_name(self):
+        return self.output_file_name + ".stderr"
+
     #
     # The return code received when the job process is executed.
     #
@@ -1072,138 +1376,952 @@ class Job:
     def set_elapsed_time(self, elapsed_time):
         self.elapsed_time = elapsed_time
 
+    #
+    # The real time the job is expected to take, based on previous runs.
+    #
+    def set_expected_duration(self, expected_duration):
+        self.expected_duration = expected_duration
+
+    #
+    # The key identifying the job across runs, e.g. "TestSuite some-test-suite"
+    # or "Example udp-echo".
+    #
+    def get_duration_key(self):
+        kind = "Example" if self.is_example or self.is_pyexample else "TestSuite"
+        return "%s %s" % (kind, self.display_name)
+
+    #
+    # If the job passed in a previous run with the same cache key, it is
+    # reported as passed without running.
+    #
+    def set_is_cached(self, is_cached):
+        self.is_cached = is_cached
+
+    #
+    # The hash of the program, ns-3 libraries and arguments of the job, or None
+    # if its result cannot be cached.
+    #
+    def set_cache_key(self, cache_key):
+        self.cache_key = cache_key
+
+    #
+    # If the job ran for longer than the --timeout, it was killed and is
+    # reported as timed out, whatever its return code.
+    #
+    def set_is_timeout(self, is_timeout):
+        self.is_timeout = is_timeout
+
+
+#
+# The line written by a test-runner in server mode on its standard output and
+# error once it has run a test suite (see --server in src/core/model/test.cc).
+# On the standard output, the line ends with the status of the test suite.
+#
+TEST_RUNNER_SERVER_DONE = b"ns3-test-runner-server-done"
+
+
+#
+# Copy the output of a test-runner server to the output file, until it ends
+# with a line matching marker.  Return that line, which is not copied, or None
+# if the output ended first.  The end of the output, which can be the start of
+# the marker line, is held back until more output comes.
+#
+async def read_test_runner_server_output(stream, marker, output):
+    held = bytearray()
+    while True:
+        data = await stream.read(65536)
+        if not data:
+            output.write(held)
+            return None
+        held += data
+        if held.endswith(b"\n"):
+            match = marker.search(held)
+            if match is not None and match.end() == len(held):
+                output.write(held[: match.start()])
+                return bytes(held[match.start() :])
+        output.write(held[:-64])
+        del held[:-64]
+
+
+async def discard_stream(stream):
+    while await stream.read(65536):
+        pass
+
 
 #
-# The worker thread class that handles the actual running of a given test.
-# Once spawned, it receives requests for work through its input_queue and
-# ships the results back through the output_queue.
+# A test-runner process in server mode, which runs the test suites named on
+# its standard input one after the other, each in a process forked from the
+# server.  This saves loading all of the ns-3 libraries and registering all of
+# the TypeIds again for each test suite.  A crashing test suite gets the same
+# return code as a test-runner of its own.  If the server itself exits, or is
+# killed since a test suite timed out, the test suite it was running gets the
+# return code of the server, and a new server is started for the next test
+# suite.
 #
-class worker_thread(threading.Thread):
-    def __init__(self, input_queue, output_queue):
-        threading.Thread.__init__(self)
-        self.input_queue = input_queue
-        self.output_queue = output_queue
+class TestRunnerServer:
+    def __init__(self, command, directory):
+        self.command = command
+        self.directory = directory
+        self.proc = None
 
-    def run(self):
-        while True:
-            job = self.input_queue.get()
+    async def start(self):
+        if args.verbose:
+            print("Start %s" % " ".join(self.command))
+        self.proc = await start_job_process(
+            self.command,
+            self.directory,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+    async def stop(self):
+        if self.proc is None:
+            return
+        proc, self.proc = self.proc, None
+        try:
+            proc.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        # Discard what the server writes while exiting (e.g. logs), which
+        # could otherwise block it on a full pipe
+        await asyncio.gather(proc.wait(), discard_stream(proc.stdout), discard_stream(proc.stderr))
+
+    #
+    # Run a test suite, writing its XML results into output_file.  Its output
+    # and the return value are the same as the ones of run_job_asynchronously.
+    #
+    async def run(self, test_name, output_file, output_file_name, timeout=None):
+        if self.proc is None or self.proc.returncode is not None:
+            await self.stop()
+            await self.start()
+
+        if args.verbose:
+            print("Send %s to test-runner server %d" % (test_name, self.proc.pid))
+
+        start_time = time.time()
+        try:
+            self.proc.stdin.write(("%s\t%s\n" % (test_name, output_file)).encode())
+            await self.proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # The process has just exited, which is handled below like a crash
+            pass
+
+        #
+        # Copy both streams to the output files until they end with the line
+        # marking the end of the test suite, or until the process exits.
+        #
+        done_line = None
+        timed_out = False
+        with open(output_file_name + ".stdout", "wb") as stdout, open(
+            output_file_name + ".stderr", "wb"
+        ) as stderr:
+            readers = [
+                read_test_runner_server_output(
+                    self.proc.stdout,
+                    re.compile(rb"\n%s (-?\d+)\n" % TEST_RUNNER_SERVER_DONE),
+                    stdout,
+                ),
+                read_test_runner_server_output(
+                    self.proc.stderr, re.compile(rb"\n%s\n" % TEST_RUNNER_SERVER_DONE), stderr
+                ),
+            ]
+            try:
+                done_line, _ = await asyncio.wait_for(asyncio.gather(*readers), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+            except asyncio.CancelledError:
+                kill_job_process(self.proc)
+                raise
+
+        if done_line is not None:
+            retval = int(done_line.split()[-1])
+        else:
+            # Kill the forked test suite along with the server
+            kill_job_process(self.proc)
+            retval = await self.proc.wait()
+            await self.stop()
+
+        elapsed_time = time.time() - start_time
+
+        if args.verbose:
+            print("Return code = ", retval)
+
+        return (retval, elapsed_time, timed_out)
+
+
+#
+# The executor running the jobs, as asyncio subprocesses, on a given number of
+# workers.  The run method yields the jobs once they are finished, in the order
+# they finish.  When given a test-runner server command, each worker runs its
+# test suites in a server of its own rather than in a process each.
+#
+# A SIGINT (i.e. Control-C) cancels the workers, which kill the processes of
+# their jobs.  The jobs which did not finish then are not yielded, and
+# interrupted is set.
+#
+class JobExecutor:
+    def __init__(self, workers, server_command=None):
+        self.workers = workers
+        self.server_command = server_command
+        self.pending_jobs = collections.deque()
+        self.finished_jobs = None
+        self.interrupted = False
+
+    def run(self, jobs):
+        self.pending_jobs.extend(jobs)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.finished_jobs = asyncio.Queue()
+        workers = loop.create_task(self.run_workers())
+        if sys.platform != "win32":
+            loop.add_signal_handler(signal.SIGINT, workers.cancel)
+        try:
+            while True:
+                finished_job = loop.create_task(self.finished_jobs.get())
+                while not finished_job.done():
+                    try:
+                        loop.run_until_complete(finished_job)
+                    except KeyboardInterrupt:
+                        # Windows has no signal handlers in asyncio
+                        workers.cancel()
+                job = finished_job.result()
+                if job is None:
+                    break
+                yield job
+            try:
+                loop.run_until_complete(workers)
+            except asyncio.CancelledError:
+                self.interrupted = True
+        finally:
+            if sys.platform != "win32":
+                loop.remove_signal_handler(signal.SIGINT)
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    async def run_workers(self):
+        servers = [None] * self.workers
+        if self.server_command is not None:
+            servers = [TestRunnerServer(self.server_command, os.getcwd()) for _ in servers]
+        try:
+            await asyncio.gather(*[self.worker(server) for server in servers])
+        finally:
+            self.finished_jobs.put_nowait(None)
+
+    async def worker(self, server):
+        try:
+            while self.pending_jobs:
+                job = self.pending_jobs.popleft()
+                await self.run_job(job, server)
+                self.finished_jobs.put_nowait(job)
+        finally:
+            if server is not None:
+                await server.stop()
+
+    async def run_job(self, job, server):
+        #
+        # If we are actually supposed to skip this job, do so.  Note that
+        # if is_skip is true, returncode is undefined.
+        #
+        if job.is_skip:
+            if args.verbose:
+                print("Skip %s" % job.shell_command)
+            return
+
+        #
+        # Jobs with a cached result are reported without running either.
+        #
+        if job.is_cached:
+            if args.verbose:
+                print("Cached %s" % job.shell_command)
+            return
+
+        if args.verbose:
+            print("Launch %s" % job.shell_command)
+
+        timeout = args.timeout or None
+        if job.is_example or job.is_pyexample:
             #
-            # Worker threads continue running until explicitly told to stop with
-            # a special job.
+            # If we have an example, the shell command is all we need to
+            # know.  It will be something like "examples/udp/udp-echo" or
+            # "examples/wireless/mixed-wireless.py"
             #
-            if job.is_break:
-                return
+            result = await run_job_asynchronously(
+                job.shell_command,
+                job.cwd,
+                args.valgrind,
+                job.is_pyexample,
+                job.output_file_name,
+                job.build_path,
+                timeout,
+            )
+        elif server is not None:
+            result = await server.run(
+                job.display_name, job.tmp_file_name, job.output_file_name, timeout
+            )
+        else:
             #
-            # If the global interrupt handler sets the thread_exit variable,
-            # we stop doing real work and just report back a "break" in the
-            # normal command processing has happened.
+            # If we're a test suite, we need to provide a little more info
+            # to the test runner, specifically the base directory and temp
+            # file name
             #
-            if thread_exit == True:
-                job.set_is_break(True)
-                self.output_queue.put(job)
-                continue
+            if args.update_data:
+                update_data = "--update-data"
+            else:
+                update_data = ""
+            result = await run_job_asynchronously(
+                job.shell_command
+                + " --xml --tempdir=%s --out=%s %s" % (job.tempdir, job.tmp_file_name, update_data),
+                job.cwd,
+                args.valgrind,
+                False,
+                job.output_file_name,
+                timeout=timeout,
+            )
+
+        (job.returncode, et, timed_out) = result
+        job.set_elapsed_time(et)
+        job.set_is_timeout(timed_out)
+        job.stdout_size = os.path.getsize(job.get_stdout_file_name())
+        job.stderr_size = os.path.getsize(job.get_stderr_file_name())
+
+        if args.verbose:
+            print("returncode = %d" % job.returncode)
+            print("---------- begin standard out ----------")
+            print(read_job_output_tail(job.get_stdout_file_name(), "stdout"))
+            print("---------- begin standard err ----------")
+            print(read_job_output_tail(job.get_stderr_file_name(), "stderr"))
+            print("---------- end standard err ----------")
+
+
+#
+# This function loads the list of previously successful or skipped examples and test suites.
+#
+def load_previously_successful_tests():
+    previously_run_tests_to_skip = {"test": [], "example": []}
+    previous_results = glob.glob(f"{TMP_OUTPUT_DIR}/*-results.xml")
+    if not previous_results:
+        print("No previous runs to rerun")
+        exit(-1)
+    latest_result_file = list(
+        sorted(previous_results, key=lambda x: os.path.basename(x), reverse=True)
+    )[0]
+
+    try:
+        previous_run_results = ET.parse(latest_result_file)
+    except ET.ParseError:
+        print(f"Failed to parse XML {latest_result_file}")
+        exit(-1)
+
+    for test_type in ["Test", "Example"]:
+        if previous_run_results.find(test_type):
+            temp = list(
+                map(
+                    lambda x: (x.find("Name").text, x.find("Result").text),
+                    previous_run_results.findall(test_type),
+                )
+            )
+            temp = list(filter(lambda x: x[1] in ["PASS", "SKIP"], temp))
+            temp = [x[0] for x in temp]
+            previously_run_tests_to_skip[test_type.lower()] = temp
+    return previously_run_tests_to_skip
+
+
+#
+# Durations depend heavily on the fullness of the tests and on running them
+# under valgrind, so they are kept separately for each of these modes.
+#
+def get_job_durations_mode():
+    return args.fullness + ("-valgrind" if args.valgrind else "")
+
+
+#
+# This function loads the durations of the jobs in previous runs, in seconds.
+#
+def load_job_durations(durations_file=JOB_DURATIONS_FILE):
+    try:
+        with open(durations_file, encoding="utf-8") as f:
+            job_durations = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if not isinstance(job_durations, dict):
+        return {}
+    return job_durations.get(get_job_durations_mode(), {})
+
+
+#
+# This function saves the durations of the jobs that ran.  They are averaged
+# with the durations of previous runs, to smooth out noisy measurements.  The
+# jobs which failed or crashed may have stopped early, so their durations are
+# not recorded.
+#
+def save_job_durations(finished_jobs, durations_file=JOB_DURATIONS_FILE):
+    try:
+        with open(durations_file, encoding="utf-8") as f:
+            job_durations = json.load(f)
+        if not isinstance(job_durations, dict):
+            job_durations = {}
+    except (FileNotFoundError, ValueError):
+        job_durations = {}
+
+    mode_durations = job_durations.setdefault(get_job_durations_mode(), {})
+    for job in finished_jobs:
+        key = job.get_duration_key()
+        if job.is_timeout:
+            # The job was killed, so it would have taken longer
+            mode_durations[key] = max(mode_durations.get(key, 0), job.elapsed_time)
+        elif job.returncode != 0:
+            continue
+        elif key in mode_durations:
+            mode_durations[key] = (mode_durations[key] + job.elapsed_time) / 2
+        else:
+            mode_durations[key] = job.elapsed_time
+
+    write_json_file(durations_file, job_durations)
+
+
+#
+# This function sorts the jobs with the longest expected duration first, so
+# that long test suites do not start last and leave the other workers idle
+# (longest processing time first scheduling).  Jobs that never ran are
+# expected to take the median duration of the known jobs, and skipped or
+# cached jobs take no time.
+#
+def sort_jobs_by_expected_duration(jobs, job_durations):
+    known_durations = [
+        job_durations[job.get_duration_key()]
+        for job in jobs
+        if job.get_duration_key() in job_durations
+    ]
+    default_duration = statistics.median(known_durations) if known_durations else 0
+    for job in jobs:
+        if job.is_skip or job.is_cached:
+            job.set_expected_duration(0)
+        else:
+            job.set_expected_duration(job_durations.get(job.get_duration_key(), default_duration))
+    # The sort is stable, so jobs without history keep the discovery order
+    jobs.sort(key=lambda job: job.expected_duration, reverse=True)
+    return len(known_durations)
+
+
+#
+# This function predicts the time taken to run the jobs, in the order they
+# are dispatched, by workers that take the next job as soon as they are idle.
+#
+def predict_makespan(jobs, workers):
+    worker_finish_times = [0.0] * workers
+    for job in jobs:
+        heapq.heapreplace(worker_finish_times, worker_finish_times[0] + job.expected_duration)
+    return max(worker_finish_times)
+
+
+#
+# This function parses the K/N value of --shard, where shards are numbered
+# from 1 to N.
+#
+def parse_shard(value):
+    match = re.fullmatch(r"(\d+)/(\d+)", value)
+    if match is None or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError("expected K/N, with 1 <= K <= N")
+    return (int(match.group(1)), int(match.group(2)))
+
+
+#
+# This function selects the jobs of shard K of N, when a run is split over
+# several hosts.  Every host must compute the same partition, so it only
+# depends on the list of jobs and on the durations of a file shared by all
+# the hosts (--job-durations): the longest jobs are assigned first, each one
+# to the shard with the least work so far.  Jobs that never ran are expected
+# to take the median duration of the known jobs.  Without a shared file, the
+# durations recorded by each host may differ, so the jobs are assigned by a
+# stable hash of their names instead.
+#
+def select_shard_jobs(jobs, shard, shards, job_durations=None):
+    if job_durations is None:
+        return [
+            job for job in jobs if zlib.crc32(job.get_duration_key().encode()) % shards == shard - 1
+        ]
+
+    known_durations = [
+        job_durations[job.get_duration_key()]
+        for job in jobs
+        if job.get_duration_key() in job_durations
+    ]
+    default_duration = statistics.median(known_durations) if known_durations else 1
+    # Skipped jobs are not special, since the skips can depend on the host
+    # (e.g. with --rerun-failed)
+    durations = [job_durations.get(job.get_duration_key(), default_duration) for job in jobs]
+    ordered_jobs = sorted(
+        range(len(jobs)), key=lambda i: (-durations[i], jobs[i].get_duration_key(), i)
+    )
+    shard_loads = [(0.0, k) for k in range(1, shards + 1)]
+    selected_jobs = set()
+    for i in ordered_jobs:
+        load, k = heapq.heappop(shard_loads)
+        if k == shard:
+            selected_jobs.add(i)
+        heapq.heappush(shard_loads, (load + durations[i], k))
+    # Keep the discovery order of the selected jobs
+    return [job for i, job in enumerate(jobs) if i in selected_jobs]
+
+
+#
+# Results depend on the same modes as durations, and on logging being enabled.
+#
+def get_result_cache_mode():
+    return get_job_durations_mode() + ("-logs" if TEST_LOGS else "")
+
+
+#
+# The result cache maps each job (of each mode) to the key of its last run, if
+# it passed.  It also keeps the digests of the files hashed into the keys,
+# along with their sizes and modification times, so that only files which
+# changed since the previous run are read again.
+#
+def load_result_cache():
+    try:
+        with open(RESULT_CACHE_FILE, encoding="utf-8") as f:
+            result_cache = json.load(f)
+        if not isinstance(result_cache, dict):
+            result_cache = {}
+    except (FileNotFoundError, ValueError):
+        result_cache = {}
+    result_cache.setdefault("files", {})
+    result_cache.setdefault("results", {})
+    return result_cache
+
+
+def save_result_cache(result_cache, finished_jobs):
+    results = result_cache["results"]
+    for job in finished_jobs:
+        if job.cache_key is None:
+            continue
+        name = "%s %s" % (get_result_cache_mode(), job.get_duration_key())
+        if job.returncode == 0:
+            results[name] = job.cache_key
+        else:
+            results.pop(name, None)
+
+    write_json_file(RESULT_CACHE_FILE, result_cache)
+
+
+#
+# This function returns the digest of a file and the names of the ns-3
+# libraries found in it, i.e. the libraries it links to.  Names of linked
+# libraries are null-terminated strings in executables and libraries of all
+# platforms, which saves parsing each format.
+#
+def get_file_info(path, file_infos):
+    stat = os.stat(path)
+    info = file_infos.get(path)
+    if info is not None and info["size"] == stat.st_size and info["mtime"] == stat.st_mtime_ns:
+        return info
+
+    # Empty files cannot be mapped
+    digest = hashlib.sha256().hexdigest()
+    libraries = []
+    if stat.st_size:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+                digest = hashlib.sha256(contents).hexdigest()
+                libraries = re.findall(rb"(libns3[\w.+-]*?\.(?:so|dylib|dll))\x00", contents)
+    info = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "digest": digest,
+        "libraries": sorted(set(x.decode() for x in libraries)),
+    }
+    file_infos[path] = info
+    return info
+
+
+def get_test_suites_by_name(test_manifest):
+    return {suite["name"]: suite for suite in test_manifest["suites"] or []}
+
+
+#
+# This function returns the files of a directory, and of its subdirectories
+# if recursive is set.
+#
+def get_directory_files(directory, recursive=False):
+    pattern = os.path.join(directory, "**" if recursive else "*")
+    return list(filter(os.path.isfile, sorted(glob.glob(pattern, recursive=recursive))))
+
+
+#
+# This function computes the cache key of a job: the hash of its kind, name,
+# arguments and mode, of the NS_* environment variables, and of the contents of
+# its program and of the ns-3 libraries the program links to, directly or not.
+# Python examples can load any ns-3 library through the bindings, so all of
+# them are hashed.  The key also covers the input files of the job: the files
+# in the data directories of a test suite, and the files next to the sources
+# of an example, which it may read or, for Python, import.  There is no key
+# for the suites missing from the test manifest, nor for the examples whose
+# sources are not found.
+#
+def get_job_cache_key(job, file_infos, test_suites):
+    library_dir = os.path.join(NS3_BUILDDIR, "lib")
+    digests = {}
+    # The input files are hashed, but not searched for libraries
+    input_files = []
+    if job.is_pyexample:
+        program = os.path.join(NS3_BASEDIR, job.shell_command.split(" ", 1)[0])
+        input_files = get_directory_files(os.path.dirname(program))
+        pending_files = [
+            program,
+            os.path.join(NS3_BUILDDIR, "bindings", "python", "ns", "__init__.py"),
+        ]
+        pending_files += glob.glob(os.path.join(library_dir, "libns3*"))
+    else:
+        command = os.path.join(job.build_path or NS3_BUILDDIR, job.shell_command)
+        pending_files = [command.split(" ", 1)[0]]
+        if job.is_example:
+            # The build directory of an example mirrors the directory of its sources
+            source_dir = os.path.relpath(os.path.dirname(pending_files[0]), NS3_BUILDDIR)
+            if source_dir.startswith(os.pardir):
+                return None
+            source_dir = os.path.join(NS3_BASEDIR, source_dir)
+            if not os.path.isdir(source_dir):
+                return None
+            input_files = get_directory_files(source_dir)
+        else:
+            suite = test_suites.get(job.display_name)
+            if suite is None or "data_dirs" not in suite:
+                return None
+            for data_dir in suite["data_dirs"]:
+                input_files += get_directory_files(
+                    os.path.join(NS3_BASEDIR, data_dir), recursive=True
+                )
+            if suite["library"]:
+                # The test-runner links every test library, but a suite only
+                # depends on the library defining it and on the libraries it uses
+                input_files.append(pending_files[0])
+                pending_files = [suite["library"]]
+    try:
+        for path in input_files:
+            digests[path] = get_file_info(path, file_infos)["digest"]
+    except (OSError, ValueError):
+        return None
+
+    while pending_files:
+        path = pending_files.pop()
+        if path in digests:
+            continue
+        try:
+            info = get_file_info(path, file_infos)
+        except (OSError, ValueError):
+            # Without its program, the job cannot run anyway
+            return None
+        digests[path] = info["digest"]
+        for library in info["libraries"]:
+            library_path = os.path.join(library_dir, library)
+            if library_path not in digests and os.path.exists(library_path):
+                pending_files.append(library_path)
+
+    key = hashlib.sha256()
+    key.update(
+        (
+            "%s\n%s\n%s\n" % (job.get_duration_key(), job.shell_command, get_result_cache_mode())
+        ).encode()
+    )
+    # The NS_* variables change the attributes, logs and command lines of the jobs
+    for name in sorted(x for x in os.environ if x.startswith("NS_")):
+        key.update(("%s=%s\n" % (name, os.environ[name])).encode())
+    for path in sorted(digests, key=os.path.basename):
+        key.update(("%s %s\n" % (os.path.basename(path), digests[path])).encode())
+    return key.hexdigest()
+
+
+#
+# The commit of the source tree, for the performance history, with a -dirty
+# suffix if tracked files were modified since.
+#
+def get_git_commit():
+    try:
+        head = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=NS3_BASEDIR, capture_output=True, text=True
+        )
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=NS3_BASEDIR,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return "unknown"
+    if head.returncode != 0:
+        return "unknown"
+    return head.stdout.strip() + ("-dirty" if status.stdout.strip() else "")
 
-            #
-            # If we are actually supposed to skip this job, do so.  Note that
-            # if is_skip is true, returncode is undefined.
-            #
-            if job.is_skip:
-                if args.verbose:
-                    print("Skip %s" % job.shell_command)
-                self.output_queue.put(job)
-                continue
 
-            #
-            # Otherwise go about the business of running tests as normal.
-            #
-            else:
-                if args.verbose:
-                    print("Launch %s" % job.shell_command)
+#
+# The commit of a git revision (e.g. a tag or a branch), or the revision
+# itself if git does not know it, since it may be a prefix of a commit of the
+# performance history.
+#
+def resolve_git_revision(revision):
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--verify", "--quiet", revision + "^{commit}"],
+            cwd=NS3_BASEDIR,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return revision
+    return proc.stdout.strip() if proc.returncode == 0 else revision
 
-                if job.is_example or job.is_pyexample:
-                    #
-                    # If we have an example, the shell command is all we need to
-                    # know.  It will be something like "examples/udp/udp-echo" or
-                    # "examples/wireless/mixed-wireless.py"
-                    #
-                    (
-                        job.returncode,
-                        job.standard_out,
-                        job.standard_err,
-                        et,
-                    ) = run_job_synchronously(
-                        job.shell_command, job.cwd, args.valgrind, job.is_pyexample, job.build_path
-                    )
-                else:
-                    #
-                    # If we're a test suite, we need to provide a little more info
-                    # to the test runner, specifically the base directory and temp
-                    # file name
-                    #
-                    if args.update_data:
-                        update_data = "--update-data"
-                    else:
-                        update_data = ""
-                    (
-                        job.returncode,
-                        job.standard_out,
-                        job.standard_err,
-                        et,
-                    ) = run_job_synchronously(
-                        job.shell_command
-                        + " --xml --tempdir=%s --out=%s %s"
-                        % (job.tempdir, job.tmp_file_name, update_data),
-                        job.cwd,
-                        args.valgrind,
-                        False,
-                    )
 
-                job.set_elapsed_time(et)
+#
+# The regularized incomplete beta function I_x(a, b), evaluated with its
+# continued fraction by the modified Lentz's method.
+#
+def incomplete_beta(x, a, b):
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    # The continued fraction converges quickly on this side only
+    if x > (a + 1) / (a + b + 2):
+        return 1 - incomplete_beta(1 - x, b, a)
+    front = math.exp(
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    )
+    tiny = 1e-300
+    f = c = 1.0
+    d = 0.0
+    for i in range(1000):
+        m = i // 2
+        if i == 0:
+            numerator = 1.0
+        elif i % 2 == 0:
+            numerator = (m * (b - m) * x) / ((a + 2 * m - 1) * (a + 2 * m))
+        else:
+            numerator = -((a + m) * (a + b + m) * x) / ((a + 2 * m) * (a + 2 * m + 1))
+        d = 1 + numerator * d
+        d = 1 / (d if abs(d) > tiny else tiny)
+        c = 1 + numerator / c
+        c = c if abs(c) > tiny else tiny
+        f *= c * d
+        if abs(1 - c * d) < 1e-12:
+            break
+    return front * (f - 1) / a
 
-                if args.verbose:
-                    print("returncode = %d" % job.returncode)
-                    print("---------- begin standard out ----------")
-                    print(job.standard_out)
-                    print("---------- begin standard err ----------")
-                    print(job.standard_err)
-                    print("---------- end standard err ----------")
 
-                self.output_queue.put(job)
+#
+# Welch's t-test of the hypothesis that the mean of samples is greater than
+# the mean of baseline_samples.  It returns the one-sided p-value, or None if
+# there are not enough samples.
+#
+def welch_t_test(samples, baseline_samples):
+    n1, n2 = len(samples), len(baseline_samples)
+    if n1 < 2 or n2 < 2:
+        return None
+    m1, m2 = statistics.mean(samples), statistics.mean(baseline_samples)
+    s1, s2 = statistics.variance(samples) / n1, statistics.variance(baseline_samples) / n2
+    if s1 + s2 == 0:
+        return 0.0 if m1 > m2 else 1.0
+    t = (m1 - m2) / math.sqrt(s1 + s2)
+    df = (s1 + s2) ** 2 / (s1**2 / (n1 - 1) + s2**2 / (n2 - 1))
+    # Probability that a Student's t variable with df degrees of freedom exceeds |t|
+    tail = 0.5 * incomplete_beta(df / (df + t * t), df / 2, 0.5)
+    return tail if t > 0 else 1 - tail
+
+
+def open_perf_history(path):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    db = sqlite3.connect(path)
+    db.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY, time TEXT, git_commit TEXT, build_profile TEXT);
+        CREATE TABLE IF NOT EXISTS samples (
+            run_id INTEGER REFERENCES runs (id), benchmark TEXT, seconds REAL);
+        CREATE INDEX IF NOT EXISTS samples_by_benchmark ON samples (benchmark, run_id);
+        """
+    )
+    return db
 
 
 #
-# This function loads the list of previously successful or skipped examples and test suites.
+# The samples of the latest run before run_id of a benchmark with the same
+# build profile, optionally restricted to the commits starting with
+# baseline_commit.  It returns the commit and the samples of that run, or
+# None if there is no such run.
 #
-def load_previously_successful_tests():
-    import glob
+def load_perf_baseline(db, benchmark, run_id, baseline_commit):
+    baseline = db.execute(
+        "SELECT runs.id, runs.git_commit FROM runs JOIN samples ON samples.run_id = runs.id"
+        " WHERE samples.benchmark = ? AND runs.id < ? AND runs.build_profile = ?"
+        " AND runs.git_commit LIKE ? ORDER BY runs.id DESC LIMIT 1",
+        (benchmark, run_id, BUILD_PROFILE, baseline_commit + "%"),
+    ).fetchone()
+    if baseline is None:
+        return None
+    samples = db.execute(
+        "SELECT seconds FROM samples WHERE run_id = ? AND benchmark = ?", (baseline[0], benchmark)
+    ).fetchall()
+    return (baseline[1], [sample[0] for sample in samples])
 
-    previously_run_tests_to_skip = {"test": [], "example": []}
-    previous_results = glob.glob(f"{TMP_OUTPUT_DIR}/*-results.xml")
-    if not previous_results:
-        print("No previous runs to rerun")
-        exit(-1)
-    latest_result_file = list(
-        sorted(previous_results, key=lambda x: os.path.basename(x), reverse=True)
-    )[0]
 
-    try:
-        previous_run_results = ET.parse(latest_result_file)
-    except ET.ParseError:
-        print(f"Failed to parse XML {latest_result_file}")
-        exit(-1)
+#
+# Print the mean run time of each benchmark in the latest runs with the same
+# build profile, oldest first.
+#
+def print_perf_trend_report(db, benchmarks, max_runs=10):
+    print()
+    print("Trend of the mean run times (last %d runs, %s profile):" % (max_runs, BUILD_PROFILE))
+    for benchmark in benchmarks:
+        runs = db.execute(
+            "SELECT runs.time, runs.git_commit, group_concat(samples.seconds) FROM runs"
+            " JOIN samples ON samples.run_id = runs.id"
+            " WHERE samples.benchmark = ? AND runs.build_profile = ?"
+            " GROUP BY runs.id ORDER BY runs.id DESC LIMIT ?",
+            (benchmark, BUILD_PROFILE, max_runs),
+        ).fetchall()
+        print("  %s" % benchmark)
+        for run_time, git_commit, samples in reversed(runs):
+            samples = [float(sample) for sample in samples.split(",")]
+            print(
+                "    %s  %-18s  %.4f s +/- %.4f (%d runs)"
+                % (
+                    run_time,
+                    git_commit[:12] + ("-dirty" if git_commit.endswith("-dirty") else ""),
+                    statistics.mean(samples),
+                    statistics.stdev(samples) if len(samples) > 1 else 0,
+                    len(samples),
+                )
+            )
 
-    for test_type in ["Test", "Example"]:
-        if previous_run_results.find(test_type):
-            temp = list(
-                map(
-                    lambda x: (x.find("Name").text, x.find("Result").text),
-                    previous_run_results.findall(test_type),
+
+#
+# This function runs the performance test suites and the utils/bench-*
+# programs --perf-runs times each, one at a time to avoid disturbing the
+# measurements, and stores their run times in the performance history.  Each
+# benchmark is compared with its baseline, i.e. the previous run of the same
+# build profile (of the --perf-baseline commit, if given).  It is a regression
+# if it got slower by more than --perf-threshold percent, and Welch's t-test
+# says that it is significant.
+#
+def run_performance_tests(test_runner_name, test_manifest):
+    fullness = args.fullness.upper() if len(args.fullness) else "QUICK"
+    benchmarks = []
+    if ENABLE_TESTS:
+        for suite in get_test_suite_names(test_manifest, "performance"):
+            benchmarks.append(
+                (
+                    suite,
+                    "utils/%s --test-name=%s --fullness=%s" % (test_runner_name, suite, fullness),
                 )
             )
-            temp = list(filter(lambda x: x[1] in ["PASS", "SKIP"], temp))
-            temp = [x[0] for x in temp]
-            previously_run_tests_to_skip[test_type.lower()] = temp
-    return previously_run_tests_to_skip
+    bench_prefix = "%s%s-" % (APPNAME, VERSION)
+    bench_pattern = "%sbench-*%s%s" % (
+        bench_prefix,
+        BUILD_PROFILE_SUFFIX,
+        ".exe" if sys.platform == "win32" else "",
+    )
+    for program in sorted(glob.glob(os.path.join(NS3_BUILDDIR, "utils", bench_pattern))):
+        program = os.path.basename(program)
+        name = os.path.splitext(program)[0][len(bench_prefix) :]
+        if BUILD_PROFILE_SUFFIX:
+            name = name[: -len(BUILD_PROFILE_SUFFIX)]
+        benchmarks.append(
+            (name, ("utils/%s %s" % (program, BENCHMARK_ARGUMENTS.get(name, ""))).strip())
+        )
+    if len(args.suite):
+        benchmarks = [
+            benchmark for benchmark in benchmarks if fnmatch.fnmatch(benchmark[0], args.suite)
+        ]
+    if not benchmarks:
+        print("No performance test suites or benchmark programs to run", file=sys.stderr)
+        return 2
+
+    db = open_perf_history(args.perf_history)
+    git_commit = get_git_commit()
+    baseline_commit = resolve_git_revision(args.perf_baseline) if args.perf_baseline else ""
+    run_id = db.execute(
+        "INSERT INTO runs (time, git_commit, build_profile) VALUES (?, ?, ?)",
+        (time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()), git_commit, BUILD_PROFILE),
+    ).lastrowid
+
+    failed_benchmarks = []
+    for i, (name, shell_command) in enumerate(benchmarks):
+        samples = []
+        for run in range(args.perf_runs):
+            (rc, standard_out, standard_err, et) = run_job_synchronously(
+                shell_command, os.getcwd(), False, False
+            )
+            if rc != 0:
+                break
+            samples.append(et)
+
+        if len(samples) < args.perf_runs:
+            failed_benchmarks.append(name)
+            print(
+                "[%d/%d] %s: Benchmark %s (returned %d)"
+                % (i + 1, len(benchmarks), colors.RED + "FAIL" + colors.NORMAL, name, rc)
+            )
+            if args.verbose_failed:
+                print(standard_out)
+                print(standard_err)
+            continue
+
+        db.executemany(
+            "INSERT INTO samples (run_id, benchmark, seconds) VALUES (?, ?, ?)",
+            [(run_id, name, sample) for sample in samples],
+        )
+        mean = statistics.mean(samples)
+        result = "%.4f s +/- %.4f" % (mean, statistics.stdev(samples) if len(samples) > 1 else 0)
+
+        status = colors.GREEN + "PASS" + colors.NORMAL
+        baseline = load_perf_baseline(db, name, run_id, baseline_commit)
+        if baseline is None:
+            result += " (no baseline)"
+        else:
+            found_commit, baseline_samples = baseline
+            change = (mean / statistics.mean(baseline_samples) - 1) * 100
+            p_value = welch_t_test(samples, baseline_samples)
+            result += " (%+.1f%% from %.4f s at %s" % (
+                change,
+                statistics.mean(baseline_samples),
+                found_commit[:12],
+            )
+            result += ", p=%.3f)" % p_value if p_value is not None else ")"
+            if (
+                change > args.perf_threshold
+                and p_value is not None
+                and p_value < PERF_SIGNIFICANCE_LEVEL
+            ):
+                failed_benchmarks.append(name)
+                status = colors.RED + "REGRESSION" + colors.NORMAL
+
+        print("[%d/%d] %s: Benchmark %s %s" % (i + 1, len(benchmarks), status, name, result))
+
+    db.commit()
+    print_perf_trend_report(db, [name for name, shell_command in benchmarks])
+    db.close()
+
+    print()
+    print(
+        "%d of %d benchmarks passed (%d regressions or failures, threshold %.1f%%, %d runs each)"
+        % (
+            len(benchmarks) - len(failed_benchmarks),
+            len(benchmarks),
+            len(failed_benchmarks),
+            args.perf_threshold,
+            args.perf_runs,
+        )
+    )
+    if failed_benchmarks:
+        print("List of regressed or failed benchmarks:\n    %s" % "\n    ".join(failed_benchmarks))
+        return 1
+    return 0
 
 
 #
@@ -1292,6 +2410,15 @@ def run_tests():
         program_name = os.path.basename(program)
         ns3_runnable_programs_dictionary[program_name] = program
 
+    #
+    # Get the test suites and the lists of examples from the test manifest.
+    #
+    test_manifest = load_test_manifest(test_runner_name)
+    if args.write_test_manifest:
+        # A manifest without the test suites is not written, and the suites
+        # are listed again by the next run, so this is not an error
+        return 0
+
     # Generate the lists of examples to run as smoke tests in order to
     # ensure that they remain buildable and runnable over time.
     #
@@ -1313,6 +2440,7 @@ def run_tests():
             example_tests,
             example_names_original,
             python_tests,
+            test_manifest,
         )
 
     for module in NS3_ENABLED_MODULES:
@@ -1334,6 +2462,7 @@ def run_tests():
             example_tests,
             example_names_original,
             python_tests,
+            test_manifest,
         )
 
     for module in NS3_ENABLED_CONTRIBUTED_MODULES:
@@ -1355,6 +2484,7 @@ def run_tests():
             example_tests,
             example_names_original,
             python_tests,
+            test_manifest,
         )
 
     #
@@ -1367,7 +2497,7 @@ def run_tests():
 
     #
     # There are a couple of options that imply we can to exit before starting
-    # up a bunch of threads and running tests.  Let's detect these cases and
+    # up a bunch of workers and running tests.  Let's detect these cases and
     # handle them without doing all of the hard work.
     #
     if args.kinds:
@@ -1380,33 +2510,24 @@ def run_tests():
     if args.list:
         list_items = []
         if ENABLE_TESTS:
-            if len(args.constrain):
-                path_cmd = os.path.join(
-                    "utils",
-                    test_runner_name
-                    + " --print-test-name-list --print-test-types --test-type=%s" % args.constrain,
-                )
-            else:
-                path_cmd = os.path.join(
-                    "utils", test_runner_name + " --print-test-name-list --print-test-types"
-                )
-            (rc, standard_out, standard_err, et) = run_job_synchronously(
-                path_cmd, os.getcwd(), False, False
-            )
-            if rc != 0:
+            if test_manifest["suites"] is None:
                 # This is usually a sign that ns-3 crashed or exited uncleanly
-                print(("test.py error:  test-runner return code returned {}".format(rc)))
+                print("test.py error:  test-runner failed to list the test suites")
                 print(
                     (
                         "To debug, try running {}\n".format(
-                            "'./ns3 run \"test-runner --print-test-name-list\"'"
+                            "'./ns3 run \"test-runner --print-test-manifest\"'"
                         )
                     )
                 )
                 return
-            if isinstance(standard_out, bytes):
-                standard_out = standard_out.decode()
-            list_items = standard_out.split("\n")
+            # The labels are the ones of the test-runner --print-test-types option
+            labels = {"example": "example-as-test"}
+            for suite in test_manifest["suites"]:
+                if args.constrain in ("", "core") or suite["type"] == args.constrain:
+                    list_items.append(
+                        "%-21s%s" % (labels.get(suite["type"], suite["type"]), suite["name"])
+                    )
             list_items.sort()
         print("Test Type            Test Name")
         print("---------------      ---------")
@@ -1419,7 +2540,7 @@ def run_tests():
             examples_sorted.sort()
         if ENABLE_PYTHON_BINDINGS:
             python_examples_sorted = []
-            for x, y in python_tests:
+            for x, y, _ in python_tests:
                 if y == "True":
                     python_examples_sorted.append(x)
             python_examples_sorted.sort()
@@ -1431,6 +2552,9 @@ def run_tests():
     if args.kinds or args.list:
         return
 
+    if args.perf:
+        return run_performance_tests(test_runner_name, test_manifest)
+
     #
     # We communicate results in two ways.  First, a simple message relating
     # PASS, FAIL, CRASH or SKIP is always written to the standard output.  It
@@ -1483,8 +2607,8 @@ def run_tests():
     #
     # We need to figure out what test suites to execute.  We are either given one
     # suite or example explicitly via the --suite or --example/--pyexample option,
-    # or we need to call into the test runner and ask it to list all of the available
-    # test suites.  Further, we need to provide the constraint information if it
+    # or we need to look up all of the available test suites in the test
+    # manifest.  Further, we need to provide the constraint information if it
     # has been given to us.
     #
     # This translates into allowing the following options with respect to the
@@ -1507,14 +2631,7 @@ def run_tests():
 
     if len(args.suite):
         # See if this is a valid test suite.
-        path_cmd = os.path.join("utils", test_runner_name + " --print-test-name-list")
-        (rc, suites, standard_err, et) = run_job_synchronously(path_cmd, os.getcwd(), False, False)
-
-        if isinstance(suites, bytes):
-            suites = suites.decode()
-
-        suites = suites.replace("\r\n", "\n")
-        suites_found = fnmatch.filter(suites.split("\n"), args.suite)
+        suites_found = fnmatch.filter(get_test_suite_names(test_manifest), args.suite)
 
         if not suites_found:
             print(
@@ -1525,36 +2642,21 @@ def run_tests():
         elif len(suites_found) == 1:
             single_suite = True
 
-        suites = "\n".join(suites_found)
+        suite_list = suites_found
 
     elif ENABLE_TESTS and len(args.example) == 0 and len(args.pyexample) == 0:
-        if len(args.constrain):
-            path_cmd = os.path.join(
-                "utils",
-                test_runner_name + " --print-test-name-list --test-type=%s" % args.constrain,
-            )
-            (rc, suites, standard_err, et) = run_job_synchronously(
-                path_cmd, os.getcwd(), False, False
-            )
-        else:
-            path_cmd = os.path.join("utils", test_runner_name + " --print-test-name-list")
-            (rc, suites, standard_err, et) = run_job_synchronously(
-                path_cmd, os.getcwd(), False, False
-            )
+        suite_list = get_test_suite_names(test_manifest, args.constrain)
     else:
-        suites = ""
+        suite_list = []
 
     #
     # suite_list will either a single test suite name that the user has
     # indicated she wants to run or a list of test suites provided by
-    # the test-runner possibly according to user provided constraints.
+    # the test manifest possibly according to user provided constraints.
     # We go through the trouble of setting up the parallel execution
     # even in the case of a single suite to avoid having to process the
     # results in two different places.
     #
-    if isinstance(suites, bytes):
-        suites = suites.decode()
-    suite_list = suites.split("\n")
 
     #
     # Performance tests should only be run when they are requested,
@@ -1563,15 +2665,7 @@ def run_tests():
     # it is a performance test.
     if not single_suite and args.constrain != "performance":
         # Get a list of all of the performance tests.
-        path_cmd = os.path.join(
-            "utils", test_runner_name + " --print-test-name-list --test-type=%s" % "performance"
-        )
-        (rc, performance_tests, standard_err, et) = run_job_synchronously(
-            path_cmd, os.getcwd(), False, False
-        )
-        if isinstance(performance_tests, bytes):
-            performance_tests = performance_tests.decode()
-        performance_test_list = performance_tests.split("\n")
+        performance_test_list = get_test_suite_names(test_manifest, "performance")
 
         # Remove any performance tests from the suites list.
         for performance_test in performance_test_list:
@@ -1579,15 +2673,8 @@ def run_tests():
                 suite_list.remove(performance_test)
 
     # We now have a possibly large number of test suites to run, so we want to
-    # run them in parallel.  We're going to spin up a number of worker threads
-    # that will run our test jobs for us.
-    #
-    input_queue = queue.Queue(0)
-    output_queue = queue.Queue(0)
-
-    jobs = 0
-    threads = []
-
+    # run them in parallel.  The job executor runs our test jobs for us on a
+    # number of workers.
     #
     # In Python 2.6 you can just use multiprocessing module, but we don't want
     # to introduce that dependency yet; so we jump through a few hoops.
@@ -1617,13 +2704,30 @@ def run_tests():
             print("Limiting to %s worker processes" % processors)
 
     #
-    # Now, spin up one thread per processor which will eventually mean one test
-    # per processor running concurrently.
+    # The test suites run by a worker share a test-runner in server
+    # mode, rather than starting a test-runner each.  Valgrind errors are
+    # reported per process though, so it still needs a process per test suite.
+    #
+    use_test_runner_servers = not (
+        args.process_per_suite or args.valgrind or sys.platform == "win32"
+    )
+    server_command = [
+        os.path.join(NS3_BUILDDIR, "utils", test_runner_name),
+        "--server",
+        "--xml",
+        "--tempdir=%s" % testpy_output_dir,
+        "--fullness=%s" % (args.fullness.upper() if len(args.fullness) else "QUICK"),
+    ]
+    if not args.multiple:
+        server_command.append("--stop-on-failure")
+    if args.update_data:
+        server_command.append("--update-data")
+
+    #
+    # One worker per processor will eventually mean one test per processor
+    # running concurrently.
     #
-    for i in range(processors):
-        thread = worker_thread(input_queue, output_queue)
-        threads.append(thread)
-        thread.start()
+    executor = JobExecutor(processors, server_command if use_test_runner_servers else None)
 
     #
     # Keep track of some summary statistics
@@ -1633,15 +2737,16 @@ def run_tests():
     skipped_testnames = []
 
     #
-    # We now have worker threads spun up, and a list of work to do.  So, run
-    # through the list of test suites and dispatch a job to run each one.
+    # We now have a job executor, and a list of work to do.  So, run
+    # through the list of test suites and create a job to run each one.  The
+    # jobs are dispatched once all of them are known, longest first.
     #
-    # Dispatching will run with unlimited speed and the worker threads will
-    # execute as fast as possible from the queue.
+    # The workers of the executor will run them as fast as possible.
     #
     # Note that we actually dispatch tests to be skipped, so all the
     # PASS, FAIL, CRASH and SKIP processing is done in the same place.
     #
+    pending_jobs = []
     for test in suite_list:
         test = test.strip()
         if len(test):
@@ -1680,8 +2785,7 @@ def run_tests():
             if args.verbose:
                 print("Queue %s" % test)
 
-            input_queue.put(job)
-            jobs = jobs + 1
+            pending_jobs.append(job)
             total_tests = total_tests + 1
 
     #
@@ -1806,8 +2910,7 @@ def run_tests():
                                 )
                             # TAKES_FOREVER includes everything, so no need to exclude anything
 
-                            input_queue.put(job)
-                            jobs = jobs + 1
+                            pending_jobs.append(job)
                             total_tests = total_tests + 1
 
     #
@@ -1888,15 +2991,12 @@ def run_tests():
                             )
                         # TAKES_FOREVER includes everything, so no need to exclude anything
 
-                        input_queue.put(job)
-                        jobs = jobs + 1
+                        pending_jobs.append(job)
                         total_tests = total_tests + 1
 
     elif len(args.pyexample):
         # Find the full relative path to file if only a partial path has been given.
         if not os.path.exists(args.pyexample):
-            import glob
-
             files = glob.glob("./**/%s" % args.pyexample, recursive=True)
             if files:
                 args.pyexample = files[0]
@@ -1925,41 +3025,96 @@ def run_tests():
             if args.verbose:
                 print("Queue %s" % args.pyexample)
 
-            input_queue.put(job)
-            jobs = jobs + 1
+            pending_jobs.append(job)
             total_tests = total_tests + 1
 
     #
-    # Tell the worker threads to pack up and go home for the day.  Each one
-    # will exit when they see their is_break task.
+    # When the run is split over several hosts, only keep the jobs of our shard.
+    #
+    durations_file = args.job_durations or JOB_DURATIONS_FILE
+    job_durations = load_job_durations(durations_file)
+    if args.shard is not None:
+        shard, shards = args.shard
+        pending_jobs = select_shard_jobs(
+            pending_jobs, shard, shards, job_durations if args.job_durations else None
+        )
+        print(
+            "Running shard %d of %d: %d of %d jobs"
+            % (shard, shards, len(pending_jobs), total_tests)
+        )
+        total_tests = len(pending_jobs)
+
+    #
+    # Jobs which passed in a previous run with the same cache key are reported
+    # as passed without running, unless --force is given.  Regenerating the
+    # reference data or the example usage requires running the jobs though.
+    #
+    use_result_cache = not (args.update_data or "NS_COMMANDLINE_INTROSPECTION" in os.environ)
+    if use_result_cache:
+        result_cache = load_result_cache()
+        cached_results = result_cache["results"]
+        test_suites = {}
+        if any(not (job.is_skip or job.is_example or job.is_pyexample) for job in pending_jobs):
+            test_suites = get_test_suites_by_name(test_manifest)
+        for job in pending_jobs:
+            if job.is_skip:
+                continue
+            job.set_cache_key(get_job_cache_key(job, result_cache["files"], test_suites))
+            name = "%s %s" % (get_result_cache_mode(), job.get_duration_key())
+            if job.cache_key is not None and cached_results.get(name) == job.cache_key:
+                job.set_is_cached(not args.force)
+
+    #
+    # The output of each job is written to a file of its own, named after the
+    # job, rather than kept in memory.
     #
-    for i in range(processors):
-        job = Job()
-        job.set_is_break(True)
-        input_queue.put(job)
+    job_output_dir = os.path.join(TMP_OUTPUT_DIR, "%s-output" % date_and_time)
+    output_file_names = set()
+    for job in pending_jobs:
+        if job.is_skip or job.is_cached:
+            continue
+        name = prefix = re.sub(r"[^\w.+=-]+", "_", job.display_name).strip("_")
+        index = 1
+        while name in output_file_names:
+            index += 1
+            name = "%s-%d" % (prefix, index)
+        output_file_names.add(name)
+        job.set_output_file_name(os.path.join(job_output_dir, name))
+    if output_file_names:
+        os.makedirs(job_output_dir, exist_ok=True)
+
+    #
+    # Dispatch the jobs, longest expected duration first.
+    #
+    known_jobs = sort_jobs_by_expected_duration(pending_jobs, job_durations)
+    predicted_makespan = predict_makespan(pending_jobs, processors)
+    dispatch_start_time = time.time()
+    if args.verbose:
+        for job in pending_jobs:
+            print("Dispatch %s (expected %.3f s)" % (job.display_name, job.expected_duration))
 
     #
-    # Now all of the tests have been dispatched, so all we have to do here
-    # in the main thread is to wait for them to complete.  Keyboard interrupt
-    # handling is broken as mentioned above.  We use a signal handler to catch
-    # sigint and set a global variable.  When the worker threads sense this
-    # they stop doing real work and will just start throwing jobs back at us
-    # with is_break set to True.  In this case, there are no real results so we
-    # ignore them.  If there are real results, we always print PASS or FAIL to
-    # standard out as a quick indication of what happened.
+    # Now all of the tests are known, so all we have to do here is to wait
+    # for the executor to run them.  A keyboard interrupt kills the running
+    # jobs, and the jobs which did not finish are not reported.  For the jobs
+    # which finished, we always print PASS or FAIL to standard out as a quick
+    # indication of what happened.
     #
     passed_tests = 0
     failed_tests = 0
     failed_testnames = []
     crashed_tests = 0
     crashed_testnames = []
+    timeout_tests = 0
+    timeout_testnames = []
     valgrind_errors = 0
     valgrind_testnames = []
     failed_jobs = []
-    for i in range(jobs):
-        job = output_queue.get()
-        if job.is_break:
-            continue
+    finished_jobs = []
+    cached_tests = 0
+    for i, job in enumerate(executor.run(pending_jobs)):
+        if not job.is_skip and not job.is_cached:
+            finished_jobs.append(job)
 
         if job.is_example or job.is_pyexample:
             kind = "Example"
@@ -1971,9 +3126,19 @@ def run_tests():
             status_print = colors.GREY + status + colors.NORMAL
             skipped_tests = skipped_tests + 1
             skipped_testnames.append(job.display_name + (" (%s)" % job.skip_reason))
+        elif job.is_cached:
+            status = "PASS"
+            status_print = colors.GREEN + status + colors.NORMAL + " (cached)"
+            passed_tests = passed_tests + 1
+            cached_tests = cached_tests + 1
         else:
             failed_jobs.append(job)
-            if job.returncode == 0:
+            if job.is_timeout:
+                timeout_tests = timeout_tests + 1
+                timeout_testnames.append(job.display_name)
+                status = "TIMEOUT"
+                status_print = colors.YELLOW + status + colors.NORMAL
+            elif job.returncode == 0:
                 status = "PASS"
                 status_print = colors.GREEN + status + colors.NORMAL
                 passed_tests = passed_tests + 1
@@ -2030,10 +3195,18 @@ def run_tests():
                 elif status == "SKIP":
                     f.write("  <Result>SKIP</Result>\n")
                     f.write("  <Reason>%s</Reason>\n" % job.skip_reason)
+                elif status == "TIMEOUT":
+                    f.write("  <Result>TIMEOUT</Result>\n")
+                    f.write("  <Reason>killed after %s s</Reason>\n" % args.timeout)
                 else:
                     f.write("  <Result>CRASH</Result>\n")
 
+                if job.is_cached:
+                    f.write("  <Reason>cached</Reason>\n")
+
                 f.write('  <Time real="%.3f"/>\n' % job.elapsed_time)
+                if not job.is_skip and not job.is_cached:
+                    f.write(get_job_output_xml(job))
                 f.write("</Example>\n")
 
         else:
@@ -2088,6 +3261,22 @@ def run_tests():
                     f.write("  <Result>SKIP</Result>\n")
                     f.write("  <Reason>%s</Reason>\n" % job.skip_reason)
                     f.write("</Test>\n")
+            elif job.is_cached:
+                with open(xml_results_file, "a", encoding="utf-8") as f:
+                    f.write("<Test>\n")
+                    f.write("  <Name>%s</Name>\n" % job.display_name)
+                    f.write("  <Result>PASS</Result>\n")
+                    f.write("  <Reason>cached</Reason>\n")
+                    f.write("</Test>\n")
+            elif job.is_timeout:
+                failed_jobs.append(job)
+                with open(xml_results_file, "a", encoding="utf-8") as f:
+                    f.write("<Test>\n")
+                    f.write("  <Name>%s</Name>\n" % job.display_name)
+                    f.write("  <Result>TIMEOUT</Result>\n")
+                    f.write("  <Reason>killed after %s s</Reason>\n" % args.timeout)
+                    f.write(get_job_output_xml(job))
+                    f.write("</Test>\n")
             else:
                 failed_jobs.append(job)
                 if job.returncode == 0 or job.returncode == 1 or job.returncode == 2:
@@ -2099,6 +3288,9 @@ def run_tests():
                             pre = contents.find("<Result>") + len("<Result>")
                             post = contents.find("</Result>")
                             contents = contents[:pre] + "VALGR" + contents[post:]
+                        end = contents.rfind("</Test>")
+                        if end != -1:
+                            contents = contents[:end] + get_job_output_xml(job) + contents[end:]
                         f_to.write(contents)
                         # When running with sanitizers, the program may
                         # crash before ever writing the expected xml
@@ -2114,15 +3306,23 @@ def run_tests():
                         f.write("<Test>\n")
                         f.write("  <Name>%s</Name>\n" % job.display_name)
                         f.write("  <Result>CRASH</Result>\n")
+                        f.write(get_job_output_xml(job))
                         f.write("</Test>\n")
 
     #
-    # We have all of the tests run and the results written out.  One final
-    # bit of housekeeping is to wait for all of the threads to close down
-    # so we can exit gracefully.
+    # We have all of the tests run and the results written out, unless the
+    # run was interrupted.
     #
-    for thread in threads:
-        thread.join()
+    if executor.interrupted:
+        print("Interrupted: the tests which did not finish are not reported")
+
+    actual_makespan = time.time() - dispatch_start_time
+    # A shard only runs some of the jobs, so it would make the durations
+    # recorded by the hosts, and then their partitions, diverge
+    if args.shard is None:
+        save_job_durations(finished_jobs, durations_file)
+    if use_result_cache:
+        save_result_cache(result_cache, finished_jobs)
 
     #
     # Back at the beginning of time, we started the body of an XML document
@@ -2137,7 +3337,7 @@ def run_tests():
     # Print a quick summary of events
     #
     print(
-        "%d of %d tests passed (%d passed, %d skipped, %d failed, %d crashed, %d valgrind errors)"
+        "%d of %d tests passed (%d passed, %d skipped, %d failed, %d crashed, %d timed out, %d valgrind errors)"
         % (
             passed_tests,
             total_tests,
@@ -2145,9 +3345,25 @@ def run_tests():
             skipped_tests,
             failed_tests,
             crashed_tests,
+            timeout_tests,
             valgrind_errors,
         )
     )
+    if cached_tests:
+        print(
+            "%d of the passed tests were not run again, since they passed before with the same programs, libraries and arguments (use --force to run them)"
+            % cached_tests
+        )
+    #
+    # Compare the time taken by the jobs with the time predicted from the
+    # previous runs, if any of the jobs ran before.
+    #
+    if known_jobs:
+        print(
+            "Predicted time %.1f s, actual time %.1f s (%d of %d jobs with known durations, %d workers)"
+            % (predicted_makespan, actual_makespan, known_jobs, len(pending_jobs), processors)
+        )
+
     #
     # Repeat summary of skipped, failed, crashed, valgrind events
     #
@@ -2160,22 +3376,28 @@ def run_tests():
     if crashed_testnames:
         crashed_testnames.sort()
         print("List of CRASHed tests:\n    %s" % "\n    ".join(map(str, crashed_testnames)))
+    if timeout_testnames:
+        timeout_testnames.sort()
+        print("List of TIMEOUT tests:\n    %s" % "\n    ".join(map(str, timeout_testnames)))
     if valgrind_testnames:
         valgrind_testnames.sort()
         print("List of VALGR failures:\n    %s" % "\n    ".join(map(str, valgrind_testnames)))
 
+    if failed_jobs:
+        print("The output of the tests which did not pass is in %s" % job_output_dir)
+
     if failed_jobs and args.verbose_failed:
         for job in failed_jobs:
-            if job.standard_out or job.standard_err:
+            if job.stdout_size or job.stderr_size:
                 job_type = "example" if (job.is_example or job.is_pyexample) else "test suite"
                 print(
                     f"===================== Begin of {job_type} '{job.display_name}' stdout ====================="
                 )
-                print(job.standard_out)
+                print(read_job_output_tail(job.get_stdout_file_name(), "stdout"))
                 print(
                     f"===================== Begin of {job_type} '{job.display_name}' stderr ====================="
                 )
-                print(job.standard_err)
+                print(read_job_output_tail(job.get_stderr_file_name(), "stderr"))
                 print(
                     f"===================== End of {job_type} '{job.display_name}' =============================="
                 )
@@ -2230,6 +3452,13 @@ def run_tests():
     #
     if not args.retain:
         shutil.rmtree(testpy_output_dir)
+        failed_job_ids = set(id(job) for job in failed_jobs)
+        for job in finished_jobs:
+            if id(job) not in failed_job_ids:
+                os.remove(job.get_stdout_file_name())
+                os.remove(job.get_stderr_file_name())
+        if os.path.isdir(job_output_dir) and not os.listdir(job_output_dir):
+            os.rmdir(job_output_dir)
 
     if passed_tests + skipped_tests == total_tests:
         return 0  # success
@@ -2237,6 +3466,99 @@ def run_tests():
         return 1  # catchall for general errors
 
 
+#
+# The merge command combines the results files of several runs, e.g. of the
+# shards of a run split over several hosts with --shard, into a single results
+# file, which can be translated to text or HTML like the results of a run.
+#
+def merge_results(argv):
+    parser = argparse.ArgumentParser(
+        prog="test.py merge",
+        description="Merge the XML results files of several test.py runs into a single report.",
+    )
+    parser.add_argument(
+        "results_files",
+        nargs="+",
+        metavar="RESULTS-FILE",
+        help="XML results file, written with --xml or found in %s" % TMP_OUTPUT_DIR,
+    )
+    parser.add_argument(
+        "--text",
+        action="store",
+        type=str,
+        default="",
+        metavar="TEXT-FILE",
+        help="write detailed test results into TEXT-FILE.txt",
+    )
+    parser.add_argument(
+        "--html",
+        action="store",
+        type=str,
+        default="",
+        metavar="HTML-FILE",
+        help="write detailed test results into HTML-FILE.html",
+    )
+    parser.add_argument(
+        "--xml",
+        action="store",
+        type=str,
+        default="",
+        metavar="XML-FILE",
+        help="write detailed test results into XML-FILE.xml",
+    )
+    merge_args = parser.parse_args(argv)
+
+    merged_results = ET.Element("Results")
+    merged_results.text = "\n"
+    for results_file in merge_args.results_files:
+        try:
+            merged_results.extend(ET.parse(results_file).getroot())
+        except (OSError, ET.ParseError) as e:
+            print("Failed to read results file %s: %s" % (results_file, e), file=sys.stderr)
+            return 2
+
+    if not os.path.exists(TMP_OUTPUT_DIR):
+        os.makedirs(TMP_OUTPUT_DIR)
+    date_and_time = time.strftime("%Y-%m-%d-%H-%M-%S-CUT", time.gmtime())
+    xml_results_file = os.path.join(TMP_OUTPUT_DIR, f"{date_and_time}-results.xml")
+    with open(xml_results_file, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0"?>\n')
+        f.write(ET.tostring(merged_results, encoding="unicode"))
+        f.write("\n")
+
+    results = [element.find("Result").text for element in merged_results]
+    print(
+        "%d of %d tests passed (%d passed, %d skipped, %d failed, %d crashed, %d timed out, %d valgrind errors)"
+        % (
+            results.count("PASS"),
+            len(results),
+            results.count("PASS"),
+            results.count("SKIP"),
+            results.count("FAIL"),
+            results.count("CRASH"),
+            results.count("TIMEOUT"),
+            results.count("VALGR"),
+        )
+    )
+
+    if len(merge_args.html):
+        translate_to_html(xml_results_file, merge_args.html)
+
+    if len(merge_args.text):
+        translate_to_text(xml_results_file, merge_args.text)
+
+    if len(merge_args.xml):
+        xml_file = merge_args.xml + (".xml" if ".xml" not in merge_args.xml else "")
+        print("Writing results to xml file %s..." % xml_file, end="")
+        shutil.copyfile(xml_results_file, xml_file)
+        print("done.")
+
+    if results.count("PASS") + results.count("SKIP") == len(results):
+        return 0
+    else:
+        return 1
+
+
 def split_program_and_arguments(argv):
     split_argv = re.findall(r'(?:".*[|*]?"|\S)+', argv)
     program = ""
@@ -2249,7 +3571,12 @@ def split_program_and_arguments(argv):
 
 
 def main(argv):
-    parser = argparse.ArgumentParser()
+    if len(argv) > 1 and argv[1] == "merge":
+        return merge_results(argv[2:])
+
+    parser = argparse.ArgumentParser(
+        epilog="Run '%(prog)s merge --help' for merging the results of several runs."
+    )
     parser.add_argument(
         "-b",
         "--buildpath",
@@ -2426,7 +3753,115 @@ def main(argv):
         type=int,
         dest="process_limit",
         default=0,
-        help="limit number of worker threads",
+        help="limit number of workers running tests concurrently",
+    )
+
+    parser.add_argument(
+        "--perf",
+        action="store_true",
+        default=False,
+        help="run the performance test suites and the utils/bench-* programs several times each, and compare their run times with previous runs",
+    )
+
+    parser.add_argument(
+        "--perf-runs",
+        action="store",
+        type=int,
+        dest="perf_runs",
+        default=5,
+        metavar="R",
+        help="run each benchmark R times with --perf, at least 2 (default: 5)",
+    )
+
+    parser.add_argument(
+        "--perf-threshold",
+        action="store",
+        type=float,
+        dest="perf_threshold",
+        default=5.0,
+        metavar="PERCENT",
+        help="with --perf, fail if a benchmark is significantly slower than its baseline by more than PERCENT (default: 5)",
+    )
+
+    parser.add_argument(
+        "--perf-baseline",
+        action="store",
+        type=str,
+        dest="perf_baseline",
+        default="",
+        metavar="COMMIT",
+        help="with --perf, compare with the latest run of COMMIT (a git revision or a prefix of a commit hash) instead of the latest run",
+    )
+
+    parser.add_argument(
+        "--perf-history",
+        action="store",
+        type=str,
+        dest="perf_history",
+        default=PERF_HISTORY_FILE,
+        metavar="FILE",
+        help="store the run times of --perf runs in the SQLite database FILE (default: %s)"
+        % PERF_HISTORY_FILE,
+    )
+
+    parser.add_argument(
+        "--write-test-manifest",
+        action="store_true",
+        dest="write_test_manifest",
+        default=False,
+        help="write the manifest of the test suites and examples in the build directory if it is out of date, and exit (done when the test-runner is built)",
+    )
+
+    parser.add_argument(
+        "--shard",
+        action="store",
+        type=parse_shard,
+        default=None,
+        metavar="K/N",
+        help="split the test suites and examples into N shards and run the K-th one (combine the results of the shards with the merge command); the shards are balanced by the durations of --job-durations if given, and split by a hash of the job names otherwise",
+    )
+
+    parser.add_argument(
+        "--job-durations",
+        action="store",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="read (and, except with --shard, update) the durations of the jobs in previous runs from FILE instead of %s; every host of a --shard run must use the same file"
+        % JOB_DURATIONS_FILE,
+    )
+
+    parser.add_argument(
+        "--timeout",
+        action="store",
+        type=float,
+        default=0,
+        metavar="SECONDS",
+        help="kill the test suites and examples running for longer than SECONDS and report them as timed out",
+    )
+
+    parser.add_argument(
+        "--memory-limit",
+        action="store",
+        type=int,
+        dest="memory_limit",
+        default=0,
+        metavar="MB",
+        help="limit the address space of each test suite and example to MB megabytes (not supported on Windows)",
+    )
+
+    parser.add_argument(
+        "--process-per-suite",
+        action="store_true",
+        default=False,
+        help="run each test suite in a test-runner process of its own, instead of reusing one test-runner per worker",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        default=False,
+        help="run the test suites and examples which passed before with the same programs, libraries and arguments, instead of reporting their cached results",
     )
 
     parser.add_argument(
@@ -2441,7 +3876,11 @@ def main(argv):
     args = parser.parse_args()
     args.example, exargs = split_program_and_arguments(args.example)
     setattr(args, "example_args", exargs)
-    signal.signal(signal.SIGINT, sigint_hook)
+    if args.memory_limit and sys.platform == "win32":
+        parser.error("--memory-limit is not supported on Windows")
+    # The run times of a benchmark are compared with a t-test, which needs two samples
+    if args.perf_runs < 2:
+        parser.error("--perf-runs must be at least 2")
 
     # From waf/waflib/Options.py
     envcolor = os.environ.get("NOCOLOR", "") and "no" or "auto" or "yes"
@@ -16,7 +16,17 @@ except ModuleNotFoundError:
         " Python bindings may not be enabled"
         " or your PYTHONPATH might not be properly configured"
     )
+import atexit
+import contextlib
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
 import sys
+import tempfile
+import time
 
 UINT32_MAX = 0xFFFFFFFF
 
@@ -185,6 +195,161 @@ class TestSimulator(unittest.TestCase):
         v1 = ns.int64x64_t(5.0) * ns.int64x64_t(10)
         self.assertEqual(v1, ns.int64x64_t(50))
 
+    def testTimeNumericProtocol(self):
+        """! Test the Python numeric protocol of Time
+        @param self this object
+        @return None
+        """
+        self.assertEqual(ns.Seconds(10) * 3, ns.Seconds(30))
+        self.assertEqual(2.5 * ns.Seconds(10), ns.Seconds(25))
+        self.assertEqual(ns.Seconds(10) / 4, ns.MilliSeconds(2500))
+        self.assertEqual(ns.Seconds(10) * ns.int64x64_t(1.5), ns.Seconds(15))
+        self.assertEqual(ns.Seconds(10) / ns.int64x64_t(4), ns.MilliSeconds(2500))
+        self.assertEqual((ns.Seconds(10) / ns.Seconds(4)).GetDouble(), 2.5)
+        self.assertEqual(ns.Seconds(10) // ns.Seconds(4), 2)
+        self.assertEqual(ns.Seconds(10) % ns.Seconds(4), ns.Seconds(2))
+        self.assertEqual(-ns.Seconds(10), ns.Seconds(-10))
+        self.assertEqual(abs(ns.Seconds(-10)), ns.Seconds(10))
+        self.assertNotEqual(ns.Seconds(1), None)
+        self.assertEqual(float(ns.MilliSeconds(1500)), 1.5)
+        self.assertEqual(int(ns.MilliSeconds(1500)), 1)
+        with self.assertRaises(TypeError):
+            ns.Seconds(1) * "2"
+        self.assertEqual(len({ns.Seconds(1), ns.MilliSeconds(1000), ns.Seconds(2)}), 2)
+        self.assertEqual(sorted([ns.Seconds(3), ns.Seconds(1)]), [ns.Seconds(1), ns.Seconds(3)])
+
+    def testTimeArray(self):
+        """! Test arrays of times
+        @param self this object
+        @return None
+        """
+        try:
+            import numpy
+        except ModuleNotFoundError:
+            self.skipTest("NumPy is not installed")
+        times = ns.TimeArray.from_values([0.5, 1, 2.25])
+        self.assertEqual(len(times), 3)
+        self.assertEqual(times[1], ns.Seconds(1))
+        self.assertEqual(
+            times.to_times(), [ns.MilliSeconds(500), ns.Seconds(1), ns.MilliSeconds(2250)]
+        )
+        self.assertListEqual(list(times.to_values(ns.Time.MS)), [500, 1000, 2250])
+        self.assertListEqual(list(times + ns.Seconds(1) > ns.Seconds(2)), [False, False, True])
+        self.assertListEqual(list((times * 2).to_values()), [1, 2, 4.5])
+        self.assertListEqual(list((times / 2).to_values()), [0.25, 0.5, 1.125])
+        with self.assertRaises(TypeError):
+            times / "2"
+        self.assertListEqual(
+            list(ns.TimeArray.from_times(times.to_times()).ticks), list(times.ticks)
+        )
+
+    def testScheduleMany(self):
+        """! Test scheduling many events in a single call
+        @param self this object
+        @return None
+        """
+        try:
+            import numpy
+        except ModuleNotFoundError:
+            self.skipTest("NumPy is not installed")
+        ns.Simulator.Destroy()
+        calls = []
+
+        def record(payload):
+            calls.append((ns.Simulator.Now(), payload))
+
+        # Events at the same time run in the order they were scheduled
+        ns.Simulator.ScheduleMany(numpy.array([0.3, 0.1, 0.2, 0.1]), record, ["a", "b", "c", "d"])
+        ns.Simulator.ScheduleMany(
+            [ns.MilliSeconds(150), ns.MilliSeconds(100)], lambda: record(None)
+        )
+        with self.assertRaises(ValueError):
+            ns.Simulator.ScheduleMany([1.0, -1.0], lambda: record(None))
+        with self.assertRaises(ValueError):
+            ns.Simulator.ScheduleMany([1.0, 2.0], record, ["a"])
+        ns.Simulator.Run()
+        ns.Simulator.Destroy()
+
+        self.assertEqual(
+            calls,
+            [
+                (ns.MilliSeconds(100), "b"),
+                (ns.MilliSeconds(100), "d"),
+                (ns.MilliSeconds(100), None),
+                (ns.MilliSeconds(150), None),
+                (ns.MilliSeconds(200), "c"),
+                (ns.MilliSeconds(300), "a"),
+            ],
+        )
+
+    def testConnectTraceBuffer(self):
+        """! Test receiving packet trace events in batches
+        @param self this object
+        @return None
+        """
+        try:
+            import numpy
+        except ModuleNotFoundError:
+            self.skipTest("NumPy is not installed")
+        ns.Simulator.Destroy()
+
+        # Drop every packet received by the second node, to fire its PhyRxDrop trace
+        nodes = ns.NodeContainer(2)
+        devices = ns.SimpleNetDeviceHelper().Install(nodes)
+        error_model = ns.CreateObject[ns.RateErrorModel]()
+        error_model.SetAttribute("ErrorRate", ns.DoubleValue(1.0))
+        error_model.SetAttribute("ErrorUnit", ns.StringValue("ERROR_UNIT_PACKET"))
+        devices.Get(1).SetAttribute("ReceiveErrorModel", ns.PointerValue(error_model))
+
+        def send(size):
+            devices.Get(0).Send(ns.Packet(size), devices.Get(1).GetAddress(), 0)
+
+        batches = []
+        path = "/NodeList/%d/DeviceList/*/$ns3::SimpleNetDevice/PhyRxDrop" % nodes.Get(1).GetId()
+        buffer = ns.ConnectTraceBuffer(path, batches.append, capacity=2, interval=ns.Seconds(5))
+        ns.Simulator.ScheduleMany([1.0, 2.0, 3.0], send, [100, 101, 102])
+        ns.Simulator.Run()
+
+        # The buffer is full after 2 packets, and the last one is delivered after the interval
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertListEqual(list(batches[0]["size"]), [100, 101])
+        self.assertListEqual(list(batches[0]["node"]), [nodes.Get(1).GetId()] * 2)
+        self.assertEqual(batches[1]["time"][0], ns.Seconds(3).GetTimeStep())
+        self.assertEqual(ns.Simulator.Now(), ns.Seconds(8))
+
+        # Packets are no longer recorded once the buffer is disposed of
+        buffer.Dispose()
+        ns.Simulator.ScheduleMany([1.0], send, [200])
+        ns.Simulator.Run()
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(buffer.GetNRecords(), 3)
+        ns.Simulator.Destroy()
+
+    def testPreload(self):
+        """! Test explicit loading of modules
+        @param self this object
+        @return None
+        """
+        ns.preload("network")
+        self.assertIn("network", repr(ns))
+        with self.assertRaises(Exception):
+            ns.preload("non-existent-module")
+
+    def testUnknownName(self):
+        """! Test that names no module declares do not load modules
+        @param self this object
+        @return None
+        """
+        loaded_modules = set(ns._loader.loaded_modules)
+        self.assertFalse(hasattr(ns, "NoSuchNs3Name"))
+        with self.assertRaises(AttributeError):
+            ns.NoSuchNs3Name
+        self.assertEqual(ns._loader.loaded_modules, loaded_modules)
+
+        # Names defined by C++ snippets are found without the symbol index
+        ns.cppdef("namespace ns3 { int pythonUnitTestsAnswer() { return 42; } }")
+        self.assertEqual(ns.pythonUnitTestsAnswer(), 42)
+
     def testConfig(self):
         """! Test configuration
         @param self this object
@@ -506,5 +671,220 @@ class TestSimulator(unittest.TestCase):
         ns.Simulator.Destroy()
 
 
+## TestBindingsLoader class
+class TestBindingsLoader(unittest.TestCase):
+    """! Tests of the library resolution and loading of the bindings, on the ns module itself"""
+
+    ## @var bindings
+    #  the ns module, which holds the loader functions
+    ## @var tmp_dir
+    #  temporary directory
+
+    def setUp(self):
+        """! Create a temporary directory
+        @param self this object
+        @return None
+        """
+        self.bindings = sys.modules["ns"]
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """! Remove the temporary directory
+        @param self this object
+        @return None
+        """
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def testResolutionCache(self):
+        """! Test that the cached library resolution is invalidated by changes to the libraries
+        @param self this object
+        @return None
+        """
+        lock_file = os.path.join(self.tmp_dir, ".lock-ns3")
+        library_dir = os.path.join(self.tmp_dir, "lib")
+        library = os.path.join(library_dir, "libns3-dev-core-default.so")
+        os.mkdir(library_dir)
+        for path in [lock_file, library]:
+            with open(path, "wb") as f:
+                f.write(b"content")
+        cache_path = os.path.join(self.tmp_dir, "cache", "python-bindings.json")
+        resolution = {
+            "fingerprint": self.bindings.bindings_fingerprint(lock_file, [library]),
+            "libraries": [os.path.basename(library)],
+        }
+        self.bindings.store_cached_bindings_resolution(cache_path, resolution)
+        self.assertEqual(
+            self.bindings.load_cached_bindings_resolution(cache_path, lock_file), resolution
+        )
+
+        # Another selection of modules has its own resolution and cache
+        self.assertIsNone(
+            self.bindings.load_cached_bindings_resolution(cache_path, lock_file, ["core"])
+        )
+        self.assertNotEqual(
+            self.bindings.get_bindings_cache_path(["core"]),
+            self.bindings.get_bindings_cache_path(),
+        )
+
+        # A rebuilt library changes its size or modification time
+        stat = os.stat(library)
+        os.utime(library, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNone(self.bindings.load_cached_bindings_resolution(cache_path, lock_file))
+        os.utime(library, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertIsNotNone(self.bindings.load_cached_bindings_resolution(cache_path, lock_file))
+
+        # So do new libraries, through the modification time of their directory
+        directory_stat = os.stat(library_dir)
+        os.utime(library_dir, ns=(directory_stat.st_atime_ns, directory_stat.st_mtime_ns + 10**9))
+        self.assertIsNone(self.bindings.load_cached_bindings_resolution(cache_path, lock_file))
+        os.utime(library_dir, ns=(directory_stat.st_atime_ns, directory_stat.st_mtime_ns))
+
+        # Removed libraries, and caches of another version or corrupt, are not used
+        resolution["fingerprint"]["version"] = -1
+        self.bindings.store_cached_bindings_resolution(cache_path, resolution)
+        self.assertIsNone(self.bindings.load_cached_bindings_resolution(cache_path, lock_file))
+        with open(cache_path, "w", encoding="utf-8") as f:
+            f.write("{")
+        self.assertIsNone(self.bindings.load_cached_bindings_resolution(cache_path, lock_file))
+        resolution["fingerprint"] = self.bindings.bindings_fingerprint(lock_file, [library])
+        self.bindings.store_cached_bindings_resolution(cache_path, resolution)
+        os.remove(library)
+        self.assertIsNone(self.bindings.load_cached_bindings_resolution(cache_path, lock_file))
+
+    def testElfDynamicSection(self):
+        """! Test that the libraries linked by an ns-3 library are read from its ELF headers
+        @param self this object
+        @return None
+        """
+        libraries = ns._loader.libraries
+        library_path = self.bindings.find_library_path(libraries["network"], ns._loader.prefix)[0]
+        with open(library_path, "rb") as f:
+            elf = f.read()
+        if elf[:4] != self.bindings.ELF_MAGIC:
+            self.skipTest("The ns-3 libraries are not ELF files")
+
+        needed, runpath_dirs = self.bindings.parse_elf_dynamic_section(elf)
+        self.assertIn(libraries["core"], needed)
+        self.assertIn(libraries["core"], self.bindings.scan_linked_libraries(library_path)[0])
+
+        # The dynamic section has the same entries as reported by readelf
+        if shutil.which("readelf") is None:
+            return
+        output = subprocess.run(
+            ["readelf", "-d", library_path], capture_output=True, text=True
+        ).stdout
+        self.assertEqual(needed, re.findall(r"\(NEEDED\)\s+Shared library: \[(.*)\]", output))
+        runpaths = re.findall(r"\((?:RUNPATH|RPATH)\)\s+Library r\w*path: \[(.*)\]", output)
+        self.assertEqual(runpath_dirs, [x for runpath in runpaths for x in runpath.split(":") if x])
+
+    def testImportProfiler(self):
+        """! Test the report of the import profiler
+        @param self this object
+        @return None
+        """
+        disabled_profiler = self.bindings.ImportProfiler("0")
+        with disabled_profiler.phase("include", "core"):
+            pass
+        self.assertEqual(disabled_profiler.results()["phases"], [])
+
+        report_path = os.path.join(self.tmp_dir, "import-profile.json")
+        profiler = self.bindings.ImportProfiler(report_path)
+        # The report is normally written when the interpreter exits
+        atexit.unregister(profiler.report)
+        with profiler.phase("include", "core"):
+            time.sleep(0.01)
+        with profiler.phase("load_library", "network"):
+            pass
+        with self.assertRaises(ValueError):
+            with profiler.phase("failed", "wifi"):
+                raise ValueError()
+        profiler.report()
+
+        with open(report_path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        phases = report["phases"]
+        self.assertEqual(len(phases), 3)
+        # Phases are sorted from the slowest to the fastest
+        self.assertEqual((phases[0]["phase"], phases[0]["module"]), ("include", "core"))
+        self.assertGreaterEqual(phases[0]["time"], 0.01)
+        self.assertEqual(sorted(phases, key=lambda x: -x["time"]), phases)
+        self.assertGreaterEqual(report["total_time"], phases[0]["time"])
+        self.assertIn("rss_delta", phases[0])
+
+        # The table is printed to stderr
+        profiler.output = "1"
+        output = io.StringIO()
+        with contextlib.redirect_stderr(output):
+            profiler.report()
+        self.assertIn("include", output.getvalue())
+        self.assertIn("total (until exit)", output.getvalue())
+
+    def testSelectedModules(self):
+        """! Test restricting the bindings to some modules and their dependencies
+        @param self this object
+        @return None
+        """
+        environment = dict(os.environ)
+        try:
+            os.environ["NS3_PY_MODULES"] = "network; internet,"
+            self.assertEqual(self.bindings.get_selected_modules(), ["network", "internet"])
+            os.environ["NS3_PY_MODULES"] = ""
+            self.assertIsNone(self.bindings.get_selected_modules())
+        finally:
+            os.environ.clear()
+            os.environ.update(environment)
+
+        modules = ["core", "stats", "network", "mobility", "wifi"]
+        libraries = ["libns3-dev-%s-default.so" % module for module in modules]
+        module_libraries = dict(zip(modules, libraries))
+        dependencies = {
+            module_libraries["core"]: [],
+            module_libraries["stats"]: [module_libraries["core"]],
+            module_libraries["network"]: [module_libraries["core"], module_libraries["stats"]],
+            module_libraries["mobility"]: [module_libraries["core"]],
+            module_libraries["wifi"]: [module_libraries["network"], module_libraries["mobility"]],
+        }
+        self.assertEqual(
+            sorted(self.bindings.filter_dependency_closure(dependencies, ["network"])),
+            sorted(module_libraries[x] for x in ["core", "stats", "network"]),
+        )
+        with self.assertRaises(Exception):
+            self.bindings.filter_dependency_closure(dependencies, ["non-existent-module"])
+
+        # ns.load() forgets about the modules outside of the dependency closure
+        loader = self.bindings.ModuleLoader(
+            None,
+            {
+                "modules": modules,
+                "libraries": libraries,
+                "dependencies": dependencies,
+                "symbols": {"Simulator": ["core"], "Packet": ["network"], "WifiPhy": ["wifi"]},
+                "prefix": self.tmp_dir,
+            },
+        )
+        loader.restrict(["network"])
+        self.assertEqual(list(loader.libraries), ["core", "stats", "network"])
+        self.assertIn("Packet", loader.symbols)
+        self.assertNotIn("WifiPhy", loader.symbols)
+        with self.assertRaises(Exception):
+            loader.dependency_closure(["wifi"])
+
+        # NS3_PY_MODULES restricts the bindings before they are imported
+        process = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "from ns import ns; print(','.join(ns._loader.libraries))",
+            ],
+            capture_output=True,
+            text=True,
+            env=dict(os.environ, NS3_PY_MODULES="network", PYTHONPATH=os.pathsep.join(sys.path)),
+        )
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertEqual(
+            process.stdout.strip().split(","), ns._loader.dependency_closure(["network"])
+        )
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=1, failfast=True)
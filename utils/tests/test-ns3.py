@@ -10,13 +10,20 @@
 Test suite for the ns3 wrapper script
 """
 
+import argparse
+import contextlib
 import glob
+import importlib.machinery
+import importlib.util
+import io
+import json
 import os
 import platform
 import re
 import shutil
 import subprocess
 import sys
+import tempfile
 import unittest
 from functools import partial
 
@@ -184,6 +191,18 @@ def get_enabled_modules():
     return read_lock_entry("NS3_ENABLED_MODULES")
 
 
+def load_ns3_script():
+    """!
+    Import the ns3 script as a module, to test its functions without running it
+    @return the ns3 module
+    """
+    loader = importlib.machinery.SourceFileLoader("ns3_script", ns3_script)
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
 class DockerContainerManager:
     """!
     Python-on-whales wrapper for Docker-based ns-3 tests
@@ -605,6 +624,221 @@ class NS3StyleTestCase(unittest.TestCase):
         self.assertEqual(NS3StyleTestCase.starting_diff, new_diff)
 
 
+class NS3ScriptFunctionsTestCase(unittest.TestCase):
+    """!
+    Tests of the functions of the ns3 script, which do not need ns-3 to be configured
+    """
+
+    def setUp(self):
+        """!
+        Import the ns3 script
+        @return None
+        """
+        super().setUp()
+        self.ns3 = load_ns3_script()
+
+    def test_01_BuildTimeReport(self):
+        """!
+        Test if the build time report reads the steps of the last build from the Ninja
+        build log, and attributes their times to translation units, modules and the
+        critical path
+        @return None
+        """
+        cmake_cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cmake_cache, ignore_errors=True)
+        ninja_log = os.path.join(cmake_cache, ".ninja_log")
+
+        def log_lines(steps):
+            # start and end in ms, mtime, output and command hash
+            return "".join("%d\t%d\t0\t%s\t%s\n" % step for step in steps)
+
+        previous_object = "src/core/CMakeFiles/libcore-obj.dir/model/object-%d.cc.o"
+        previous_build = [
+            (i * 100, i * 100 + 3000, previous_object % i, "%x" % i) for i in range(20)
+        ]
+        time_object = "src/core/CMakeFiles/libcore-obj.dir/model/time.cc.o"
+        simulator_object = "src/core/CMakeFiles/libcore-obj.dir/model/simulator.cc.o"
+        packet_object = "src/network/CMakeFiles/libnetwork-obj.dir/model/packet.cc.o"
+        core_library = "lib/libns3-dev-core-default.so"
+        network_library = "lib/libns3-dev-network-default.so"
+        # Steps are logged as they finish, and the link of the network library has two outputs
+        last_build = [
+            (100, 1500, packet_object, "a1"),
+            (0, 2500, simulator_object, "a2"),
+            (0, 4000, time_object, "a3"),
+            (4000, 5000, core_library, "a4"),
+            (5000, 5600, network_library, "a5"),
+            (5000, 5600, network_library + ".1", "a5"),
+        ]
+        expected_steps = [
+            (start / 1000, end / 1000, output) for start, end, output, _ in last_build[:-1]
+        ]
+
+        # Only the steps logged after the size of the log before the build are read
+        with open(ninja_log, "w", encoding="utf-8") as f:
+            f.write("# ninja log v5\n" + log_lines(previous_build))
+        offset = os.path.getsize(ninja_log)
+        with open(ninja_log, "a", encoding="utf-8") as f:
+            f.write(log_lines(last_build))
+        build_steps = self.ns3.read_ninja_log(cmake_cache, offset)
+        self.assertEqual(build_steps, expected_steps)
+
+        # The whole log is read, then the last build starts where the end times decrease
+        build_steps = self.ns3.read_ninja_log(cmake_cache, 0)
+        self.assertEqual(build_steps, expected_steps)
+
+        # Ninja recompacted the log, which is now shorter than before the build
+        with open(ninja_log, "w", encoding="utf-8") as f:
+            f.write("# ninja log v5\n" + log_lines(previous_build[-2:] + last_build))
+        self.assertLess(os.path.getsize(ninja_log), offset)
+        build_steps = self.ns3.read_ninja_log(cmake_cache, offset)
+        self.assertEqual(build_steps, expected_steps)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.ns3.print_build_time_report(build_steps, "3-dev", "default")
+        output = output.getvalue()
+        self.assertIn("Wall time: 5.6 s, 5 steps, 9.5 s of step time (1.7x parallelism)", output)
+
+        # Translation units are sorted by duration, and named after their sources
+        translation_units = output.split("Slowest translation units:\n")[1].split("Time")[0]
+        self.assertEqual(
+            translation_units.splitlines(),
+            [
+                "       4.0 s  src/core/model/time.cc",
+                "       2.5 s  src/core/model/simulator.cc",
+                "       1.4 s  src/network/model/packet.cc",
+            ],
+        )
+
+        # Object files and libraries are attributed to their modules
+        modules = output.split("Time per module:\n")[1].split("Critical")[0]
+        self.assertEqual(
+            modules.splitlines(),
+            ["       7.5 s  core (3 steps)", "       2.0 s  network (2 steps)"],
+        )
+
+        # The critical path goes back from the last step through the steps finishing
+        # before each step starts
+        critical_path = output.split("Critical path (estimated): ")[1]
+        self.assertEqual(
+            critical_path.splitlines(),
+            [
+                "5.6 s, 3 steps",
+                "       4.0 s  src/core/model/time.cc",
+                "       1.0 s  %s" % core_library,
+                "       0.6 s  %s" % network_library,
+            ],
+        )
+
+    def test_02_BuildProfileRegistry(self):
+        """!
+        Test if the CMake caches of the build profiles are looked up in the registry,
+        and searched for again when their entries are stale or missing
+        @return None
+        """
+        # A source tree with a cache folder for each of two build profiles
+        source_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source_dir, ignore_errors=True)
+        self.ns3.ns3_path = source_dir
+        self.ns3.build_profiles_file = os.path.join(source_dir, ".ns3-build-profiles")
+
+        def configure(cache_folder, build_profile, generator):
+            os.makedirs(cache_folder, exist_ok=True)
+            with open(os.path.join(cache_folder, "CMakeCache.txt"), "w", encoding="utf-8") as f:
+                f.write("build_profile:INTERNAL=%s\n" % build_profile)
+                f.write("CMAKE_GENERATOR:INTERNAL=%s\n" % generator)
+            self.ns3.register_build_profile(cache_folder)
+
+        def read_registry():
+            with open(self.ns3.build_profiles_file, encoding="utf-8") as f:
+                return json.load(f)
+
+        debug_cache = os.path.join(source_dir, "cmake-cache")
+        release_cache = os.path.join(source_dir, "cmake-cache-release")
+        configure(debug_cache, "debug", "Ninja")
+        configure(release_cache, "release", "Unix Makefiles")
+        self.assertEqual(
+            read_registry(),
+            {
+                "debug": {"cache_folder": debug_cache, "generator": "Ninja"},
+                "release": {"cache_folder": release_cache, "generator": "Unix Makefiles"},
+            },
+        )
+        self.assertEqual(self.ns3.search_cmake_cache("debug"), (debug_cache, "Ninja"))
+        self.assertEqual(self.ns3.search_cmake_cache("release"), (release_cache, "Unix Makefiles"))
+
+        # Cache folders out of the source tree are only found through the registry
+        out_of_tree_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, out_of_tree_dir, ignore_errors=True)
+        configure(out_of_tree_dir, "optimized", "Ninja")
+        self.assertEqual(self.ns3.search_cmake_cache("optimized"), (out_of_tree_dir, "Ninja"))
+
+        # Reconfiguring a cache folder with another build profile makes its entry stale
+        with open(os.path.join(debug_cache, "CMakeCache.txt"), "w", encoding="utf-8") as f:
+            f.write("build_profile:INTERNAL=default\nCMAKE_GENERATOR:INTERNAL=Ninja\n")
+        self.assertIsNone(self.ns3.search_cmake_cache("debug")[0])
+        # The search re-registers the cache folder with its new build profile
+        self.assertEqual(self.ns3.search_cmake_cache("default"), (debug_cache, "Ninja"))
+        self.assertNotIn("debug", read_registry())
+        self.assertEqual(read_registry()["default"]["cache_folder"], debug_cache)
+
+        # Removed cache folders are not returned
+        shutil.rmtree(release_cache)
+        self.assertIsNone(self.ns3.search_cmake_cache("release")[0])
+        shutil.rmtree(out_of_tree_dir)
+        self.assertIsNone(self.ns3.search_cmake_cache("optimized")[0])
+
+        # Without the registry, the search registers the cache folder it finds
+        os.remove(self.ns3.build_profiles_file)
+        self.assertEqual(self.ns3.search_cmake_cache("default"), (debug_cache, "Ninja"))
+        self.assertEqual(
+            read_registry(), {"default": {"cache_folder": debug_cache, "generator": "Ninja"}}
+        )
+
+    def test_03_SweepRunErrors(self):
+        """!
+        Test if a sweep run which cannot be started or saved is recorded as failed,
+        and the other runs and the summaries are still completed
+        @return None
+        """
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir, ignore_errors=True)
+        program = os.path.join(output_dir, "program.py")
+        with open(program, "w", encoding="utf-8") as f:
+            f.write("import sys\nsys.exit(0)\n")
+
+        # The directory of the second run cannot be created, as a file has its name
+        failing_run = self.ns3.get_sweep_run_name([("x", "2")])
+        with open(os.path.join(output_dir, failing_run), "w", encoding="utf-8") as f:
+            f.write("")
+
+        args = argparse.Namespace(
+            program_args=[],
+            sweep="program",
+            sweep_output_dir=output_dir,
+            sweep_params=["x=1:3"],
+            rng_runs=None,
+            rng_run_start=1,
+            dry_run=False,
+            quiet=False,
+            jobs=2,
+        )
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), self.assertRaises(SystemExit) as exit_code:
+            self.ns3.sweep_step(args, program, [])
+        self.assertEqual(exit_code.exception.code, 1)
+        self.assertIn("1 runs failed: %s" % failing_run, output.getvalue())
+
+        with open(os.path.join(output_dir, "summary.json"), "r", encoding="utf-8") as f:
+            results = json.load(f)
+        self.assertEqual([result["parameters"]["x"] for result in results], ["1", "2", "3"])
+        self.assertEqual([result["exit_code"] for result in results], [0, None, 0])
+        self.assertIn("error", results[1])
+        with open(os.path.join(output_dir, "summary.csv"), "r", encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 4)
+
+
 class NS3CommonSettingsTestCase(unittest.TestCase):
     """!
     ns3 tests related to generic options
@@ -664,6 +898,115 @@ class NS3CommonSettingsTestCase(unittest.TestCase):
         self.assertEqual(return_code, 1)
         self.assertIn("You need to configure ns-3 first: try ./ns3 configure", stdout)
 
+    def test_06_CompileOrDie(self):
+        """!
+        Test if compile-or-die finds the commits which do not build in a small git
+        history, testing every commit or by bisection
+        @return None
+        """
+        if shutil.which("git") is None:
+            self.skipTest("git is not available")
+        try:
+            import git  # noqa
+        except ImportError:
+            self.skipTest("GitPython is not available")
+
+        # A small project that the ns3 script configures and builds like ns-3,
+        # and whose test.py always passes
+        repo_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, repo_dir, ignore_errors=True)
+        lock_contents = (
+            "out_dir = '${PROJECT_SOURCE_DIR}/build'\\n"
+            "NS3_ENABLED_MODULES = []\\n"
+            "NS3_ENABLED_CONTRIBUTED_MODULES = []\\n"
+            "ENABLE_EXAMPLES = True\\n"
+            "ENABLE_TESTS = True\\n"
+            "FETCH_NETANIM_VISUALIZER = False\\n"
+            "BUILD_PROFILE = '${CMAKE_BUILD_TYPE}'\\n"
+            "ns3_runnable_programs = []\\n"
+            "ns3_runnable_scripts = []\\n"
+        )
+        files = {
+            "CMakeLists.txt": (
+                "cmake_minimum_required(VERSION 3.20)\n"
+                "project(compile-or-die CXX)\n"
+                'set(build_profile ${CMAKE_BUILD_TYPE} CACHE INTERNAL "")\n'
+                'file(WRITE ${PROJECT_SOURCE_DIR}/%s "%s")\n'
+                "add_executable(program program.cc)\n"
+                % (os.path.basename(ns3_lock_filename), lock_contents)
+            ),
+            "test.py": "import sys\nsys.exit(0)\n",
+            "src/README.md": "",
+            "contrib/README.md": "",
+        }
+        for name, contents in files.items():
+            os.makedirs(os.path.dirname(os.path.join(repo_dir, name)), exist_ok=True)
+            with open(os.path.join(repo_dir, name), "w", encoding="utf-8") as f:
+                f.write(contents)
+        shutil.copy(ns3_script, repo_dir)
+
+        def git_command(*args):
+            return subprocess.run(
+                ["git", "-c", "user.name=ns-3", "-c", "user.email=ns-3@example.com", *args],
+                cwd=repo_dir,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=True,
+                text=True,
+            ).stdout.strip()
+
+        # The third commit breaks the build, and the fourth does not fix it
+        git_command("init", "-q")
+        commits = []
+        for message, source in [
+            ("Add a program", "int main() { return 0; }\n"),
+            ("Change the exit code", "int main() { return 1 - 1; }\n"),
+            ("Break the build", "int main() { return }\n"),
+            ("Change the broken program", "int main() { return; }\n"),
+        ]:
+            with open(os.path.join(repo_dir, "program.cc"), "w", encoding="utf-8") as f:
+                f.write(source)
+            git_command("add", ".")
+            git_command("commit", "-q", "-m", message)
+            commits.append(git_command("rev-parse", "HEAD"))
+
+        ns3_copy = os.path.join(repo_dir, "ns3")
+        return_code, stdout, stderr = run_program(
+            ns3_copy, "configure -d release", python=True, cwd=repo_dir
+        )
+        self.assertEqual(return_code, 0, stderr)
+
+        def compile_or_die(options):
+            return_code, stdout, stderr = run_program(
+                ns3_copy,
+                "--compile-or-die %s %s %s" % (commits[0], commits[-1], options),
+                python=True,
+                cwd=repo_dir,
+            )
+            self.assertEqual(return_code, 1, stderr)
+            summary = stdout.split("---- Summary of compile-or-die:")[1]
+            statuses = {}
+            for commit in commits:
+                (line,) = [x for x in summary.splitlines() if x.startswith(commit[:12])]
+                statuses[commit] = re.split(r"\s{2,}", line)[1]
+            return stdout, statuses
+
+        # Every commit is tested, two at a time
+        stdout, statuses = compile_or_die("--compile-or-die-workers 2")
+        self.assertEqual(
+            list(statuses.values()), ["passed", "passed", "build failed", "build failed"]
+        )
+        for commit in commits[2:]:
+            self.assertIn("Log of %s" % commit[:12], stdout)
+
+        # The midpoint fails, then the commit before it passes, so the last commit is
+        # not built
+        stdout, statuses = compile_or_die("--compile-or-die-workers 1 --compile-or-die-bisect")
+        self.assertIn("First failing commit: %s Break the build" % commits[2], stdout)
+        self.assertEqual(statuses[commits[2]], "build failed")
+        self.assertEqual(statuses[commits[1]], "passed")
+        self.assertEqual(statuses[commits[3]], "not tested")
+
 
 class NS3ConfigureBuildProfileTestCase(unittest.TestCase):
     """!
@@ -2093,6 +2436,11 @@ class NS3BuildBaseTestCase(NS3BaseTestCase):
         self.assertEqual(return_code, 0)
         self.assertIn("Built target core", stdout)
 
+        # Multiple targets should be built by a single CMake invocation
+        return_code, stdout, stderr = run_ns3("build core network --dry-run")
+        self.assertEqual(return_code, 0)
+        self.assertIn(cmake_build_target_command(target="core network"), stdout)
+
     def test_02_BuildNonExistingTargets(self):
         """!
         Try building core-test library without tests enabled
@@ -2902,9 +3250,8 @@ class NS3ExpectedUseTestCase(NS3BaseTestCase):
 
         return_code, stdout, stderr = run_ns3("docs all")
         self.assertEqual(return_code, 0)
-        self.assertIn(cmake_build_target_command(target="sphinx"), stdout)
+        self.assertIn(cmake_build_target_command(target="sphinx doxygen"), stdout)
         self.assertIn("Built target sphinx", stdout)
-        self.assertIn(cmake_build_target_command(target="doxygen"), stdout)
         self.assertIn("Built target doxygen", stdout)
 
     def test_14_EnableSudo(self):
@@ -3192,6 +3539,142 @@ class NS3ExpectedUseTestCase(NS3BaseTestCase):
         if os.path.exists(destination_src):
             shutil.rmtree(destination_src)
 
+    def test_19_CachedProgramShortcuts(self):
+        """!
+        Test if the program shortcuts are cached until the lock file changes
+        @return None
+        """
+        return_code, stdout, stderr = run_ns3("build test-runner")
+        self.assertEqual(return_code, 0)
+
+        return_code, stdout, stderr = run_ns3('run "test-runner --list" --no-build')
+        self.assertEqual(return_code, 0)
+
+        driver_cache_path = os.path.join(usual_outdir, "ns3-driver-cache.json")
+        self.assertTrue(os.path.exists(driver_cache_path))
+        with open(driver_cache_path, "r", encoding="utf-8") as f:
+            driver_cache = json.load(f)
+        program_map, scripts_enabled = driver_cache["program_shortcuts"]["value"]
+        self.assertIn("test-runner", program_map)
+
+        # Add a fake shortcut to the cache, which is used while the lock file is unchanged
+        program_map["cached-test-runner"] = program_map["test-runner"]
+        with open(driver_cache_path, "w", encoding="utf-8") as f:
+            json.dump(driver_cache, f)
+
+        return_code, stdout, stderr = run_ns3('run "cached-test-runner --list" --no-build')
+        self.assertEqual(return_code, 0)
+
+        # Touching the lock file invalidates the cached shortcuts
+        os.utime(ns3_lock_filename)
+        return_code, stdout, stderr = run_ns3('run "cached-test-runner --list" --no-build')
+        self.assertEqual(return_code, 1)
+        self.assertIn("Couldn't find the specified program: cached-test-runner", stderr)
+
+    def test_20_ParameterSweep(self):
+        """!
+        Test if the parameter sweep runs every combination and skips completed runs
+        @return None
+        """
+        sweep_dir = os.path.join(ns3_path, "sweep-output", "test-sweep")
+        shutil.rmtree(sweep_dir, ignore_errors=True)
+
+        sweep_command = (
+            "sweep sample-simulator --rng-runs 2 --output-dir %s"
+            " --param SchedulerType=ns3::MapScheduler,ns3::ListScheduler" % sweep_dir
+        )
+        return_code, stdout, stderr = run_ns3(sweep_command)
+        self.assertEqual(return_code, 0)
+        self.assertIn("Running 4 of 4 runs", stdout)
+
+        with open(os.path.join(sweep_dir, "summary.json"), "r", encoding="utf-8") as f:
+            results = json.load(f)
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertEqual(result["exit_code"], 0)
+            run_dir = os.path.join(sweep_dir, result["name"])
+            self.assertTrue(os.path.exists(os.path.join(run_dir, "stdout.txt")))
+            self.assertIn("--RngRun=%s" % result["parameters"]["RngRun"], result["command"])
+        self.assertTrue(os.path.exists(os.path.join(sweep_dir, "summary.csv")))
+
+        # Runs which already succeeded are skipped
+        return_code, stdout, stderr = run_ns3(sweep_command + " --rng-runs 3 --no-build")
+        self.assertEqual(return_code, 0)
+        self.assertIn("Running 2 of 6 runs", stdout)
+
+        # Values which only differ by characters replaced in the names run in different directories
+        shutil.rmtree(sweep_dir, ignore_errors=True)
+        run_ns3(
+            "sweep sample-simulator --no-build --output-dir %s"
+            " --param SchedulerType=ns3::MapScheduler,ns3__MapScheduler" % sweep_dir
+        )
+        with open(os.path.join(sweep_dir, "summary.json"), "r", encoding="utf-8") as f:
+            results = json.load(f)
+        self.assertEqual(len(set(result["name"] for result in results)), 2)
+        for result in results:
+            self.assertTrue(result["name"].startswith("SchedulerType=ns3__MapScheduler-"))
+
+        shutil.rmtree(os.path.join(ns3_path, "sweep-output"), ignore_errors=True)
+
+    def test_21_Profile(self):
+        """!
+        Test if the profiler front-end saves the folded stacks, flamegraph and summary of a run
+        @return None
+        """
+        # Python profilers cannot profile C++ programs
+        return_code, stdout, stderr = run_ns3("run sample-simulator --profile=cprofile --no-build")
+        self.assertEqual(return_code, 1)
+        self.assertIn("The cprofile profiler only supports python scripts", stdout)
+
+        if shutil.which("perf") is None:
+            self.skipTest("Missing perf")
+
+        profile_dir = os.path.join(ns3_path, "profile-output", "test-profile")
+        return_code, stdout, stderr = run_ns3(
+            "run sample-simulator --profile=perf --profile-dir %s" % profile_dir
+        )
+        self.assertEqual(return_code, 0)
+        self.assertIn("Events executed:", stdout)
+        for artifact in ["stacks.folded", "flamegraph.svg", "summary.json"]:
+            self.assertTrue(os.path.exists(os.path.join(profile_dir, artifact)), artifact)
+
+        with open(os.path.join(profile_dir, "summary.json"), "r", encoding="utf-8") as f:
+            summary = json.load(f)
+        self.assertEqual(summary["exit_code"], 0)
+        self.assertGreater(summary["events"], 0)
+
+        shutil.rmtree(os.path.join(ns3_path, "profile-output"), ignore_errors=True)
+
+    def test_22_RepeatedRuns(self):
+        """!
+        Test if repeated runs discard the warmup runs and report the statistics of the timings
+        @return None
+        """
+        repeat_json = os.path.join(ns3_path, "repeat-timings.json")
+        return_code, stdout, stderr = run_ns3(
+            "run sample-simulator --no-build --repeat 3 --warmup 1 --repeat-json %s" % repeat_json
+        )
+        self.assertEqual(return_code, 0)
+        self.assertIn("Summary of 3 runs (1 warmup runs discarded)", stdout)
+        self.assertIn("Wall time (s)", stdout)
+
+        with open(repeat_json, "r", encoding="utf-8") as f:
+            timings = json.load(f)
+        os.remove(repeat_json)
+        self.assertEqual(len(timings["runs"]), 3)
+        wall_time = timings["statistics"]["wall_time"]
+        self.assertLessEqual(wall_time["ci95"][0], wall_time["mean"])
+        self.assertLessEqual(wall_time["mean"], wall_time["ci95"][1])
+
+        return_code, stdout, stderr = run_ns3("run sample-simulator --no-build --repeat 0")
+        self.assertEqual(return_code, 1)
+
+        return_code, stdout, stderr = run_ns3(
+            "run sample-simulator --no-build --repeat 3 --profile cprofile"
+        )
+        self.assertEqual(return_code, 1)
+        self.assertIn("--repeat cannot be combined with --profile", stdout)
+
 
 class NS3QualityControlTestCase(unittest.TestCase):
     """!
@@ -3467,6 +3950,7 @@ def main():
             NS3StyleTestCase,
         ],
         "build": [
+            NS3ScriptFunctionsTestCase,
             NS3CommonSettingsTestCase,
             NS3ConfigureBuildProfileTestCase,
             NS3ConfigureTestCase,
@@ -3476,6 +3960,7 @@ def main():
         "complete": [
             NS3UnusedSourcesTestCase,
             NS3StyleTestCase,
+            NS3ScriptFunctionsTestCase,
             NS3CommonSettingsTestCase,
             NS3ConfigureBuildProfileTestCase,
             NS3ConfigureTestCase,
@@ -3489,8 +3974,6 @@ def main():
         ],
     }
 
-    import argparse
-
     parser = argparse.ArgumentParser("Test suite for the ns-3 buildsystem")
     parser.add_argument(
         "-c", "--completeness", choices=test_completeness.keys(), default="complete"
@@ -52,15 +52,458 @@
 
 from __future__ import print_function
 
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import shutil
 import sys
+import tempfile
+import unittest
+import unittest.mock
+import xml.etree.ElementTree as ET
 
 from TestBase import TestBaseClass
 
+ns3_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def load_test_py():
+    """!
+    Import test.py as a module, to test its functions without running it
+    @return the test.py module
+    """
+    if ns3_path not in sys.path:
+        sys.path.insert(0, ns3_path)
+    spec = importlib.util.spec_from_file_location("ns3_test_py", os.path.join(ns3_path, "test.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.args = argparse.Namespace(fullness="QUICK", valgrind=False)
+    return module
+
+
+class TestPyTestCase(unittest.TestCase):
+    """!
+    Tests of the behavior of test.py, which do not need ns-3 to be built
+    """
+
+    def setUp(self):
+        """!
+        Load test.py and create a temporary directory
+        @return None
+        """
+        ## test.py module
+        self.test_py = load_test_py()
+        ## temporary directory
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """!
+        Remove the temporary directory
+        @return None
+        """
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def make_jobs(self, names, is_example=False):
+        """!
+        Create test.py jobs
+        @param names names of the jobs
+        @param is_example whether the jobs are examples rather than test suites
+        @return list of jobs
+        """
+        jobs = []
+        for name in names:
+            job = self.test_py.Job()
+            job.set_display_name(name)
+            job.set_is_example(is_example)
+            jobs.append(job)
+        return jobs
+
+    def test_01_ShardsAreDisjointAndComplete(self):
+        """!
+        Test if the shards of two successive rounds are disjoint and cover every job,
+        whether the hosts share a durations file or not
+        @return None
+        """
+        names = ["suite-%d" % i for i in range(20)]
+        shards = 2
+        shared_durations_file = os.path.join(self.tmp_dir, "shared-job-durations.json")
+        for shared_file in [None, shared_durations_file]:
+            # Each host also has its own history, which must not change the split
+            host_durations_files = [
+                os.path.join(self.tmp_dir, "host%d-job-durations.json" % shard)
+                for shard in range(1, shards + 1)
+            ]
+            for round_number in range(2):
+                shard_jobs = []
+                for shard in range(1, shards + 1):
+                    job_durations = (
+                        self.test_py.load_job_durations(shared_file) if shared_file else None
+                    )
+                    jobs = self.test_py.select_shard_jobs(
+                        self.make_jobs(names), shard, shards, job_durations
+                    )
+                    for job in jobs:
+                        job.set_elapsed_time(1.0 + 0.1 * names.index(job.display_name))
+                    self.test_py.save_job_durations(jobs, host_durations_files[shard - 1])
+                    shard_jobs.append([job.display_name for job in jobs])
+
+                selected_names = [name for jobs in shard_jobs for name in jobs]
+                self.assertEqual(sorted(selected_names), sorted(names), round_number)
+                self.assertEqual(len(selected_names), len(set(selected_names)), round_number)
+
+                # The shared file is recorded by a full run
+                if shared_file:
+                    jobs = self.make_jobs(names)
+                    for i, job in enumerate(jobs):
+                        job.set_elapsed_time(float(i % 7 + 1))
+                    self.test_py.save_job_durations(jobs, shared_file)
+
+    def run_benchmarks(self, git_commit, run_times, suite=""):
+        """!
+        Run test.py --perf with fake benchmark programs
+        @param git_commit commit recorded in the performance history
+        @param run_times mean run time of each benchmark
+        @param suite pattern of the benchmarks to run
+        @return tuple of the return code and of the output of each benchmark
+        """
+        test_py = self.test_py
+        test_py.ENABLE_TESTS = False
+        test_py.NS3_BUILDDIR = self.tmp_dir
+        test_py.APPNAME, test_py.VERSION = "ns", "3-dev"
+        test_py.BUILD_PROFILE, test_py.BUILD_PROFILE_SUFFIX = "default", "-default"
+        test_py.args = argparse.Namespace(
+            fullness="QUICK",
+            suite=suite,
+            perf_history=os.path.join(self.tmp_dir, "perf-history.db"),
+            perf_baseline=None,
+            perf_runs=5,
+            perf_threshold=5.0,
+            verbose_failed=False,
+        )
+        os.makedirs(os.path.join(self.tmp_dir, "utils"), exist_ok=True)
+        for name in run_times:
+            open(os.path.join(self.tmp_dir, "utils", "ns3-dev-%s-default" % name), "w").close()
+
+        runs = []
+
+        def run_job_synchronously(shell_command, directory, valgrind, is_python, build_path=""):
+            name = shell_command.split()[0][len("utils/ns3-dev-") : -len("-default")]
+            runs.append(name)
+            return (0, "", "", run_times[name] * (1 + 0.01 * (len(runs) % 3)))
+
+        test_py.run_job_synchronously = run_job_synchronously
+        test_py.get_git_commit = lambda: git_commit
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            rc = test_py.run_performance_tests("test-runner", None)
+        results = {}
+        for line in output.getvalue().splitlines():
+            for name in run_times:
+                if "Benchmark %s " % name in line:
+                    results[name] = line
+        return (rc, results)
+
+    def test_02_PerfBaselineOfEachBenchmark(self):
+        """!
+        Test if each benchmark is compared with its own previous run, and if a
+        regression is detected
+        @return None
+        """
+        rc, results = self.run_benchmarks("aaaa", {"bench-a": 1.0, "bench-b": 0.5})
+        self.assertEqual(rc, 0)
+        self.assertIn("no baseline", results["bench-b"])
+
+        # Only bench-b runs at the second commit
+        rc, results = self.run_benchmarks("bbbb", {"bench-a": 1.0, "bench-b": 1.0}, "bench-b")
+        self.assertEqual(rc, 1)
+        self.assertIn("REGRESSION", results["bench-b"])
+        self.assertNotIn("bench-a", results)
+
+        # bench-a is compared with aaaa and gets slower, bench-b with bbbb and does not
+        rc, results = self.run_benchmarks("cccc", {"bench-a": 2.0, "bench-b": 1.0})
+        self.assertEqual(rc, 1)
+        self.assertIn("REGRESSION", results["bench-a"])
+        self.assertIn("at aaaa", results["bench-a"])
+        self.assertIn("PASS", results["bench-b"])
+        self.assertIn("at bbbb", results["bench-b"])
+
+    def test_03_ResultCache(self):
+        """!
+        Test if the test suites and examples which passed are taken from the result
+        cache in the next run, but not after their programs, the libraries they use,
+        their input files or the NS_* environment variables changed
+        @return None
+        """
+        test_py = self.test_py
+        test_py.NS3_BASEDIR = self.tmp_dir
+        test_py.NS3_BUILDDIR = os.path.join(self.tmp_dir, "build")
+        test_py.RESULT_CACHE_FILE = os.path.join(self.tmp_dir, "result-cache.json")
+        files = {
+            "build/utils/test-runner": b"libns3-dev-core.so\x00libns3-dev-foo-test.so\x00",
+            "build/lib/libns3-dev-core.so": b"core",
+            "build/lib/libns3-dev-foo-test.so": b"libns3-dev-core.so\x00",
+            "build/examples/foo/foo-example": b"libns3-dev-core.so\x00",
+            "build/bindings/python/ns/__init__.py": b"",
+            "src/foo/test/reference.txt": b"reference",
+            "examples/foo/input.txt": b"input",
+            "examples/foo/foo.py": b"import helper",
+            "examples/foo/helper.py": b"",
+        }
+        for name, contents in files.items():
+            os.makedirs(os.path.dirname(os.path.join(self.tmp_dir, name)), exist_ok=True)
+            with open(os.path.join(self.tmp_dir, name), "wb") as f:
+                f.write(contents)
+        test_suites = {
+            "foo": {
+                "name": "foo",
+                "library": os.path.join(self.tmp_dir, "build/lib/libns3-dev-foo-test.so"),
+                "data_dirs": ["src/foo/test"],
+            }
+        }
+
+        def make_job(kind):
+            if kind == "suite":
+                (job,) = self.make_jobs(["foo"])
+                job.set_is_pyexample(False)
+                job.set_shell_command("utils/test-runner --test-name=foo")
+            elif kind == "example":
+                (job,) = self.make_jobs(["foo-example"], is_example=True)
+                job.set_is_pyexample(False)
+                job.set_shell_command(os.path.join(self.tmp_dir, "build/examples/foo/foo-example"))
+            else:
+                (job,) = self.make_jobs(["examples/foo/foo.py"])
+                job.set_is_pyexample(True)
+                job.set_shell_command("examples/foo/foo.py")
+            return job
+
+        def run(kind, changed_file=None):
+            if changed_file:
+                with open(os.path.join(self.tmp_dir, changed_file), "ab") as f:
+                    f.write(b"changed")
+            result_cache = test_py.load_result_cache()
+            job = make_job(kind)
+            job.set_cache_key(test_py.get_job_cache_key(job, result_cache["files"], test_suites))
+            self.assertIsNotNone(job.cache_key, kind)
+            name = "%s %s" % (test_py.get_result_cache_mode(), job.get_duration_key())
+            is_cached = result_cache["results"].get(name) == job.cache_key
+            job.returncode = 0
+            test_py.save_result_cache(result_cache, [job])
+            return is_cached
+
+        changed_files = {
+            "suite": [
+                "src/foo/test/reference.txt",
+                "build/lib/libns3-dev-foo-test.so",
+                "build/lib/libns3-dev-core.so",
+            ],
+            "example": ["examples/foo/input.txt", "build/examples/foo/foo-example"],
+            "pyexample": ["examples/foo/helper.py", "examples/foo/foo.py"],
+        }
+        for kind, kind_changed_files in changed_files.items():
+            self.assertFalse(run(kind), kind)
+            self.assertTrue(run(kind), kind)
+            for changed_file in kind_changed_files:
+                self.assertFalse(run(kind, changed_file), changed_file)
+                self.assertTrue(run(kind), changed_file)
+
+            # Attributes set from the environment change the jobs
+            with unittest.mock.patch.dict(os.environ, {"NS_GLOBAL_VALUE": "RngRun=2"}):
+                self.assertFalse(run(kind), kind)
+                self.assertTrue(run(kind), kind)
+
+        # Without the data directories of the suite, there is no cache key
+        del test_suites["foo"]["data_dirs"]
+        self.assertIsNone(test_py.get_job_cache_key(make_job("suite"), {}, test_suites))
+
+    def test_04_TestManifest(self):
+        """!
+        Test if the test manifest lists the test suites of the test-runner and the
+        examples of the examples-to-run files, and if it is only made again after
+        one of them changed
+        @return None
+        """
+        test_py = self.test_py
+        test_py.ENABLE_TESTS = True
+        test_py.NS3_BUILDDIR = os.path.join(self.tmp_dir, "build")
+        test_py.EXAMPLE_DIRECTORIES = ["tutorial"]
+        test_py.NS3_ENABLED_MODULES = ["ns3-foo"]
+        test_py.NS3_ENABLED_CONTRIBUTED_MODULES = []
+        suites = [
+            {
+                "name": "foo",
+                "type": "unit",
+                "durations": ["QUICK", "EXTENSIVE"],
+                "library": "",
+                "data_dirs": ["src/foo/test"],
+            }
+        ]
+        runs_file = os.path.join(self.tmp_dir, "test-runner-runs")
+        test_runner = os.path.join(test_py.NS3_BUILDDIR, "utils", "test-runner")
+        os.makedirs(os.path.dirname(test_runner))
+        with open(test_runner, "w", encoding="utf-8") as f:
+            f.write("#!/bin/sh\necho >> '%s'\n" % runs_file)
+            f.write("echo '%s'\n" % json.dumps({"suites": suites}))
+        os.chmod(test_runner, 0o755)
+        examples_to_run_path = os.path.join("src", "foo", "test", "examples-to-run.py")
+        examples_to_run = os.path.join(self.tmp_dir, examples_to_run_path)
+        os.makedirs(os.path.dirname(examples_to_run))
+        with open(examples_to_run, "w", encoding="utf-8") as f:
+            f.write('cpp_examples = [("foo-example", "True", "True")]\npython_examples = []\n')
+
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        try:
+            test_manifest = test_py.load_test_manifest("test-runner")
+            self.assertEqual(test_manifest["suites"], suites)
+            self.assertEqual(test_py.get_test_suite_names(test_manifest), ["foo"])
+            # The examples-to-run file of the tutorial does not exist
+            self.assertEqual(
+                json.loads(json.dumps(test_manifest["examples"])),
+                {
+                    examples_to_run_path: {
+                        "cpp_examples": [["foo-example", "True", "True"]],
+                        "python_examples": [],
+                    }
+                },
+            )
+
+            # The manifest is read from the build directory, without the test-runner
+            self.assertEqual(
+                test_py.load_test_manifest("test-runner"), json.loads(json.dumps(test_manifest))
+            )
+            with open(runs_file, encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 1)
+
+            # Editing an examples-to-run file makes the manifest again
+            with open(examples_to_run, "w", encoding="utf-8") as f:
+                f.write('cpp_examples = []\npython_examples = [("foo.py", "True")]\n')
+            test_manifest = test_py.load_test_manifest("test-runner")
+            self.assertEqual(
+                test_manifest["examples"][examples_to_run_path]["python_examples"],
+                [("foo.py", "True")],
+            )
+            with open(runs_file, encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 2)
+
+            # A manifest without the test suites is not kept, so that the next
+            # runs list them again
+            with open(test_runner, "w", encoding="utf-8") as f:
+                f.write("#!/bin/sh\necho >> '%s'\nexit 1\n" % runs_file)
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.assertIsNone(test_py.load_test_manifest("test-runner")["suites"])
+                self.assertIsNone(test_py.load_test_manifest("test-runner")["suites"])
+            with open(runs_file, encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 4)
+        finally:
+            os.chdir(cwd)
+
+    def test_05_LongestJobsFirst(self):
+        """!
+        Test if the jobs are sorted by the durations of the previous runs, longest
+        first, without the durations of the jobs which failed or crashed
+        @return None
+        """
+        durations_file = os.path.join(self.tmp_dir, "job-durations.json")
+        for returncodes in [{"d": 3}, {"a": 1, "d": 3}]:
+            jobs = self.make_jobs(["a", "b", "c", "d", "e"])
+            for job, elapsed_time in zip(jobs, [1.0, 4.0, 2.0, 100.0, 50.0]):
+                job.set_elapsed_time(elapsed_time)
+                job.set_returncode(returncodes.get(job.display_name, 0))
+            # A job killed at the timeout is recorded, as it would have taken longer
+            jobs[-1].set_is_timeout(True)
+            jobs[-1].set_returncode(-9)
+            self.test_py.save_job_durations(jobs, durations_file)
+
+        job_durations = self.test_py.load_job_durations(durations_file)
+        self.assertEqual(
+            job_durations,
+            {"TestSuite a": 1.0, "TestSuite b": 4.0, "TestSuite c": 2.0, "TestSuite e": 50.0},
+        )
+
+        # The jobs without durations take the median of the known ones, 3 s
+        jobs = self.make_jobs(["a", "b", "c", "d", "e", "f"])
+        self.assertEqual(self.test_py.sort_jobs_by_expected_duration(jobs, job_durations), 4)
+        self.assertEqual([job.display_name for job in jobs], ["e", "b", "d", "f", "c", "a"])
+        self.assertEqual(self.test_py.predict_makespan(jobs, 2), 50.0)
+
+    def test_06_MergeShardResults(self):
+        """!
+        Test if merging the XML results of two shards gives a single report with the
+        results of both, in the order of the files
+        @return None
+        """
+        self.test_py.TMP_OUTPUT_DIR = os.path.join(self.tmp_dir, "testpy-output")
+        shard_results = [
+            '<Test>\n  <Name>foo</Name>\n  <Result>PASS</Result>\n  <Time real="1.000"/>\n'
+            "  <Test>\n    <Name>foo case</Name>\n    <Result>PASS</Result>\n  </Test>\n</Test>\n"
+            "<Example>\n  <Name>foo-example</Name>\n  <Result>FAIL</Result>\n"
+            '  <Time real="2.000"/>\n</Example>\n',
+            '<Test>\n  <Name>bar</Name>\n  <Result>PASS</Result>\n  <Time real="3.000"/>\n'
+            "</Test>\n",
+        ]
+        results_files = []
+        for shard, results in enumerate(shard_results):
+            results_files.append(os.path.join(self.tmp_dir, "shard%d.xml" % shard))
+            with open(results_files[-1], "w", encoding="utf-8") as f:
+                f.write('<?xml version="1.0"?>\n<Results>\n%s</Results>\n' % results)
+
+        merged_file = os.path.join(self.tmp_dir, "merged.xml")
+        text_file = os.path.join(self.tmp_dir, "merged.txt")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            rc = self.test_py.merge_results(
+                results_files + ["--xml", merged_file, "--text", text_file]
+            )
+        self.assertEqual(rc, 1)
+        self.assertIn(
+            "2 of 3 tests passed (2 passed, 0 skipped, 1 failed, 0 crashed, 0 timed out, "
+            "0 valgrind errors)",
+            output.getvalue(),
+        )
+
+        merged_results = ET.parse(merged_file).getroot()
+        self.assertEqual(
+            [(x.tag, x.find("Name").text, x.find("Result").text) for x in merged_results],
+            [("Test", "foo", "PASS"), ("Example", "foo-example", "FAIL"), ("Test", "bar", "PASS")],
+        )
+        self.assertEqual(merged_results.find("Test/Test/Name").text, "foo case")
+        with open(text_file, encoding="utf-8") as f:
+            text = f.read()
+        self.assertIn('FAIL: Example "foo-example" (2.000)', text)
+        self.assertIn("bar", text)
+
+        # A missing results file is an error
+        with contextlib.redirect_stderr(io.StringIO()):
+            rc = self.test_py.merge_results(results_files + [os.path.join(self.tmp_dir, "none")])
+        self.assertEqual(rc, 2)
+
+    def test_07_PerfRunsBelowTwo(self):
+        """!
+        Test if --perf-runs below 2, which leave no samples to compare, are rejected
+        @return None
+        """
+        for perf_runs in ["0", "1"]:
+            argv = ["test.py", "--perf", "--perf-runs", perf_runs]
+            stderr = io.StringIO()
+            with unittest.mock.patch.object(sys, "argv", argv), contextlib.redirect_stderr(stderr):
+                with self.assertRaises(SystemExit) as context:
+                    self.test_py.main(argv)
+            self.assertEqual(context.exception.code, 2, perf_runs)
+            self.assertIn("--perf-runs must be at least 2", stderr.getvalue())
+
 
 def main(argv):
     """
     Prepares test cases and executes
     """
+    # The behavior of test.py is tested first, since it does not need a build
+    unit_tests = unittest.TestLoader().loadTestsFromTestCase(TestPyTestCase)
+    if not unittest.TextTestRunner(verbosity=2).run(unit_tests).wasSuccessful():
+        return 1
+
     test_cases = [
         "",
         "-h",
@@ -103,6 +546,14 @@ def main(argv):
         "--example=wifi-phy-configuration",
         "--example=wifi-phy-configuration*",
         '--example="wifi-phy-configuration --testCase=0"',
+        "--process-per-suite",
+        "--force",
+        "--timeout=3600",
+        "--memory-limit=8192",
+        "--shard=1/2",
+        "merge --help",
+        "--perf --perf-runs=2",
+        "--write-test-manifest",
     ]
 
     configure_string = sys.executable + " ns3 configure --enable-tests --enable-examples"